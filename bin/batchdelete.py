@@ -16,6 +16,10 @@
 #   4. Event reason, for example, “sequence removed by provider”
 #   5. Submitter
 #
+# Processing:
+#
+#	See batchengine.py
+#
 # lec	05/01/2025
 #	- wts2-1656/Batch Delete
 #
@@ -23,267 +27,117 @@
 
 import sys
 import os
-import db
-import mgi_utils
-import loadlib
-
-#db.setTrace()
-
-DEBUG = 0
+import batchengine
+import nomensql
 
 #
 # from configuration file
 #
-mode = os.environ['NOMENMODE']
 inputFileName = os.environ['DELETE_FILE_DEFAULT']
 diagFileName = os.environ['DELETE_LOG_DIAG']
 errorFileName = os.environ['DELETE_LOG_ERROR']
 
-inputFile = ''		# file descriptor
-diagFile = ''		# file descriptor
-errorFile = ''		# file descriptor
-lineNum = 0
-
-eventReasonLookup = {}
-
-markerID = ''
-symbol = ''
-jnum = ''
-eventReason = ''
-createdBy = ''
-markerKey = ''
-refKey = ''
-eventReasonKey = ''
-createdByKey = ''
+#
+# the batch operation (see batchengine.py)
+#
+name = 'batchdelete'
+function = 'MRK_deleteWithdrawal'
+argumentTypes = ['int', 'int', 'int', 'int']
 
-def exit(status, message = None):
+def parse(tokens):
     '''
-    # requires: status, the numeric exit status (integer)
-    #           message (string)
-    #
-    # effects:
-    # Print message to stderr and exits
+    # requires: tokens, the fields of the input row
     #
-    # returns:
+    # returns: the row dictionary
     #
     '''
 
-    db.commit()
-    db.useOneConnection()
-
-    if message is not None:
-        sys.stderr.write('\n' + str(message) + '\n')
+    row = {}
+    row['markerID'] = tokens[0]
+    row['symbol'] = tokens[1]
+    row['jnum'] = tokens[2]
+    row['eventReason'] = tokens[3]
+    row['createdBy'] = tokens[4]
 
-    try:
-        inputFile.close()
-        diagFile.flush()
-        errorFile.flush()
-        diagFile.write('\n\nEnd Date/Time: %s\n' % (mgi_utils.date()))
-        errorFile.write('\n\nEnd Date/Time: %s\n' % (mgi_utils.date()))
-        diagFile.close()
-        errorFile.close()
-    except:
-        pass
+    return row
 
-    sys.exit(status)
- 
-def init():
+def sanityCheck(row):
     '''
-    # requires: 
+    # requires: row, the row dictionary
     #
-    # effects: 
-    # 1. Processes command line options
-    # 2. Initializes local DBMS parameters
-    # 3. Initializes global file descriptors/file names
+    # effects:
+    #	verifies that:
+    #		the MGI ID and Symbol match
+    #		the Marker is not already Withdrawn
+    #		the Marker does not contain an Allele
     #
     # returns:
+    #	0 if sanity check passes
+    #	1 if sanity check fails
     #
     '''
 
-    global inputFile, diagFile, diagFileName
-    global errorFile, errorFileName
-    global eventReasonLookup
+    error = 0
+    errorFile = batchengine.errorFile
 
-    db.useOneConnection(1)
+    if row['markerKey'] not in batchengine.markerInfo:
+        return (error)
 
-    try:
-        inputFile = open(inputFileName, 'r')
-    except:
-        exit(1, 'Could not open file %s\n' % inputFileName)
-            
-    try:
-        diagFile = open(diagFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % diagFileName)
-            
-    try:
-        errorFile = open(errorFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % errorFileName)
+    marker = batchengine.markerInfo[row['markerKey']]
 
-    results = db.sql('select * from VOC_Term where _vocab_key = 34', 'auto')
-    for r in results:
-        key = r['term']
-        value = r['_term_key']
-        eventReasonLookup[key] = []
-        eventReasonLookup[key].append(value)
-    #print(eventReasonLookup)
+    if marker['symbol'] != row['symbol']:
+            errorFile.write('\nMarker ID, Symbol Do Not Match (row %d): %s, %s\n' % (batchengine.lineNum, row['markerID'], row['symbol']))
+            error = 1
 
-    # Log all SQL 
-    db.set_sqlLogFunction(db.sqlLogAll)
+    if marker['_Marker_Status_key'] == 2:
+            errorFile.write('\nMarker ID Already Withdrawn (row %d): %s, %s\n' % (batchengine.lineNum, row['markerID'], row['symbol']))
+            error = 1
 
-    # Set Log File Descriptor
-    db.set_commandLogFile(diagFileName)
+    if marker['alleleCount'] >= 1:
+            errorFile.write('\nMarker ID contains an Allele (row %d): %s, %s\n' % (batchengine.lineNum, row['markerID'], row['symbol']))
+            error = 1
 
-    # Set Log File Descriptor
-    diagFile.write('Start Date/Time: %s\n' % (mgi_utils.date()))
-    diagFile.write('Server: %s\n' % (db.get_sqlServer()))
-    diagFile.write('Database: %s\n' % (db.get_sqlDatabase()))
-    diagFile.write('Input File: %s\n' % (inputFileName))
+    return (error)
 
-def verifyMode():
+def updateMarker(row):
     '''
-    # requires:
+    # requires: row, an accepted row dictionary
     #
     # effects:
-    #	Verifies the processing mode is valid.  If it is not valid,
-    #	the program is aborted.
-    #	Sets globals based on processing mode.
-    #	Deletes data based on processing mode.
+    #	the Marker is Withdrawn (MRK_deleteWithdrawal) : a later row of
+    #	the same Marker fails the "Already Withdrawn" check
     #
     # returns:
     #	nothing
     #
     '''
 
-    global DEBUG
-
-    if mode == 'preview':
-        DEBUG = 1
-    elif mode not in ['load']:
-        exit(1, 'Invalid Processing Mode:  %s\n' % (mode))
+    if row['markerKey'] in batchengine.markerInfo:
+        batchengine.markerInfo[row['markerKey']]['_Marker_Status_key'] = 2
 
-def sanityCheck():
+def command(row):
     '''
+    # requires: row, the row dictionary
     #
-    # requires:
-    #
-    # effects:
-    #
-    # returns:
-    #	0 if sanity check passes
-    #	1 if sanity check fails
+    # returns: the MRK_deleteWithdrawal command (see nomensql.py)
     #
     '''
 
-    global markerKey
-    global refKey
-    global eventReasonKey
-    global createdByKey
-
-    error = 0
-
-    markerKey = loadlib.verifyMarker(markerID, lineNum, None)
-    refKey = loadlib.verifyReference(jnum, lineNum, None)
-    createdByKey = loadlib.verifyUser(createdBy, lineNum, None)
-
-    if eventReason not in eventReasonLookup:
-        eventReasonKey = 0
-    else:
-        eventReasonKey = eventReasonLookup[eventReason][0]
-
-    if markerKey != 0:
-        results = db.sql(''' select * from mrk_marker where _marker_key = %s and symbol = '%s' ''' % (markerKey, symbol), 'auto')
-        if len(results) == 0:
-                errorFile.write('\nMarker ID, Symbol Do Not Match: ' + markerID + ', ' + symbol + '\n')
-                error = 1
-
-    if markerKey != 0:
-        results = db.sql(''' select * from mrk_marker where _marker_status_key = 2 and _marker_key = %s ''' % (markerKey), 'auto')
-        if len(results) == 1:
-                errorFile.write('\nMarker ID Already Withdrawn: ' + markerID + ', ' + symbol + '\n')
-                error = 1
-
-    if markerKey != 0:
-        results = db.sql(''' select * from all_allele where _marker_key = %s ''' % (markerKey), 'auto')
-        if len(results) >= 1:
-                errorFile.write('\nMarker ID contains an Allele: ' + markerID + ', ' + symbol + '\n')
-                error = 1
-
-    if markerKey == 0 or \
-       refKey == 0 or \
-       eventReasonKey == 0 or \
-       createdByKey == 0:
-        error = 1
+    return nomensql.command('deleteWithdrawal', *arguments(row))
 
-    return (error)
-
-def processFile():
+def arguments(row):
     '''
-    # requires:
-    #
-    # effects:
-    #	Reads input file
-    #	Verifies and Processes each line in the input file
+    # requires: row, the row dictionary
     #
-    # returns:
-    #	nothing
+    # returns: the MRK_deleteWithdrawal arguments (bulk calls)
     #
     '''
 
-    global lineNum
-    global markerID
-    global symbol 
-    global jnum
-    global eventReason
-    global createdBy
-
-    # For each line in the input file
-
-    for line in inputFile.readlines():
-
-        lineNum = lineNum + 1
-
-        # Split the line into tokens
-        tokens = str.split(line[:-1], '\t')
-
-        try:
-            markerID = tokens[0]
-            symbol = tokens[1].replace("'", "''")
-            jnum = tokens[2]
-            eventReason = tokens[3]
-            createdBy = tokens[4]
-        except:
-            errorFile.write('Invalid Line (missing column(s)) (row %d): %s\n' % (lineNum, line))
-            continue
-
-        #
-        # sanity checks
-        #
-
-        if sanityCheck() == 1:
-            errorFile.write(str(tokens) + '\n\n')
-            continue
-
-        cmd = '''select * from MRK_deleteWithdrawal(%s,%s,%s,%s);\n''' \
-                % (createdByKey, markerKey, refKey, eventReasonKey)
-        diagFile.write(cmd)
-
-        if not DEBUG:
-                db.sql(cmd, None)
-                db.commit()
-
-    # end of "for line in inputFile.readlines():"
+    return (row['createdByKey'], row['markerKey'], row['refKey'], row['eventReasonKey'])
 
 #
 # Main
 #
 
-#print 'init()'
-init()
-
-#print 'verifyMode()'
-verifyMode()
-
-#print 'processFile()'
-processFile()
+if __name__ == '__main__':
+    batchengine.run(sys.modules[__name__])
@@ -6,7 +6,7 @@
 #  Purpose:
 # 	This script runs the Nomenclature Batch Delete load
 #
-  Usage=batchdelete.sh
+  Usage="batchdelete.sh config [inputfile] [--resume]"
 #
 #
 # History:
@@ -39,12 +39,20 @@ rm -rf ${DELETE_LOG_FILE} ${DELETE_LOG_PROC} ${DELETE_LOG_DIAG} ${DELETE_LOG_CUR
 
 #
 # use user-provied value or use config/default value
+# "--resume" : skip the rows committed by a previous run (see batchengine.py)
 # Make sure the input file exists (regular file or symbolic link).
 #
-if [ $# -eq 2 ] 
-then
-    DELETE_FILE_DEFAULT=$2
-fi
+RESUME=""
+shift
+for ARG in "$@"
+do
+    if [ "${ARG}" = "--resume" ]
+    then
+        RESUME="--resume"
+    else
+        DELETE_FILE_DEFAULT=${ARG}
+    fi
+done
 if [ ! -r ${DELETE_FILE_DEFAULT} ]
 then
     echo "Missing input file: ${DELETE_FILE_DEFAULT}" | tee -a ${DELETE_LOG_FILE}
@@ -78,7 +86,7 @@ fi
 #
 # dlautils/preload minus jobstream & archive
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     startLog ${DELETE_LOG_PROC} ${DELETE_LOG_DIAG} ${DELETE_LOG_CUR} ${DELETE_LOG_VAL} | tee -a ${DELETE_LOG}
     getConfigEnv >> ${DELETE_LOG_PROC}
@@ -89,12 +97,13 @@ fi
 # There should be a "lastrun.batchdelete" file in the input directory that was created
 # the last time the load was run for this input file. If this file exists
 # and is more recent than the input file, the load does not need to be run.
+# (unless a previous run is being resumed)
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     LASTRUN_FILE=${INPUTDIR}/lastrun.batchdelete
 
-    if [ -f ${LASTRUN_FILE} ]
+    if [ -f ${LASTRUN_FILE} -a "${RESUME}" = "" ]
     then
         if test ${LASTRUN_FILE} -nt ${DELETE_FILE_DEFAULT}
         then
@@ -117,7 +126,7 @@ echo "" | tee -a ${DELETE_LOG_FILE}
 date | tee -a ${DELETE_LOG_FILE}
 echo "Running batchdelete : ${NOMENMODE}" | tee -a ${DELETE_LOG_FILE}
 cd ${OUTPUTDIR}
-${PYTHON} ${NOMENLOAD}/bin/batchdelete.py | tee -a ${DELETE_LOG_DIAG}
+${PYTHON} ${NOMENLOAD}/bin/batchdelete.py ${RESUME} | tee -a ${DELETE_LOG_DIAG}
 STAT=$?
 checkStatus ${STAT} "${NOMENLOAD} ${CONFIG_FILE} : ${NOMENMODE} :"
 
@@ -141,7 +150,7 @@ esac
 # Archive : publshed only
 # dlautils/preload with archive
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     createArchive ${ARCHIVEDIR} ${DELETE_LOGDIR} ${DELETEDIR} ${OUTPUTDIR} | tee -a ${DELETE_LOG}
 fi 
@@ -149,7 +158,7 @@ fi
 #
 # Touch the "lastrun.batchdelete" file to note when the load was run.
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     touch ${LASTRUN_FILE}
 fi
@@ -165,7 +174,7 @@ date | tee -a ${DELETE_LOG_FILE}
 #
 # run postload cleanup and email logs
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     JOBKEY=0;export JOBKEY
     shutDown
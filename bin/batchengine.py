@@ -0,0 +1,651 @@
+'''
+#
+# Purpose:
+#
+#	Shared engine for the batch marker operations:
+#	    batchrename.py : MRK_simpleWithdrawal (withdrawal/rename)
+#	    batchdelete.py : MRK_deleteWithdrawal (withdrawal/delete)
+#
+#	The engine provides:
+#
+#	    init()/exit()/verifyMode()
+#	    streaming input (the input file is never read into memory)
+#	    bulk pre-validation : all MGI IDs and the markers they resolve to
+#		are looked up before the first row is processed
+#	    batched transactions : BATCH_COMMIT_SIZE rows per commit; a row
+#		whose command fails is rolled back to its savepoint and rejected,
+#		the batch continues.  The ACCESSION lock (see keylock.py) is held
+#		until the batch is committed : a smaller BATCH_COMMIT_SIZE holds
+#		it for less time, at the cost of more commits
+#	    bulk calls : with BATCH_BULK_SIZE, the stored procedure is called
+#		for BATCH_BULK_SIZE rows in one command (one round trip, one
+#		commit; see nomensql.bulkCall()), with the outcome of each row
+#	    progress metrics : rows, rows/second written to the diagnostics file
+#	    checkpoint/resume : after each commit, the last committed line and
+#		the input file digest are written to <operation>.checkpoint.
+#		with "--resume", the rows up to the checkpoint are skipped
+#		without being verified or queried.
+#
+#	A batch operation is a script module (batchrename.py, batchdelete.py)
+#	passed to run(); it defines :
+#
+#	    name : the name of the operation (used in the diagnostics file)
+#	    inputFileName, diagFileName, errorFileName : from the configuration file
+#	    parse(tokens) : returns the row dictionary; must contain
+#		markerID, symbol, jnum, eventReason, createdBy;
+#		raises an exception if the row is missing column(s)
+#	    sanityCheck(row) : the operation-specific checks (see verifyRow());
+#		returns 0 if sanity check passes, 1 if sanity check fails
+#	    command(row) : returns the SQL command of a valid row
+#	    function : the stored procedure of the operation (bulk calls)
+#	    argumentTypes : the SQL types of its arguments
+#	    arguments(row) : returns the procedure arguments of a valid row
+#	    updateMarker(row) : updates markerInfo for a row whose command
+#		succeeded, so that a later row of the same marker is checked
+#		against the marker as the command leaves it
+#
+# Input:
+#
+#	A tab-delimited file; see the batch operation
+#
+# Env Vars:
+#
+#	NOMENMODE : load, preview, validate
+#	BATCH_COMMIT_SIZE : number of rows per transaction (default 100)
+#	BATCH_BULK_SIZE : number of rows per bulk call; 0 : one command per row (default 0)
+#	BATCH_PROGRESS_SIZE : number of rows per progress message; 0 : none (default 1000)
+#	OUTPUTDIR : the directory of the checkpoint file
+#
+# Parameters:
+#
+#	--resume : skip the rows committed by a previous run of the same input file
+#
+'''
+
+import sys
+import os
+import time
+import json
+import hashlib
+import db
+import mgi_utils
+import verifycache
+import markerresolver
+import runhistory
+import keylock
+import nomensql
+import errorreport
+
+#db.setTrace()
+
+DEBUG = 0
+
+#
+# from configuration file
+#
+mode = os.environ['NOMENMODE']
+commitSize = int(os.environ.get('BATCH_COMMIT_SIZE', '100'))
+bulkSize = int(os.environ.get('BATCH_BULK_SIZE', '0') or '0')
+progressSize = int(os.environ.get('BATCH_PROGRESS_SIZE', '1000'))
+checkpointDir = os.environ.get('OUTPUTDIR', os.getcwd())
+
+resume = '--resume' in sys.argv
+warm = 0		# set by nomenqcd.py : keep the database connection and event reasons between runs
+connected = 0		# warm : the database connection is open
+
+inputFile = ''		# file descriptor
+diagFile = ''		# file descriptor
+errorFile = ''		# file descriptor
+lineNum = 0
+skipLines = 0		# number of rows committed by a previous run (--resume)
+
+checkpointFileName = ''
+inputDigest = ''
+
+eventReasonLookup = {}
+markerLookup = {}	# {MGI ID : marker key} for the input file (see markerresolver)
+markerInfo = {}		# {marker key : MRK_Marker/ALL_Allele info} for the input file
+
+def exit(status, message = None):
+    '''
+    # requires: status, the numeric exit status (integer)
+    #           message (string)
+    #
+    # effects:
+    # Print message to stderr and exits
+    #
+    # returns:
+    #
+    '''
+
+    db.commit()
+    if not warm:
+        db.useOneConnection()
+        nomensql.reset()
+
+    if message is not None:
+        sys.stderr.write('\n' + str(message) + '\n')
+
+    try:
+        inputFile.close()
+        diagFile.flush()
+        errorFile.flush()
+        diagFile.write('\n\nEnd Date/Time: %s\n' % (mgi_utils.date()))
+        errorFile.write('\n\nEnd Date/Time: %s\n' % (mgi_utils.date()))
+        diagFile.close()
+        errorFile.close()
+    except:
+        pass
+
+    runhistory.finish(status)
+
+    sys.exit(status)
+
+def reset():
+    '''
+    # requires:
+    #
+    # effects:
+    #	Resets the globals of a run (lookups of the input file, line number)
+    #	so that run() can be called more than once in a process (nomenqcd.py)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global lineNum, skipLines, markerLookup, markerInfo
+
+    lineNum = 0
+    skipLines = 0
+    markerLookup = {}
+    markerInfo = {}
+
+def init(operation):
+    '''
+    # requires: operation, the batch operation module
+    #
+    # effects:
+    # 1. Initializes local DBMS parameters (once, if warm)
+    # 2. Initializes global file descriptors/file names
+    # 3. Loads the event reason lookup (once, if warm)
+    #
+    # returns:
+    #
+    '''
+
+    global inputFile, diagFile, errorFile
+    global eventReasonLookup, connected
+
+    if not warm or not connected:
+        db.useOneConnection(1)
+        connected = 1
+
+    try:
+        inputFile = open(operation.inputFileName, 'r')
+    except:
+        exit(1, 'Could not open file %s\n' % operation.inputFileName)
+
+    try:
+        diagFile = open(operation.diagFileName, 'w')
+    except:
+        exit(1, 'Could not open file %s\n' % operation.diagFileName)
+
+    try:
+        errorFile = errorreport.ErrorReport(operation.errorFileName)
+    except:
+        exit(1, 'Could not open file %s\n' % operation.errorFileName)
+
+    if not warm or len(eventReasonLookup) == 0:
+        results = db.sql('select * from VOC_Term where _vocab_key = 34', 'auto')
+        for r in results:
+            key = r['term']
+            value = r['_term_key']
+            eventReasonLookup[key] = []
+            eventReasonLookup[key].append(value)
+    #print(eventReasonLookup)
+
+    # Log all SQL
+    db.set_sqlLogFunction(db.sqlLogAll)
+
+    # Set Log File Descriptor
+    db.set_commandLogFile(operation.diagFileName)
+
+    # Set Log File Descriptor
+    diagFile.write('Start Date/Time: %s\n' % (mgi_utils.date()))
+    diagFile.write('Server: %s\n' % (db.get_sqlServer()))
+    diagFile.write('Database: %s\n' % (db.get_sqlDatabase()))
+    diagFile.write('Input File: %s\n' % (operation.inputFileName))
+    diagFile.write('Operation: %s\n' % (operation.name))
+
+def verifyMode():
+    '''
+    # requires:
+    #
+    # effects:
+    #	Verifies the processing mode is valid.  If it is not valid,
+    #	the program is aborted.
+    #	Sets globals based on processing mode.
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global DEBUG
+
+    if mode in ['preview', 'validate']:
+        DEBUG = 1
+    elif mode not in ['load']:
+        exit(1, 'Invalid Processing Mode:  %s\n' % (mode))
+
+def fileDigest(fileName):
+    '''
+    # requires:
+    #	fileName - the input file name
+    #
+    # returns:
+    #	the sha1 digest of the file
+    #
+    '''
+
+    digest = hashlib.sha1()
+
+    with open(fileName, 'rb') as fp:
+        for block in iter(lambda: fp.read(1024 * 1024), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def initCheckpoint(operation):
+    '''
+    # requires:
+    #	operation - the batch operation module
+    #
+    # effects:
+    #	computes the input file digest
+    #	if --resume, reads the checkpoint file and sets skipLines;
+    #	exits if the checkpoint was written for a different input file
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global checkpointFileName, inputDigest, skipLines
+
+    checkpointFileName = os.path.join(checkpointDir, operation.name + '.checkpoint')
+    inputDigest = fileDigest(operation.inputFileName)
+
+    if not os.path.exists(checkpointFileName):
+        if resume:
+            diagFile.write('Resume: no checkpoint file %s; starting at row 1\n' % (checkpointFileName))
+        return
+
+    with open(checkpointFileName, 'r') as fp:
+        checkpoint = json.load(fp)
+
+    if not resume:
+        diagFile.write('Checkpoint file %s (row %d) ignored; use --resume to skip committed rows\n' \
+                % (checkpointFileName, checkpoint['lineNum']))
+        return
+
+    if checkpoint['digest'] != inputDigest:
+        exit(1, 'Checkpoint %s does not match input file %s\n' % (checkpointFileName, operation.inputFileName))
+
+    skipLines = checkpoint['lineNum']
+    diagFile.write('Resume: skipping rows 1-%d (committed by a previous run)\n' % (skipLines))
+
+def writeCheckpoint():
+    '''
+    # requires:
+    #
+    # effects:
+    #	writes the last committed line and the input file digest
+    #	to the checkpoint file (written to a temporary file, then renamed)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    with open(checkpointFileName + '.tmp', 'w') as fp:
+        json.dump({'inputFile' : inputFile.name, 'digest' : inputDigest, 'lineNum' : lineNum}, fp)
+    os.rename(checkpointFileName + '.tmp', checkpointFileName)
+
+def prevalidate():
+    '''
+    # requires:
+    #
+    # effects:
+    #	Bulk pre-validation of the input file:
+    #	1. streams the input file and resolves all of its MGI IDs (markerLookup)
+    #	   (except the rows skipped by --resume)
+    #	2. loads the symbol, status and number of alleles of each
+    #	   resolved marker (markerInfo); markerInfo is updated by each
+    #	   accepted row (see updateMarker() in the Purpose)
+    #	Rewinds the input file.
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global markerLookup, markerInfo
+
+    mgiIDs = []
+    for i, line in enumerate(inputFile):
+        if i >= skipLines:
+            mgiIDs.append(str.split(line[:-1], '\t')[0])
+    inputFile.seek(0)
+
+    markerLookup, invalidList = markerresolver.resolveMarkers(mgiIDs)
+    diagFile.write('Invalid MGI IDs: %s\n' % (', '.join(invalidList)))
+
+    markerKeys = list(set(markerLookup.values()))
+    chunkSize = markerresolver.chunkSize
+
+    for i in range(0, len(markerKeys), chunkSize):
+        results = nomensql.execute('markerInfo', markerKeys[i:i + chunkSize])
+
+        for r in results:
+            markerInfo[r['_Marker_key']] = r
+
+def verifyRow(operation, row):
+    '''
+    # requires:
+    #	operation - the batch operation module
+    #	row - the row dictionary (see parse() in the Purpose)
+    #
+    # effects:
+    #	Verifies the MGI ID, J:, Event Reason and User of the row
+    #	and sets the row's markerKey, refKey, eventReasonKey, createdByKey.
+    #	Runs the operation-specific sanity checks.
+    #
+    # returns:
+    #	0 if sanity check passes
+    #	1 if sanity check fails
+    #
+    '''
+
+    error = 0
+
+    if row['markerID'] in markerLookup:
+        row['markerKey'] = markerLookup[row['markerID']]
+    else:
+        errorFile.write('Invalid Marker ID (row %d): %s\n' % (lineNum, row['markerID']))
+        row['markerKey'] = 0
+
+    row['refKey'] = verifycache.verifyReference(row['jnum'], lineNum, None)
+    row['createdByKey'] = verifycache.verifyUser(row['createdBy'], lineNum, None)
+
+    if row['eventReason'] not in eventReasonLookup:
+        row['eventReasonKey'] = 0
+    else:
+        row['eventReasonKey'] = eventReasonLookup[row['eventReason']][0]
+
+    if operation.sanityCheck(row) == 1:
+        error = 1
+
+    if row['markerKey'] == 0 or \
+       row['refKey'] == 0 or \
+       row['eventReasonKey'] == 0 or \
+       row['createdByKey'] == 0:
+        error = 1
+
+    return (error)
+
+def writeProgress(message, rowCount, startTime):
+    '''
+    # requires:
+    #	message (string)
+    #	rowCount - the number of rows processed
+    #	startTime - the start time of processFile()
+    #
+    # effects:
+    #	writes the number of rows and rows/second to the diagnostics file
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    elapsed = time.time() - startTime
+    rate = 0
+    if elapsed > 0:
+        rate = rowCount / elapsed
+
+    diagFile.write('%s: %d rows, %.2f seconds, %.2f rows/second\n' % (message, rowCount, elapsed, rate))
+    diagFile.flush()
+
+def processBulk(operation, rows):
+    '''
+    # requires:
+    #	operation - the batch operation module
+    #	rows - [(line number, row dictionary), ...] : the valid rows
+    #
+    # effects:
+    #	calls the stored procedure of the operation for the rows in one
+    #	command (see nomensql.bulkCall()) and commits it (under the
+    #	ACCESSION lock; see keylock.py); writes the checkpoint
+    #	the rows that failed (rolled back one by one) are written to the error file;
+    #	markerInfo is updated for the rows that succeeded (see updateMarker() in the Purpose)
+    #
+    # returns:
+    #	the number of rows that failed
+    #
+    '''
+
+    cmd = nomensql.bulkCall(operation.function, operation.argumentTypes,
+        [(lineNum,) + tuple(operation.arguments(row)) for lineNum, row in rows])
+    diagFile.write(cmd)
+
+    if DEBUG:
+        for lineNum, row in rows:
+            operation.updateMarker(row)
+        return 0
+
+    keylock.lock(keylock.ACCESSION)
+    results = db.sql(cmd, 'auto')
+    db.commit()
+    keylock.unlock(keylock.ACCESSION)
+    writeCheckpoint()
+
+    failedLines = set()
+
+    for r in results:
+        if r['status'] != 'ok':
+            errorFile.write('%s failed (row %d): %s\n\n' % (operation.function, r['lineNum'], r['message']))
+            failedLines.add(r['lineNum'])
+
+    for lineNum, row in rows:
+        if lineNum not in failedLines:
+            operation.updateMarker(row)
+
+    failed = len(failedLines)
+
+    diagFile.write('%s: %d rows, %d failed\n' % (operation.function, len(rows), failed))
+
+    return failed
+
+def processFile(operation):
+    '''
+    # requires:
+    #	operation - the batch operation module
+    #
+    # effects:
+    #	Reads input file
+    #	Verifies and Processes each line in the input file
+    #	Commits every BATCH_COMMIT_SIZE commands and writes the checkpoint
+    #	(under the ACCESSION lock; see keylock.py); each command has its own
+    #	savepoint, so a command that fails rejects its row only
+    #	or calls the stored procedure for every BATCH_BULK_SIZE rows (see processBulk())
+    #	Skips the rows committed by a previous run (--resume)
+    #	Removes the checkpoint when the input file is complete
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global lineNum
+
+    startTime = time.time()
+    accepted = 0
+    rejected = 0
+    pending = 0
+    bulkRows = []
+    bulkMarkers = set()	# the markers of bulkRows
+    bulk = bulkSize > 0
+
+    # For each line in the input file
+
+    for line in inputFile:
+
+        lineNum = lineNum + 1
+
+        if lineNum <= skipLines:
+            continue
+
+        # Split the line into tokens
+        tokens = str.split(line[:-1], '\t')
+
+        try:
+            row = operation.parse(tokens)
+        except:
+            errorFile.write('Invalid Line (missing column(s)) (row %d): %s\n' % (lineNum, line))
+            rejected = rejected + 1
+            continue
+
+        #
+        # a row of a marker in the pending bulk call is checked against
+        # the marker as the bulk call leaves it : the bulk call is made first
+        #
+
+        if bulk and markerLookup.get(row['markerID']) in bulkMarkers:
+            failed = processBulk(operation, bulkRows)
+            accepted = accepted - failed
+            rejected = rejected + failed
+            bulkRows = []
+            bulkMarkers = set()
+
+        #
+        # sanity checks
+        #
+
+        if verifyRow(operation, row) == 1:
+            errorFile.write(str(tokens) + '\n\n')
+            rejected = rejected + 1
+            continue
+
+        accepted = accepted + 1
+
+        if bulk:
+            bulkRows.append((lineNum, row))
+            bulkMarkers.add(row['markerKey'])
+
+            if len(bulkRows) >= bulkSize:
+                failed = processBulk(operation, bulkRows)
+                accepted = accepted - failed
+                rejected = rejected + failed
+                bulkRows = []
+                bulkMarkers = set()
+
+            if progressSize > 0 and lineNum % progressSize == 0:
+                writeProgress('Progress', lineNum - skipLines, startTime)
+
+            continue
+
+        cmd = operation.command(row)
+        diagFile.write(cmd)
+
+        if not DEBUG:
+            # the stored procedures may add accession rows (max + 1) :
+            # the ACCESSION lock is held until the batch is committed
+            if pending == 0:
+                keylock.lock(keylock.ACCESSION)
+
+            # each row has its own savepoint : a row that fails is rolled
+            # back and rejected, the other rows of the batch are kept
+            try:
+                db.sql('savepoint batchrow;\n%srelease savepoint batchrow;\n' % (cmd), None)
+            except Exception as e:
+                db.sql('rollback to savepoint batchrow', None)
+                errorFile.write('%s failed (row %d): %s\n\n' % (operation.function, lineNum, str(e).strip()))
+                accepted = accepted - 1
+                rejected = rejected + 1
+                row = None
+
+            pending = pending + 1
+
+            if pending >= commitSize:
+                db.commit()
+                keylock.unlock(keylock.ACCESSION)
+                writeCheckpoint()
+                pending = 0
+
+        # the marker as the command of the row leaves it (see sanityCheck())
+        if row is not None:
+            operation.updateMarker(row)
+
+        if progressSize > 0 and lineNum % progressSize == 0:
+            writeProgress('Progress', lineNum - skipLines, startTime)
+
+    # end of "for line in inputFile:"
+
+    if pending > 0:
+        db.commit()
+        keylock.unlock(keylock.ACCESSION)
+
+    if len(bulkRows) > 0:
+        failed = processBulk(operation, bulkRows)
+        accepted = accepted - failed
+        rejected = rejected + failed
+
+    if not DEBUG and os.path.exists(checkpointFileName):
+        os.remove(checkpointFileName)
+
+    writeProgress('Total', lineNum - skipLines, startTime)
+    runhistory.setCount('inputRows', lineNum - skipLines)
+    runhistory.setCount('acceptedRows', accepted)
+    runhistory.setCount('rejectedRows', rejected)
+    diagFile.write('Accepted: %d rows, Rejected: %d rows\n' % (accepted, rejected))
+    verifycache.writeStats(diagFile)
+
+def run(operation):
+    '''
+    # requires:
+    #	operation - the batch operation module
+    #
+    # effects:
+    #	Runs the batch operation and exits
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    reset()
+
+    runhistory.start(operation.name, operation.inputFileName)
+
+    #print 'init()'
+    with runhistory.phase('init'):
+        init(operation)
+
+    #print 'verifyMode()'
+    verifyMode()
+
+    #print 'initCheckpoint()'
+    initCheckpoint(operation)
+
+    #print 'prevalidate()'
+    with runhistory.phase('prevalidate'):
+        prevalidate()
+
+    #print 'processFile()'
+    with runhistory.phase('processFile'):
+        processFile(operation)
+
+    exit(0)
+
@@ -6,7 +6,7 @@
 #  Purpose:
 # 	This script runs the Nomenclature Batch Rename load
 #
-  Usage=batchrename.sh
+  Usage="batchrename.sh config [inputfile] [--resume]"
 #
 #  Env Vars:
 #
@@ -76,12 +76,20 @@ rm -rf ${RENAME_LOG_FILE} ${RENAME_LOG_PROC} ${RENAME_LOG_DIAG} ${RENAME_LOG_CUR
 
 #
 # use user-provied value or use config/default value
+# "--resume" : skip the rows committed by a previous run (see batchengine.py)
 # Make sure the input file exists (regular file or symbolic link).
 #
-if [ $# -eq 2 ] 
-then
-    RENAME_FILE_DEFAULT=$2
-fi
+RESUME=""
+shift
+for ARG in "$@"
+do
+    if [ "${ARG}" = "--resume" ]
+    then
+        RESUME="--resume"
+    else
+        RENAME_FILE_DEFAULT=${ARG}
+    fi
+done
 if [ ! -r ${RENAME_FILE_DEFAULT} ]
 then
     echo "Missing input file: ${RENAME_FILE_DEFAULT}" | tee -a ${RENAME_LOG_FILE}
@@ -115,7 +123,7 @@ fi
 #
 # dlautils/preload minus jobstream & archive
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     startLog ${RENAME_LOG_PROC} ${RENAME_LOG_DIAG} ${RENAME_LOG_CUR} ${RENAME_LOG_VAL} | tee -a ${RENAME_LOG}
     getConfigEnv >> ${RENAME_LOG_PROC}
@@ -126,12 +134,13 @@ fi
 # There should be a "lastrun.batchrename" file in the input directory that was created
 # the last time the load was run for this input file. If this file exists
 # and is more recent than the input file, the load does not need to be run.
+# (unless a previous run is being resumed)
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     LASTRUN_FILE=${INPUTDIR}/lastrun.batchrename
 
-    if [ -f ${LASTRUN_FILE} ]
+    if [ -f ${LASTRUN_FILE} -a "${RESUME}" = "" ]
     then
         if test ${LASTRUN_FILE} -nt ${RENAME_FILE_DEFAULT}
         then
@@ -154,7 +163,7 @@ echo "" | tee -a ${RENAME_LOG_FILE}
 date | tee -a ${RENAME_LOG_FILE}
 echo "Running batchrename : ${NOMENMODE}" | tee -a ${RENAME_LOG_FILE}
 cd ${OUTPUTDIR}
-${PYTHON} ${NOMENLOAD}/bin/batchrename.py | tee -a ${RENAME_LOG_DIAG}
+${PYTHON} ${NOMENLOAD}/bin/batchrename.py ${RESUME} | tee -a ${RENAME_LOG_DIAG}
 STAT=$?
 checkStatus ${STAT} "${NOMENLOAD} ${CONFIG_FILE} : ${NOMENMODE} :"
 
@@ -178,7 +187,7 @@ esac
 # Archive : publshed only
 # dlautils/preload with archive
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     createArchive ${ARCHIVEDIR} ${RENAME_LOGDIR} ${RENAMEDIR} ${OUTPUTDIR} | tee -a ${RENAME_LOG}
 fi 
@@ -186,7 +195,7 @@ fi
 #
 # Touch the "lastrun.batchrename" file to note when the load was run.
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     touch ${LASTRUN_FILE}
 fi
@@ -202,7 +211,7 @@ date | tee -a ${RENAME_LOG_FILE}
 #
 # run postload cleanup and email logs
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     JOBKEY=0;export JOBKEY
     shutDown
@@ -0,0 +1,190 @@
+'''
+#
+# Purpose:
+#
+#	Compares two nomenload output sets, table by table : used to check
+#	that a changed (faster) nomenload writes the same output as the
+#	current one.
+#
+#	Run both versions in deterministic output mode (preview mode with
+#	NOMEN_FIXED_KEY and NOMEN_FIXED_DATE; see nomenload.py) on the same
+#	input, each with its own output directory, and copy the .out and
+#	mapping files into the output directory.
+#
+#	The files compared are the bcp files (*.bcp), the .out files (*.out)
+#	and the mapping files (*.mapping, *.mapping.J<number>) of either directory.
+#	For each file :
+#
+#	    identical : the files are byte-for-byte identical
+#	    reordered : the same rows, in a different order
+#	    different : the rows only in the 1st/2nd file (first N of each)
+#	    missing   : the file is not in one of the directories
+#
+# Usage:
+#
+#	bcpcompare.py [--unordered] [--max N] output_dir_1 output_dir_2
+#
+#	--unordered : "reordered" files are not differences
+#	--max N : the number of rows shown per difference (default 10)
+#
+# Exit Codes:
+#
+#	0 : the output sets are the same
+#	1 : the output sets are different
+#	2 : invalid arguments
+#
+'''
+
+import sys
+import os
+import re
+import getopt
+import collections
+
+# bcp files, .out files, mapping files (MAPPINGDATAFILE, MAPPINGDATAFILE.J<number>)
+outputPattern = re.compile(r'(\.bcp|\.out|\.mapping|\.mapping\.J\d+)$')
+
+maxRows = 10
+unordered = 0
+
+def outputFiles(dirName):
+    '''
+    # requires:
+    #	dirName - an output directory
+    #
+    # returns:
+    #	the names of the output files in the directory
+    #	(bcp, .out and mapping files)
+    #
+    '''
+
+    fileNames = set()
+
+    for fileName in os.listdir(dirName):
+        if outputPattern.search(fileName):
+            fileNames.add(fileName)
+
+    return fileNames
+
+def readRows(fileName):
+    '''
+    # requires:
+    #	fileName - an output file
+    #
+    # returns:
+    #	the rows of the file (bytes, without the line terminator)
+    #
+    '''
+
+    with open(fileName, 'rb') as fp:
+        return fp.read().splitlines()
+
+def compareFile(fileName1, fileName2):
+    '''
+    # requires:
+    #	fileName1, fileName2 - the files to compare
+    #
+    # returns:
+    #	(result, report lines) where result is
+    #	identical, reordered or different
+    #
+    '''
+
+    rows1 = readRows(fileName1)
+    rows2 = readRows(fileName2)
+
+    report = ['rows : %d / %d' % (len(rows1), len(rows2))]
+
+    if rows1 == rows2:
+        return 'identical', report
+
+    counts1 = collections.Counter(rows1)
+    counts2 = collections.Counter(rows2)
+
+    if counts1 == counts2:
+        for lineNum in range(len(rows1)):
+            if rows1[lineNum] != rows2[lineNum]:
+                report.append('first reordered row : %d' % (lineNum + 1))
+                break
+        return 'reordered', report
+
+    only1 = list((counts1 - counts2).elements())
+    only2 = list((counts2 - counts1).elements())
+
+    for label, rows in (('< only in 1st', only1), ('> only in 2nd', only2)):
+        report.append('%s : %d rows' % (label, len(rows)))
+        for row in rows[:maxRows]:
+            report.append('  %s' % (row.decode('utf-8', 'replace')))
+        if len(rows) > maxRows:
+            report.append('  ...')
+
+    return 'different', report
+
+def compare(dirName1, dirName2):
+    '''
+    # requires:
+    #	dirName1, dirName2 - the output directories to compare
+    #
+    # effects:
+    #	writes the comparison of each output file to stdout
+    #
+    # returns:
+    #	the number of output files that are different (or missing)
+    #
+    '''
+
+    files1 = outputFiles(dirName1)
+    files2 = outputFiles(dirName2)
+    differences = 0
+
+    for fileName in sorted(files1 | files2):
+
+        if fileName not in files1 or fileName not in files2:
+            where = dirName1 if fileName in files1 else dirName2
+            print('%-40s missing (only in %s)' % (fileName, where))
+            differences = differences + 1
+            continue
+
+        result, report = compareFile(os.path.join(dirName1, fileName), os.path.join(dirName2, fileName))
+        print('%-40s %s' % (fileName, result))
+
+        if result != 'identical':
+            for line in report:
+                print('    %s' % (line))
+
+        if result == 'different' or (result == 'reordered' and not unordered):
+            differences = differences + 1
+
+    return differences
+
+#
+# Main
+#
+
+if __name__ == '__main__':
+
+    usage = 'Usage: bcpcompare.py [--unordered] [--max N] output_dir_1 output_dir_2\n'
+
+    try:
+        options, args = getopt.getopt(sys.argv[1:], '', ['unordered', 'max='])
+        for option, value in options:
+            if option == '--unordered':
+                unordered = 1
+            elif option == '--max':
+                maxRows = int(value)
+    except (getopt.GetoptError, ValueError):
+        sys.stderr.write(usage)
+        sys.exit(2)
+
+    if len(args) != 2 or not os.path.isdir(args[0]) or not os.path.isdir(args[1]):
+        sys.stderr.write(usage)
+        sys.exit(2)
+
+    differences = compare(args[0], args[1])
+
+    print('\n%d file(s) different' % (differences))
+
+    if differences > 0:
+        sys.exit(1)
+
+    sys.exit(0)
@@ -0,0 +1,218 @@
+'''
+#
+# Purpose:
+#
+#	BCP manifest for the nomenload bcp stage
+#
+#	The manifest (JSON) records the input file(s) and, for each table
+#	to be loaded, the bcp file, its checksum, its row count and its
+#	load status:
+#
+#	    pending : not loaded
+#	    loaded : bcp completed
+#	    failed : bcp failed (or the bcp file has changed)
+#
+#	and the status of the sequence fix-ups (ACC_setMax/setval) that are
+#	run once, after all tables have been loaded (skipped if the keys were
+#	reserved : 'keysReserved', see keylock.py).
+#
+#	The manifest is written after each table, so a failed bcp stage can
+#	be resumed : only the tables that are not "loaded" are loaded again.
+#
+#	A chunked load (NOMEN_BCP_CHUNK_ROWS) also records, for each table,
+#	the rows loaded and the key of the last committed chunk; it is
+#	resumed after the last key of the bcp file (firstKey, lastKey) whose
+#	row in the database is a row of this load (see pgcopy.IDENTITY).
+#
+#	The manifest also lists the mapping files of the run (one per
+#	reference), for the mappingload (see nomenjob.py), and the format
+#	of the bcp files (text, binary; see pgcopy.py), and the load ledger
+#	rows of the run ('ledgerRows' : [row hash, symbol, marker key, MGI ID];
+#	see loadledger.py), recorded when the resumed bcp stage completes.
+#
+#	Usage:
+#	    manifest = bcpmanifest.create(inputFileNames, [(table, bcp file), ...], mgiCount, mappingFileNames, bcpFormat)
+#	    bcpmanifest.write(manifestFileName, manifest)
+#	    ...
+#	    manifest = bcpmanifest.read(manifestFileName)
+#
+'''
+
+import os
+import json
+import hashlib
+import mgi_utils
+import pgcopy
+
+PENDING = 'pending'
+LOADED = 'loaded'
+FAILED = 'failed'
+
+def checksum(fileName):
+    '''
+    # requires:
+    #	fileName - the file name
+    #
+    # returns:
+    #	the sha1 digest of the file
+    #
+    '''
+
+    return inputChecksum([fileName])
+
+def inputChecksum(fileNames):
+    '''
+    # requires:
+    #	fileNames - the input file names
+    #
+    # returns:
+    #	the sha1 digest of the input files (in order)
+    #
+    '''
+
+    digest = hashlib.sha1()
+
+    for fileName in fileNames:
+        with open(fileName, 'rb') as fp:
+            for block in iter(lambda: fp.read(1024 * 1024), b''):
+                digest.update(block)
+
+    return digest.hexdigest()
+
+def rowKeys(fileName, bcpFormat):
+    '''
+    # requires:
+    #	fileName - the bcp file name
+    #	bcpFormat - the format of the bcp file (text, binary)
+    #
+    # returns:
+    #	(rows, first key, last key) of the file
+    #	(the keys are None if the file is empty)
+    #
+    '''
+
+    count = 0
+    firstKey = None
+    lastKey = None
+
+    for key, row in pgcopy.readRows(fileName, bcpFormat):
+        if firstKey is None:
+            firstKey = key
+        lastKey = key
+        count = count + 1
+
+    return count, firstKey, lastKey
+
+def create(inputFileNames, tables, mgiCount, mappingFileNames = [], bcpFormat = 'text'):
+    '''
+    # requires:
+    #	inputFileNames - the input files of the load
+    #	tables - [(table name, bcp file name), ...] in load order
+    #	mgiCount - the number of MGI ids created (for ACC_setMax)
+    #	mappingFileNames - the mapping files of the load
+    #	bcpFormat - the format of the bcp files (text, binary)
+    #
+    # effects:
+    #	computes the checksum, row count and key range of each bcp file
+    #
+    # returns:
+    #	the manifest (dictionary); every table is "pending"
+    #
+    '''
+
+    manifest = {
+        'inputFiles' : list(inputFileNames),
+        'inputChecksum' : inputChecksum(inputFileNames),
+        'createDate' : mgi_utils.date(),
+        'mgiCount' : mgiCount,
+        'mappingFiles' : list(mappingFileNames),
+        'format' : bcpFormat,
+        'tables' : [],
+        'fixups' : PENDING,
+    }
+
+    for table, fileName in tables:
+        rows, firstKey, lastKey = rowKeys(fileName, bcpFormat)
+        manifest['tables'].append({
+            'table' : table,
+            'file' : fileName,
+            'checksum' : checksum(fileName),
+            'rows' : rows,
+            'firstKey' : firstKey,
+            'lastKey' : lastKey,
+            'status' : PENDING,
+        })
+
+    return manifest
+
+def read(fileName):
+    '''
+    # requires:
+    #	fileName - the manifest file name
+    #
+    # returns:
+    #	the manifest (dictionary)
+    #	None if the manifest file does not exist
+    #
+    '''
+
+    if not os.path.exists(fileName):
+        return None
+
+    with open(fileName, 'r') as fp:
+        return json.load(fp)
+
+def write(fileName, manifest):
+    '''
+    # requires:
+    #	fileName - the manifest file name
+    #	manifest - the manifest (dictionary)
+    #
+    # effects:
+    #	writes the manifest (written to a temporary file, then renamed)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    manifest['updateDate'] = mgi_utils.date()
+
+    with open(fileName + '.tmp', 'w') as fp:
+        json.dump(manifest, fp, indent = 1)
+    os.rename(fileName + '.tmp', fileName)
+
+def isComplete(manifest):
+    '''
+    # requires:
+    #	manifest - the manifest (dictionary)
+    #
+    # returns:
+    #	1 if all tables are loaded and the fix-ups have been run, else 0
+    #
+    '''
+
+    for entry in manifest['tables']:
+        if entry['status'] != LOADED:
+            return 0
+
+    return manifest['fixups'] == LOADED
+
+def isIncomplete(fileName):
+    '''
+    # requires:
+    #	fileName - the manifest file name
+    #
+    # returns:
+    #	1 if the manifest file exists and its bcp stage is not complete
+    #	(i.e. a failed bcp stage that should be resumed), else 0
+    #
+    '''
+
+    try:
+        manifest = read(fileName)
+    except:
+        return 0
+
+    return manifest is not None and not isComplete(manifest)
+
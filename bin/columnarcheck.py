@@ -0,0 +1,129 @@
+'''
+#
+# Purpose:
+#
+#	Optional columnar (NumPy) validation of a nomenload input file.
+#
+#	The 11 input columns are parsed into arrays, and the dictionary
+#	checks of nomenload.sanityCheck() are run once per column using
+#	vectorized lookups (each distinct value is looked up once):
+#
+#	    Marker Type, Marker Status, Chromosome, MCV Term
+#
+#	The number of accession ids and synonyms of each row is computed
+#	in the same pass.  The accession id checks (Logical DB, sequence
+#	associations) and the DB-dependent checks (J:, user, duplicate
+#	symbol) remain per-row in nomenload.py.
+#
+#	NumPy is optional : if it is not installed, available() returns 0
+#	and nomenload uses the row-at-a-time checks.
+#
+'''
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+columnNames = ['markerType', 'symbol', 'name', 'chromosome', 'markerStatus', 'jnum',
+               'synonyms', 'otherAccIDs', 'mcvTerm', 'notes', 'createdBy']
+
+def available():
+    '''
+    # returns:
+    #	1 if NumPy is installed, else 0
+    '''
+
+    return numpy is not None
+
+def parseColumns(lines):
+    '''
+    # requires:
+    #	lines - the lines of the input file
+    #
+    # effects:
+    #	splits each line into the 11 input columns
+    #	(missing columns are set to '')
+    #
+    # returns:
+    #	columns : {column name : numpy array}
+    #	valid : numpy boolean array; 1 if the row has all 11 columns
+    #
+    '''
+
+    rows = [str.split(line[:-1], '\t') for line in lines]
+    columns = {}
+
+    valid = numpy.fromiter((len(t) >= len(columnNames) for t in rows), dtype = bool, count = len(rows))
+
+    for i, columnName in enumerate(columnNames):
+        columns[columnName] = numpy.array([t[i] if len(t) > i else '' for t in rows], dtype = object)
+
+    return columns, valid
+
+def lookupKeys(column, lookupDict):
+    '''
+    # requires:
+    #	column - numpy array of values
+    #	lookupDict - {value : key}
+    #
+    # effects:
+    #	looks up each distinct value of the column once
+    #
+    # returns:
+    #	numpy array of keys (0 if the value is not in lookupDict)
+    #
+    '''
+
+    if len(column) == 0:
+        return numpy.zeros(0, dtype = numpy.int64)
+
+    uniques, inverse = numpy.unique(column, return_inverse = True)
+    keys = numpy.array([lookupDict.get(u, 0) for u in uniques], dtype = numpy.int64)
+
+    return keys[inverse]
+
+def countItems(column):
+    '''
+    # requires:
+    #	column - numpy array of "|"-separated lists
+    #
+    # returns:
+    #	numpy array of the number of non-empty items in each row
+    #
+    '''
+
+    return numpy.fromiter((sum(1 for o in str.split(v, '|') if len(o) > 0) for v in column),
+                dtype = numpy.int64, count = len(column))
+
+def check(lines, markerTypeDict, statusDict, chromosomeDict, mcvDict):
+    '''
+    # requires:
+    #	lines - the lines of the input file
+    #	markerTypeDict, statusDict, chromosomeDict, mcvDict :
+    #		the nomenload lookup dictionaries {value : key}
+    #
+    # effects:
+    #	runs the columnar checks
+    #
+    # returns:
+    #	dictionary of numpy arrays, one entry per input row:
+    #	    valid : 1 if the row has all 11 columns
+    #	    markerTypeKey, markerStatusKey, chromosomeKey, mcvTermKey : 0 if invalid
+    #	    accCount, synCount : number of accession ids/synonyms
+    #
+    '''
+
+    columns, valid = parseColumns(lines)
+
+    results = {}
+    results['valid'] = valid
+    results['markerTypeKey'] = lookupKeys(columns['markerType'], markerTypeDict)
+    results['markerStatusKey'] = lookupKeys(columns['markerStatus'], statusDict)
+    results['chromosomeKey'] = lookupKeys(columns['chromosome'], chromosomeDict)
+    results['mcvTermKey'] = lookupKeys(columns['mcvTerm'], mcvDict)
+    results['accCount'] = countItems(columns['otherAccIDs'])
+    results['synCount'] = countItems(columns['synonyms'])
+
+    return results
+
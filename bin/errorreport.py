@@ -0,0 +1,265 @@
+'''
+#
+# Purpose:
+#
+#	Aggregated error file for the nomen jobs (nomenload.py, batchengine.py)
+#
+#	ErrorReport is a file-like object (write, flush, close) that replaces
+#	the error file.  The sanity check messages :
+#
+#	    <type> (row <n>): <value>
+#
+#	are grouped by type and value, and the rejected rows that follow a
+#	message (str(tokens)) are kept as examples of its group.  The number
+#	of rows and values of each type is written first :
+#
+#	    Invalid Chromosome : 1000 rows, 1 values
+#
+#	then each group, once, in the order it was first seen, with its rows:
+#
+#	    Invalid Chromosome (1000 rows: 4, 5, 9, 12, 13, ...): 99
+#	    ['Gene', 'Abc1', ...]		(at most NOMEN_ERROR_EXAMPLES)
+#
+#	(a message of a single row is written as is), and at most
+#	NOMEN_ERROR_VALUES values of each type are written, followed by a count
+#	of the others.  The groups are written when a line that is not a
+#	message is written (Start file, End file, ...) and on close.
+#	The error files that are still open when the job ends (an exception,
+#	sys.exit() without close) are closed by closeAll() (atexit), so their
+#	messages are written; a long-running process (nomenqcd.py) calls
+#	closeAll() itself after a failed job.
+#
+#	With NOMEN_ERROR_STREAM=1, every message and rejected row is also
+#	written, as written by the job, to <error file>.jsonl (JSON Lines) :
+#
+#	    {"row": 4, "type": "Invalid Chromosome", "value": "99"}
+#	    {"row": 4, "tokens": "['Gene', 'Abc1', ...]"}
+#
+#	Usage:
+#	    errorFile = errorreport.ErrorReport(errorFileName)
+#	    errorFile.write('Invalid Chromosome (row %d): %s\n' % (lineNum, chromosome))
+#	    errorFile.close()
+#
+# Env Vars:
+#
+#	NOMEN_ERROR_EXAMPLES : rejected rows written per group (default 3)
+#	NOMEN_ERROR_VALUES : values written per message type (default 20)
+#	NOMEN_ERROR_STREAM : 1 if the JSON Lines error stream is written (default 0)
+#
+'''
+
+import os
+import re
+import json
+import atexit
+
+maxExamples = int(os.environ.get('NOMEN_ERROR_EXAMPLES', '3'))
+maxValues = int(os.environ.get('NOMEN_ERROR_VALUES', '20'))
+stream = int(os.environ.get('NOMEN_ERROR_STREAM', '0') or '0')
+
+# rows listed per group
+maxRows = 10
+
+messagePattern = re.compile(r'^(?P<type>.+?) \(row (?P<row>\d+)\): (?P<value>.*)$')
+
+openReports = set()	# the error files not closed yet
+
+class ErrorReport:
+    '''
+    # the error file of a job (see the Purpose)
+    #
+    # groups : {(type, value) : group} in the order first seen;
+    #	a group is {'type', 'value', 'count', 'rows', 'examples'}
+    # last : the group of the last message (the rejected row that
+    #	follows it is an example of the group)
+    '''
+
+    def __init__(self, fileName):
+        self.name = fileName
+        self.fp = open(fileName, 'w')
+        self.streamFile = None
+        self.buffer = ''
+        self.groups = {}
+        self.last = None
+        self.lastRow = None
+
+        if stream:
+            self.streamFile = open(fileName + '.jsonl', 'w')
+
+        openReports.add(self)
+
+    def write(self, text):
+        '''
+        # requires:
+        #	text - the text written by the job (any number of lines)
+        #
+        # effects:
+        #	each complete line is written (see writeLine())
+        #
+        '''
+
+        self.buffer = self.buffer + text
+
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            self.writeLine(line)
+
+    def writeLine(self, line):
+        '''
+        # requires:
+        #	line - a line written by the job (without the newline)
+        #
+        # effects:
+        #	a message is added to its group; a rejected row is an example
+        #	of the last group; a blank line after a message is dropped;
+        #	any other line writes the groups, then the line
+        #
+        '''
+
+        match = messagePattern.match(line)
+
+        if match is not None:
+            key = (match.group('type'), match.group('value'))
+            row = int(match.group('row'))
+
+            if key not in self.groups:
+                self.groups[key] = {'type' : key[0], 'value' : key[1], 'count' : 0, 'rows' : [], 'examples' : []}
+
+            group = self.groups[key]
+            group['count'] = group['count'] + 1
+            if len(group['rows']) < maxRows:
+                group['rows'].append(row)
+
+            self.last = group
+            self.lastRow = row
+            self.writeStream({'row' : row, 'type' : key[0], 'value' : key[1]})
+            return
+
+        if self.last is not None and line.startswith('['):
+            if len(self.last['examples']) < maxExamples:
+                self.last['examples'].append(line)
+            self.writeStream({'row' : self.lastRow, 'tokens' : line})
+            return
+
+        if self.last is not None and len(line.strip()) == 0:
+            return
+
+        self.writeGroups()
+        self.fp.write(line + '\n')
+
+    def writeStream(self, record):
+        '''
+        # requires:
+        #	record - the message or rejected row (dictionary)
+        #
+        # effects:
+        #	writes the record to the JSON Lines stream, if any
+        #
+        '''
+
+        if self.streamFile is not None:
+            self.streamFile.write(json.dumps(record) + '\n')
+
+    def writeGroups(self):
+        '''
+        # effects:
+        #	writes the groups (see the Purpose) and clears them
+        #
+        '''
+
+        values = {}		# {type : number of values}
+        hidden = {}		# {type : [values, rows]} not written
+        totals = {}		# {type : [values, rows]}
+
+        for group in self.groups.values():
+            counts = totals.setdefault(group['type'], [0, 0])
+            counts[0] = counts[0] + 1
+            counts[1] = counts[1] + group['count']
+
+        for messageType in totals:
+            self.fp.write('%s : %d rows, %d values\n' % (messageType, totals[messageType][1], totals[messageType][0]))
+
+        if len(totals) > 0:
+            self.fp.write('\n')
+
+        for group in self.groups.values():
+            values[group['type']] = values.get(group['type'], 0) + 1
+
+            if values[group['type']] > maxValues:
+                counts = hidden.setdefault(group['type'], [0, 0])
+                counts[0] = counts[0] + 1
+                counts[1] = counts[1] + group['count']
+                continue
+
+            if group['count'] == 1:
+                self.fp.write('%s (row %d): %s\n' % (group['type'], group['rows'][0], group['value']))
+            else:
+                rows = ', '.join([str(r) for r in group['rows']])
+                if group['count'] > len(group['rows']):
+                    rows = rows + ', ...'
+                self.fp.write('%s (%d rows: %s): %s\n' % (group['type'], group['count'], rows, group['value']))
+
+            for example in group['examples']:
+                self.fp.write(example + '\n')
+
+            self.fp.write('\n')
+
+        for messageType in hidden:
+            self.fp.write('%s : %d more values (%d rows)\n\n' % (messageType, hidden[messageType][0], hidden[messageType][1]))
+
+        self.groups = {}
+        self.last = None
+        self.lastRow = None
+
+    def flush(self):
+        '''
+        # effects:
+        #	flushes the error file (and stream); the groups are not
+        #	written until the next line that is not a message, or close
+        #
+        '''
+
+        self.fp.flush()
+        if self.streamFile is not None:
+            self.streamFile.flush()
+
+    def close(self):
+        '''
+        # effects:
+        #	writes the groups and closes the error file (and stream);
+        #	nothing if it is already closed
+        #
+        '''
+
+        if self not in openReports:
+            return
+
+        openReports.discard(self)
+
+        if len(self.buffer) > 0:
+            self.writeLine(self.buffer)
+            self.buffer = ''
+        self.writeGroups()
+        self.fp.close()
+        if self.streamFile is not None:
+            self.streamFile.close()
+
+def closeAll():
+    '''
+    # requires:
+    #
+    # effects:
+    #	closes the error files that are still open (see the Purpose)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    for report in list(openReports):
+        try:
+            report.close()
+        except:
+            pass
+
+atexit.register(closeAll)
@@ -0,0 +1,184 @@
+'''
+#
+# Purpose:
+#
+#	Primary key allocation for concurrent nomen jobs
+#	(nomenload, batchrename, batchdelete)
+#
+#	locks : session-level PostgreSQL advisory locks, keyed by
+#	(LOCK_CLASS, hashtext(name)); a lock is held until unlock(),
+#	unlockAll() or until the database connection is closed (so a
+#	failed job never leaves a lock behind).
+#
+#	keys :
+#
+#	    reserve(sequence, count) : takes count keys of an auto-sequence
+#	    with nextval() (one statement).  A key returned by nextval() is
+#	    never returned again, to any session, so the keys are ours even
+#	    if another session (the PWI, another loader) takes keys of the
+#	    sequence at the same time.  The bcp files use consecutive keys
+#	    (first key + n) : if the keys are not consecutive (another
+#	    session took keys during the statement), they are left as a gap
+#	    in the sequence and count keys are taken again.
+#
+#	    nextAccessionKey(), nextMGIKey(prefix) : ACC_Accession has no
+#	    auto-sequence (max(_Accession_key) + 1) and the MGI ids are
+#	    assigned from ACC_AccessionMax (maxNumericPart + 1, ACC_setMax
+#	    after the load).  Both take the ACCESSION lock, which the caller
+#	    holds until the accession rows are committed and ACC_setMax has
+#	    run (unlock(ACCESSION), unlockAll()).  Nothing is reserved in the
+#	    database : only the jobs that take the lock are kept out, a
+#	    loader that uses max() + 1 without it (the PWI, the stored
+#	    procedures) is only safe once the rows exist, and the lock is
+#	    lost if the job fails (a resumed load checks its key ranges;
+#	    see nomenload.committedKey()).
+#
+#	Usage:
+#	    markerKey = keylock.reserve('mrk_marker_seq', rowCount)
+#	    accKey = keylock.nextAccessionKey()
+#	    mgiKey = keylock.nextMGIKey('MGI:')
+#	    ... load the rows, ACC_setMax ...
+#	    keylock.unlockAll()
+#
+'''
+
+import db
+import nomensql
+
+# advisory lock class (the 1st key of the two-key form) shared by the nomen jobs
+LOCK_CLASS = 5327
+
+# lock names
+ACCESSION = 'ACC_Accession'
+
+# attempts to take a block of consecutive keys (see reserve())
+maxAttempts = 5
+
+held = set()		# the lock names held by this session
+
+def lock(name):
+    '''
+    # requires:
+    #	name - the lock name
+    #
+    # effects:
+    #	takes the advisory lock (waits until it is free);
+    #	a lock that is already held is not taken again
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    if name in held:
+        return
+
+    db.sql(''' select pg_advisory_lock(%d, hashtext(%s)) ''' % (LOCK_CLASS, nomensql.quote(name)), 'auto')
+    held.add(name)
+
+def unlock(name):
+    '''
+    # requires:
+    #	name - the lock name
+    #
+    # effects:
+    #	releases the advisory lock, if it is held
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    if name not in held:
+        return
+
+    db.sql(''' select pg_advisory_unlock(%d, hashtext(%s)) ''' % (LOCK_CLASS, nomensql.quote(name)), 'auto')
+    held.discard(name)
+
+def unlockAll():
+    '''
+    # requires:
+    #
+    # effects:
+    #	releases all advisory locks of the session
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    if len(held) == 0:
+        return
+
+    db.sql('select pg_advisory_unlock_all()', 'auto')
+    held.clear()
+
+def reserve(sequence, count):
+    '''
+    # requires:
+    #	sequence - the auto-sequence (mrk_marker_seq, ...)
+    #	count - the number of keys to reserve (at least 1 is reserved)
+    #
+    # effects:
+    #	takes count consecutive keys of the sequence (see the Purpose)
+    #
+    # returns:
+    #	the first key of the block
+    #	raises RuntimeError if no block of consecutive keys was taken
+    #	in maxAttempts attempts
+    #
+    '''
+
+    count = max(count, 1)
+
+    for attempt in range(maxAttempts):
+        results = db.sql('''
+            select min(k) as firstKey, max(k) as lastKey
+            from (select nextval(%s) as k from generate_series(1, %d)) s
+            ''' % (nomensql.quote(sequence), count), 'auto')
+        db.commit()
+
+        if results[0]['lastKey'] - results[0]['firstKey'] + 1 == count:
+            return results[0]['firstKey']
+
+    raise RuntimeError('Could not reserve %d consecutive keys of %s' % (count, sequence))
+
+def nextAccessionKey():
+    '''
+    # requires:
+    #
+    # effects:
+    #	takes the ACCESSION lock; the caller keeps it until its
+    #	accession rows are committed (unlock(ACCESSION), unlockAll())
+    #
+    # returns:
+    #	the next ACC_Accession._Accession_key (max + 1)
+    #
+    '''
+
+    lock(ACCESSION)
+
+    results = db.sql('select max(_Accession_key) + 1 as maxKey from ACC_Accession', 'auto')
+
+    return results[0]['maxKey']
+
+def nextMGIKey(prefix):
+    '''
+    # requires:
+    #	prefix - the accession id prefix (MGI:)
+    #
+    # effects:
+    #	takes the ACCESSION lock; the caller keeps it until its
+    #	accession rows are committed and ACC_setMax has been run
+    #
+    # returns:
+    #	the numeric part of the next MGI id (maxNumericPart + 1)
+    #
+    '''
+
+    lock(ACCESSION)
+
+    results = db.sql('select maxNumericPart + 1 as maxKey from ACC_AccessionMax where prefixPart = %s' \
+            % (nomensql.quote(prefix)), 'auto')
+
+    return results[0]['maxKey']
@@ -0,0 +1,157 @@
+'''
+#
+# Purpose:
+#
+#	Load ledger for nomenload : the input rows that have been loaded,
+#	so that a resubmitted input file (after a partial failure, or with
+#	rows added) only loads the rows that are new.
+#
+#	The ledger (SQLite) maps the hash of each loaded row (see rowHash())
+#	to the marker it created : symbol, _Marker_key, MGI ID.
+#
+#	A row of a new run is "already loaded" if its hash is in the ledger
+#	and the MGI ID of the ledger entry still resolves to the same mouse
+#	marker (see markerresolver.py) : a marker that has since been
+#	deleted (or whose load was rolled back) is loaded again.
+#
+#	Usage:
+#	    loaded = loadledger.lookup(ledgerFileName, [(lineNum, tokens), ...])
+#	    ...
+#	    loadledger.record(ledgerFileName, [(rowHash(tokens), symbol, markerKey, mgiID), ...], inputFileName)
+#
+# Env Vars:
+#
+#	See the configuration file nomenload.config
+#	NOMEN_LEDGER : the ledger file; if not set, no ledger is used
+#
+'''
+
+import os
+import sqlite3
+import hashlib
+import mgi_utils
+import markerresolver
+
+# the columns of a row that are hashed (markerType ... createdBy)
+hashColumns = 11
+
+# rows per lookup statement (SQLite host parameter limit)
+chunkSize = 500
+
+def rowHash(tokens):
+    '''
+    # requires:
+    #	tokens - the columns of an input row
+    #
+    # returns:
+    #	the hash (sha1) of the normalized row : the first 11 columns,
+    #	with leading/trailing white space removed
+    #
+    '''
+
+    columns = [t.strip() for t in tokens[:hashColumns]]
+
+    return hashlib.sha1('\t'.join(columns).encode('utf-8')).hexdigest()
+
+def connect(fileName):
+    '''
+    # requires:
+    #	fileName - the ledger file
+    #
+    # effects:
+    #	opens the ledger; creates it if it does not exist
+    #
+    # returns:
+    #	the sqlite3 connection
+    #
+    '''
+
+    connection = sqlite3.connect(fileName)
+    connection.execute('''
+        create table if not exists ledger (
+            rowHash text primary key,
+            symbol text,
+            markerKey integer,
+            mgiID text,
+            inputFile text,
+            loadDate text
+        )''')
+
+    return connection
+
+def lookup(fileName, rows):
+    '''
+    # requires:
+    #	fileName - the ledger file
+    #	rows - [(line number, tokens), ...] : the input rows
+    #
+    # effects:
+    #	looks up the rows in the ledger (one query per chunkSize rows)
+    #	and resolves their MGI IDs (one markerresolver lookup)
+    #
+    # returns:
+    #	{line number : (symbol, mgiID)} of the rows that are already loaded
+    #
+    '''
+
+    if not os.path.exists(fileName):
+        return {}
+
+    hashes = {}
+    for lineNum, tokens in rows:
+        hashes.setdefault(rowHash(tokens), []).append(lineNum)
+
+    entries = {}
+    hashList = list(hashes.keys())
+    connection = connect(fileName)
+
+    try:
+        for i in range(0, len(hashList), chunkSize):
+            chunk = hashList[i:i + chunkSize]
+            for r in connection.execute('''
+                select rowHash, symbol, markerKey, mgiID from ledger
+                where rowHash in (%s)
+                ''' % (','.join(['?'] * len(chunk))), chunk):
+                entries[r[0]] = r[1:]
+    finally:
+        connection.close()
+
+    if len(entries) == 0:
+        return {}
+
+    markerDict, invalidList = markerresolver.resolveMarkers([e[2] for e in entries.values()])
+
+    loaded = {}
+    for h, (symbol, markerKey, mgiID) in entries.items():
+        if markerDict.get(mgiID) == markerKey:
+            for lineNum in hashes[h]:
+                loaded[lineNum] = (symbol, mgiID)
+
+    return loaded
+
+def record(fileName, rows, inputFileName):
+    '''
+    # requires:
+    #	fileName - the ledger file
+    #	rows - [(row hash, symbol, markerKey, mgiID), ...] : the loaded rows
+    #		(see rowHash())
+    #	inputFileName - the input file of the rows
+    #
+    # effects:
+    #	adds the rows to the ledger (one transaction)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    loadDate = mgi_utils.date()
+    connection = connect(fileName)
+
+    try:
+        with connection:
+            connection.executemany('insert or replace into ledger values (?, ?, ?, ?, ?, ?)',
+                [(h, symbol, markerKey, mgiID, inputFileName, loadDate)
+                    for h, symbol, markerKey, mgiID in rows])
+    finally:
+        connection.close()
@@ -0,0 +1,59 @@
+'''
+#
+# Purpose:
+#
+#	Resolves a set of mouse marker MGI IDs (MGI:xxxx) to their
+#	MRK_Marker._Marker_key in bulk, using chunked "= any(array[...])"
+#	queries, instead of loading every mouse marker MGI ID or verifying
+#	one MGI ID per query.
+#
+#	Used by batchrename.py, batchdelete.py and updateMkrType.py
+#
+# Env Vars:
+#
+#	NOMEN_RESOLVER_CHUNK : number of MGI IDs per query (default 1000)
+#
+'''
+
+import os
+import nomensql
+
+chunkSize = int(os.environ.get('NOMEN_RESOLVER_CHUNK', '1000'))
+
+def resolveMarkers(mgiIDs, preferred = 0):
+    '''
+    # requires:
+    #	mgiIDs - list of MGI IDs (duplicates are allowed)
+    #	preferred - if 1, only resolve preferred MGI IDs
+    #
+    # effects:
+    #	queries the database for the mouse markers of the MGI IDs
+    #
+    # returns:
+    #	markerDict : {mgiID : markerKey} for each valid MGI ID
+    #	invalidList : list of invalid MGI IDs (in input order)
+    #
+    '''
+
+    markerDict = {}
+    invalidList = []
+
+    idList = []
+    idSet = set()
+    for mgiID in mgiIDs:
+        if mgiID not in idSet:
+            idSet.add(mgiID)
+            idList.append(mgiID)
+
+    for i in range(0, len(idList), chunkSize):
+        results = nomensql.execute('mgiMarkers', idList[i:i + chunkSize], int(preferred))
+
+        for r in results:
+            markerDict[r['accID']] = r['_Object_key']
+
+    for mgiID in idList:
+        if mgiID not in markerDict:
+            invalidList.append(mgiID)
+
+    return markerDict, invalidList
+
@@ -0,0 +1,330 @@
+'''
+#
+# Purpose:
+#
+#	Runs the Nomenclature & Mapping load job in a single Python process:
+#
+#	1) preflight : lastrun check, convert the input file to unix format
+#	2) nomenload : sanity checks, bcp files, bcp stage (see nomenload.py)
+#	3) mappingload (if not "preview"/"validate" and nomenload was successful)
+#
+#	The nomenload runs in this process, using the same database
+#	connection and configuration as the rest of the job.
+#
+#	Called from nomenload.sh after the configuration file and the
+#	DLA functions (startLog/checkStatus/shutDown) have been sourced;
+#	nomenload.sh runs checkStatus for each step (see checkStatus()),
+#	then archives the log/input/output directories (DLA createArchive)
+#	and touches the "lastrun" file.
+#
+# Env Vars:
+#
+#	See the configuration file nomenload.config
+#	CONFIG_FILE : the configuration file (passed on to the mappingload)
+#	INPUT_FILES : the input files of the run (see nomenload.py)
+#
+# Exit Codes:
+#
+#	0:  Successful completion
+#	1:  Fatal error occurred
+#	2:  Skipped : input file has not been updated since the last run
+#
+'''
+
+import sys
+import os
+import subprocess
+import shutil
+import traceback
+import mgi_utils
+import bcpmanifest
+
+#
+# from configuration file
+#
+mode = os.environ['NOMENMODE']
+configFileName = os.environ['CONFIG_FILE']
+inputFileName = os.environ['INPUT_FILE_DEFAULT']
+inputFileNames = str.split(os.environ.get('INPUT_FILES', '')) or [inputFileName]
+mappingFileName = os.environ['MAPPINGDATAFILE']
+inputDir = os.environ['INPUTDIR']
+outputDir = os.environ['OUTPUTDIR']
+logFileName = os.environ['LOG_FILE']
+logProcFileName = os.environ['LOG_PROC']
+diagFileName = os.environ['LOG_DIAG']
+errorFileName = os.environ['LOG_ERROR']
+mappingMode = os.environ['MAPPINGMODE']
+mappingLoad = os.environ['MAPPINGLOAD']
+manifestFileName = os.environ.get('NOMEN_BCP_MANIFEST', os.path.join(outputDir, 'nomenload.manifest'))
+
+lastrunFileName = os.path.join(inputDir, 'lastrun')
+
+# the status of each step, for the DLA checkStatus function (see nomenload.sh)
+statusFileName = os.path.join(outputDir, 'nomenjob.status')
+
+SKIPPED = 2
+
+# modes that do not make any changes to the database
+previewModes = ['preview', 'validate']
+
+class Tee:
+    '''
+    # stdout of the nomenload is copied to the diagnostics file
+    # (replaces: nomenload.py | tee -a ${LOG_DIAG})
+    # the file is opened once (line buffered); see close()
+    '''
+
+    def __init__(self, stream, fileName):
+        self.stream = stream
+        self.fp = open(fileName, 'a', buffering = 1)
+
+    def write(self, s):
+        self.stream.write(s)
+        self.fp.write(s)
+
+    def flush(self):
+        self.stream.flush()
+        self.fp.flush()
+
+    def close(self):
+        self.fp.close()
+
+def log(message, fileName = logFileName):
+    '''
+    # requires: message (string)
+    #           fileName (string), default is LOG_FILE
+    #
+    # effects:
+    #	Writes message to stdout and appends it to fileName
+    #	(replaces: echo message | tee -a fileName)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    sys.stdout.write(message + '\n')
+    sys.stdout.flush()
+
+    with open(fileName, 'a') as fp:
+        fp.write(message + '\n')
+
+def checkStatus(status, message):
+    '''
+    # requires: status, the numeric exit status (integer)
+    #           message (string)
+    #
+    # effects:
+    #	Appends the status of a step to the status file : nomenload.sh
+    #	passes each step to the DLA checkStatus function once the job ends
+    #
+    # returns:
+    #	status
+    #
+    '''
+
+    with open(statusFileName, 'a') as fp:
+        fp.write('%s %s\n' % (status, message))
+
+    return status
+
+def preflight():
+    '''
+    # requires:
+    #
+    # effects:
+    #	If not "preview"/"validate", check the "lastrun" file : if it is more recent
+    #	than the input file(s), then the load does not need to be run
+    #	(unless the bcp stage of the last run failed; see bcpmanifest.py).
+    #
+    #	Converts the input file(s) into a QC-ready (unix) version
+    #	(replaces: dos2unix) : the converted file is written to a
+    #	temporary file that replaces the input file, so a failed write
+    #	leaves the input file as it was
+    #
+    # returns:
+    #	0 if the load should run
+    #	SKIPPED if the input file has not been updated
+    #	1 if an input file could not be converted
+    #
+    '''
+
+    if mode not in previewModes and os.path.isfile(lastrunFileName) \
+            and not bcpmanifest.isIncomplete(manifestFileName):
+        if os.path.getmtime(lastrunFileName) > max([os.path.getmtime(f) for f in inputFileNames]):
+            log('SKIPPED: %s : Input file has not been updated' % (mode), logProcFileName)
+            return SKIPPED
+
+    for fileName in inputFileNames:
+        with open(fileName, 'rb') as fp:
+            contents = fp.read()
+
+        if b'\r\n' in contents:
+            tmpFileName = fileName + '.dos2unix'
+            try:
+                with open(tmpFileName, 'wb') as fp:
+                    fp.write(contents.replace(b'\r\n', b'\n'))
+                shutil.copymode(fileName, tmpFileName)
+                os.rename(tmpFileName, fileName)
+            except Exception as e:
+                log('Could not convert the input file %s : %s' % (fileName, e))
+                if os.path.exists(tmpFileName):
+                    os.remove(tmpFileName)
+                return 1
+
+    return 0
+
+def runNomenload():
+    '''
+    # requires:
+    #
+    # effects:
+    #	Runs nomenload.py in this process
+    #
+    # returns:
+    #	the nomenload exit status
+    #
+    '''
+
+    log('')
+    log(mgi_utils.date())
+    log('Running nomenload : %s' % (mode))
+
+    os.chdir(outputDir)
+
+    import nomenload
+
+    saveStdout = sys.stdout
+    tee = Tee(saveStdout, diagFileName)
+    sys.stdout = tee
+
+    try:
+        nomenload.main()
+        status = 0
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else 1
+    except Exception:
+        traceback.print_exc()
+        status = 1
+    finally:
+        sys.stdout = saveStdout
+        tee.close()
+
+    return status
+
+def mappingConfig(fileName):
+    '''
+    # requires:
+    #	fileName - a mapping file
+    #
+    # effects:
+    #	for a mapping file other than MAPPINGDATAFILE, writes a configuration
+    #	file that sources the configuration file and sets MAPPINGDATAFILE
+    #	and MAPPINGLOG for the mapping file
+    #
+    # returns:
+    #	the configuration file of the mappingload
+    #
+    '''
+
+    if fileName == mappingFileName:
+        return configFileName
+
+    mappingConfigFileName = os.path.join(outputDir, os.path.basename(fileName) + '.config')
+
+    with open(mappingConfigFileName, 'w') as fp:
+        fp.write('. %s\n' % (configFileName))
+        fp.write('MAPPINGDATAFILE=%s\n' % (fileName))
+        fp.write('MAPPINGLOG=${MAPPINGDATAFILE}.log\n')
+        fp.write('export MAPPINGDATAFILE MAPPINGLOG\n')
+
+    return mappingConfigFileName
+
+def runMappingload():
+    '''
+    # requires:
+    #
+    # effects:
+    #	Runs the mappingload once per mapping file (one per reference;
+    #	see the bcp manifest), using the configuration file
+    #	Stops at the first failed mappingload
+    #
+    # returns:
+    #	the mappingload exit status
+    #
+    '''
+
+    manifest = bcpmanifest.read(manifestFileName)
+
+    if manifest is None or len(manifest.get('mappingFiles', [])) == 0:
+        fileNames = [mappingFileName]
+    else:
+        fileNames = manifest['mappingFiles']
+
+    for fileName in fileNames:
+        try:
+            status = subprocess.call([os.path.join(mappingLoad, 'mappingload.sh'), mappingConfig(fileName)], cwd = outputDir)
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        if len(fileNames) > 1:
+            checkStatus(status, 'mappingload.sh %s :' % (fileName))
+        if status != 0:
+            return status
+
+    return 0
+
+def main():
+    '''
+    # requires:
+    #
+    # effects:
+    #	Runs the job steps (see Purpose)
+    #
+    # returns:
+    #	the job exit status
+    #
+    '''
+
+    if os.path.exists(statusFileName):
+        os.remove(statusFileName)
+
+    status = preflight()
+    if status == SKIPPED:
+        return status
+    if status != 0:
+        return checkStatus(status, 'nomenjob.py %s : %s : input file conversion :' % (configFileName, mode))
+
+    nomenStatus = runNomenload()
+    status = checkStatus(nomenStatus, 'nomenload.py %s : %s :' % (configFileName, mode))
+
+    #
+    # Execute mapping load if not "preview"/"validate" and nomenload was successful
+    #
+    if mode not in previewModes:
+        if status == 0:
+            status = checkStatus(runMappingload(), 'mappingload.sh %s : %s :' % (configFileName, mappingMode))
+        else:
+            log('FATAL ERROR: nomenload exit status = %s : %s' % (nomenStatus, mode))
+
+    #
+    # cat the error file
+    #
+    try:
+        with open(errorFileName, 'r') as fp:
+            sys.stdout.write(fp.read())
+    except:
+        pass
+
+    log('')
+    log(mgi_utils.date())
+
+    return status
+
+#
+# Main
+#
+
+if __name__ == '__main__':
+    sys.exit(main())
+
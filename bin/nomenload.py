@@ -14,7 +14,10 @@
 #
 # Assumes:
 #
-#	That no one else is adding Nomen records to the database.
+#	In load mode, the sequence keys are reserved and the accession keys
+#	and MGI ids are taken under a lock (see keylock.py), so other nomen
+#	jobs may run at the same time; other loaders that add ACC_Accession
+#	rows or MGI ids must not run during the load.
 #
 # Side Effects:
 #
@@ -37,12 +40,31 @@
 #
 # Parameters:
 #
+#	INPUT_FILES : the input files of the run (separated by spaces);
+#		if not set, INPUT_FILE_DEFAULT.  all input files share one
+#		dictionary load, one key reservation and one bcp stage.
+#		rows are numbered across the input files (see the error file).
+#
 #	processing modes:
 #		load - load the data into Nomen structures
 #
 #		preview - perform all record verifications but do not load the 
 #			data or make any changes to the database.
 #
+#		validate - perform all record verifications only; no primary
+#			keys are reserved and no bcp/mapping/output files
+#			are written.  used by the curator sanity checks.
+#			if NOMEN_SNAPSHOT is a current snapshot file (see
+#			nomensnapshot.py), the verifications use the snapshot
+#			and no database connection is made.
+#
+#	deterministic output (preview mode only) : if NOMEN_FIXED_KEY and
+#	NOMEN_FIXED_DATE are set, every primary key sequence (and the
+#	MGI id) starts at NOMEN_FIXED_KEY, and NOMEN_FIXED_DATE is used
+#	as the creation/modification date, instead of the database
+#	sequences and the current date.  two runs of the same input then
+#	write identical bcp, .out and mapping files (see bcpcompare.py).
+#
 # Sanity Checks: see sanityCheck()
 #
 #        1)  Invalid Line (missing column(s))
@@ -51,10 +73,12 @@
 #        4)  Invalid Logical DB
 #        5)  Symbol is Official/Interim/Reserved
 #        6)  Sequences without Logical DB
-#	 7)  More than 1 Reference in input file
+#	 7)  (removed) More than 1 Reference in input file : the records are
+#	     partitioned by reference (one mapping file per reference)
 #        8)  WARNING: Symbol is Withdrawn
 #        9)  WARNING: Sequence is associated with other Markers
 #	 10) WARNING: Duplicate Symbol in input file (1st instance will be loaded)
+#        11) WARNING: Synonym is a Marker Symbol/Synonym in MGI or in the input file
 #
 # Output:
 #
@@ -70,7 +94,23 @@
 #	Diagnostics file of all input parameters and SQL commands
 #	Error file
 #
-#	Mapping input file:
+#	NOMEN_BCP_FORMAT : the format of the bcp files (see pgcopy.py)
+#		text - "|" delimited, loaded by bcpin.csh (default)
+#		binary - PostgreSQL binary COPY, loaded by psql (copy ... with (format binary))
+#
+#	NOMEN_LOAD_METHOD : how the load/preview modes load the data
+#		bcp - the input is verified and processed row by row in python;
+#		      the bcp files are loaded table by table (default)
+#		stage - the input is copied into staging tables, verified in
+#		      SQL and published in one transaction (see nomenstage.py);
+#		      no bcp files are written.  preview mode verifies only.
+#
+#	BCP manifest (NOMEN_BCP_MANIFEST) : checksum, row count and load status
+#	of each bcp file.  if the bcp stage fails, the next "load" run
+#	resumes it (see resumeBcp()) instead of re-processing the input file.
+#
+#	Mapping input file (one per reference : MAPPINGDATAFILE for the
+#	first reference, MAPPINGDATAFILE.J<number> for each other reference):
 #		MGI AccID of Marker
 #		Chromosome
 #		yes (to automatically update the Marker's chromosome field)
@@ -107,10 +147,22 @@
 
 import sys
 import os
+import re
 import db
 import mgi_utils
 import accessionlib
 import loadlib
+import verifycache
+import runhistory
+import columnarcheck
+import bcpmanifest
+import pgcopy
+import nomenstage
+import nomensnapshot
+import keylock
+import nomensql
+import loadledger
+import errorreport
 
 #db.setTrace()
 
@@ -123,15 +175,35 @@ user = os.environ['MGD_DBUSER']
 passwordFileName = os.environ['MGD_DBPASSWORDFILE']
 mode = os.environ['NOMENMODE']
 inputFileName = os.environ['INPUT_FILE_DEFAULT']
+inputFileNames = str.split(os.environ.get('INPUT_FILES', ''))
 mappingFileName = os.environ['MAPPINGDATAFILE']
 mappingCol5 = os.environ['MAPPINGASSAYTYPE']
 diagFileName = os.environ['LOG_DIAG']
 errorFileName = os.environ['LOG_ERROR']
+manifestFileName = os.environ.get('NOMEN_BCP_MANIFEST', 'nomenload.manifest')
+bcpFormat = os.environ.get('NOMEN_BCP_FORMAT', pgcopy.TEXT)
+loadMethod = os.environ.get('NOMEN_LOAD_METHOD', 'bcp')
+chunkRows = int(os.environ.get('NOMEN_BCP_CHUNK_ROWS', '0') or '0')
+ledgerFileName = os.environ.get('NOMEN_LEDGER', '')
+stageFileName = os.environ.get('NOMEN_STAGE_FILE', 'nomen_stage.bcp')
+psqlCommand = os.environ.get('PSQL', 'psql')
+wildTypeSymbolExclude = os.environ.get('WILDTYPE_SYMBOL_EXCLUDE', 'mt-')
+wildTypeNameExclude = os.environ.get('WILDTYPE_NAME_EXCLUDE', 
+        'withdrawn, =|dna segment|EST |expressed sequence|cDNA sequence|gene model|' + \
+        'hypothetical protein|ecotropic viral integration site|viral polymerase')
+columnarRows = int(os.environ.get('NOMEN_COLUMNAR_ROWS', '0'))
+snapshotFileName = os.environ.get('NOMEN_SNAPSHOT', '')
+fixedKey = int(os.environ.get('NOMEN_FIXED_KEY', '0') or '0')
+fixedDate = os.environ.get('NOMEN_FIXED_DATE', '')
 
 DEBUG = 0		# set DEBUG to false unless preview mode is selected
 bcpon = 1		# can the bcp files be bcp-ed into the database?  default is yes (1).
+validateOnly = 0	# validate mode : sanity checks only (no keys, no output files)
+warm = 0		# set by nomenqcd.py : keep the database connection and dictionaries between runs
+dictionariesLoaded = 0	# warm : the dictionaries have been loaded
+connected = 0		# warm : the database connection is open
 
-inputFile = ''		# file descriptor
+inputFiles = []		# file descriptors
 outputFile = ''		# file descriptor
 diagFile = ''		# file descriptor
 errorFile = ''		# file descriptor
@@ -146,6 +218,8 @@ historyFile = ''	# file descriptor
 alleleFile = ''		# file descriptor
 noteFile = ''		# file descriptor
 mcvFile = ''		# file descriptor
+mappingFiles = {}	# {reference key : mapping file descriptor} (see getMappingFile())
+mappingFileNames = []	# mapping file names, in reference order
 
 markerFileName = ''	# file name
 refFileName = ''	# file name
@@ -169,11 +243,26 @@ historyKey = 0      # MRK_History._Assoc_key
 mappingKey = 0      # MLD_Expt_Marker._Assoc_key
 mcvKey = 0          # VOC_Annot._Annot_key
 mgiCount = 0
+keysReserved = 0	# the keys were reserved (see reserveKeys()) : no sequence fix-ups
+alreadyLoaded = {}	# {line number : (symbol, MGI ID)} rows loaded by a previous run (see checkLedger())
+ledgerRows = []		# [(row hash, symbol, markerKey, MGI ID), ...] rows of this run (see recordLedger())
 
 statusDict = {}		# dictionary of marker statuses for quick lookup
 referenceDict = {}	# dictionary of references for quick lookup
 logicalDBDict = {}	# dictionary of logical DBs for quick lookup
 mcvDict = {}        # dictionary of mcv terms for quick lookup
+markerTypeDict = {}	# dictionary of marker types for quick lookup (columnar checks)
+chromosomeDict = {}	# dictionary of mouse chromosomes for quick lookup (columnar checks)
+
+columnar = None		# columnar check results, if used (see columnarcheck.py)
+snapshot = None		# validate mode : the reference-data snapshot, if used (see nomensnapshot.py)
+
+synonymCollisions = {}      # {lower(synonym) : [(collision message, symbol), ...]} (see verifySynonyms())
+
+wildTypeRules = []          # list of wild-type allele exclusion rules : (field, pattern)
+wildTypeSymbolMatcher = None    # compiled symbol rules
+wildTypeNameMatcher = None      # compiled name rules
+wildTypeSuppressed = {}     # {rule : number of wild-type alleles suppressed}
 
 markerEvent = 106563604                # Assigned
 markerEventReason = 106563610          # Not Specified
@@ -189,6 +278,9 @@ mappingCol6 = ''			# description ( leave blank)
 
 cdate = mgi_utils.date('%m/%d/%Y')	# current date
 
+if len(fixedDate) > 0:
+    cdate = fixedDate			# deterministic output
+
 markerType = None
 symbol = None
 name = None
@@ -206,7 +298,7 @@ referenceKey = 0
 logicalDBKey = 0
 mcvTermey = 0
 otherAccDict = {}
-markerLookup = []
+markerLookup = set()
 referenceLookup = []
 
 def exit(status, message = None):
@@ -221,14 +313,18 @@ def exit(status, message = None):
     #
     '''
 
-    db.commit()
-    db.useOneConnection()
+    if snapshot is None:
+        db.commit()
+        if not warm:
+            db.useOneConnection()
+            nomensql.reset()
 
     if message is not None:
         sys.stderr.write('\n' + str(message) + '\n')
 
     try:
-        inputFile.close()
+        for inputFile in inputFiles:
+            inputFile.close()
         diagFile.flush()
         errorFile.flush()
         diagFile.write('\n\nEnd Date/Time: %s\n' % (mgi_utils.date()))
@@ -239,8 +335,56 @@ def exit(status, message = None):
     except:
         pass
 
+    runhistory.finish(status)
+
     sys.exit(status)
  
+def reset():
+    '''
+    # requires:
+    #
+    # effects:
+    #	Resets the globals of a run (lookups of the input file, counts)
+    #	so that main() can be run more than once in a process (nomenqcd.py)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global bcpon, mgiCount, otherAccDict, markerLookup, referenceLookup
+    global synonymCollisions, columnar, outputFile, mappingFiles, mappingFileNames
+    global snapshot, keysReserved, alreadyLoaded, ledgerRows
+
+    bcpon = 1
+    mgiCount = 0
+    keysReserved = 0
+    alreadyLoaded = {}
+    ledgerRows = []
+    otherAccDict = {}
+    markerLookup = set()
+    referenceLookup = []
+    synonymCollisions = {}
+    columnar = None
+    outputFile = ''
+    mappingFiles = {}
+    mappingFileNames = []
+    snapshot = None
+
+def getInputFileNames():
+    '''
+    # requires:
+    #
+    # returns:
+    #	the input file names of the run (INPUT_FILES or INPUT_FILE_DEFAULT)
+    #
+    '''
+
+    if len(inputFileNames) > 0:
+        return inputFileNames
+
+    return [inputFileName]
+
 def init():
     '''
     # requires: 
@@ -254,17 +398,20 @@ def init():
     #
     '''
 
-    global inputFile, outputFile, diagFile, errorFile
+    global inputFiles, outputFile, diagFile, errorFile
     global errorFileName, diagFileName, markerFileName, refFileName
     global mrkcurrentFileName, historyFileName, alleleFileName, noteFileName, mcvFileName
     global synFileName, accFileName, accrefFileName
     global markerFile, refFile, synFile, accFile, accrefFile, mappingFile
     global mrkcurrentFile, historyFile, alleleFile, noteFile, mcvFile
     global markerKey, accKey, synKey, mgiKey, refAssocKey, alleleKey, noteKey, historyKey, mcvKey
+    global connected
 
-    db.useOneConnection(1)
-    db.set_sqlUser(user)
-    db.set_sqlPasswordFromFile(passwordFileName)
+    if snapshot is None and (not warm or not connected):
+        db.useOneConnection(1)
+        db.set_sqlUser(user)
+        db.set_sqlPasswordFromFile(passwordFileName)
+        connected = 1
 
     outputFileName = inputFileName + '.out'
     markerFileName = 'MRK_Marker.bcp'
@@ -278,93 +425,109 @@ def init():
     noteFileName = 'MGI_Note.bcp'
     mcvFileName = 'VOC_Annot.bcp'
 
+    inputFiles = []
+    for fileName in getInputFileNames():
+        try:
+            inputFiles.append(open(fileName, 'r'))
+        except:
+            exit(1, 'Could not open file %s\n' % fileName)
+            
     try:
-        inputFile = open(inputFileName, 'r')
+        diagFile = open(diagFileName, 'w')
     except:
-        exit(1, 'Could not open file %s\n' % inputFileName)
+        exit(1, 'Could not open file %s\n' % diagFileName)
             
     try:
-        outputFile = open(outputFileName, 'w')
+        errorFile = errorreport.ErrorReport(errorFileName)
     except:
-        exit(1, 'Could not open file %s\n' % outputFileName)
+        exit(1, 'Could not open file %s\n' % errorFileName)
             
+    if snapshot is None:
+        # Log all SQL 
+        db.set_sqlLogFunction(db.sqlLogAll)
+
+        # Set Log File Descriptor
+        db.set_commandLogFile(diagFileName)
+
+    # Set Log File Descriptor
+    diagFile.write('Start Date/Time: %s\n' % (mgi_utils.date()))
+    if snapshot is None:
+        diagFile.write('Server: %s\n' % (db.get_sqlServer()))
+        diagFile.write('Database: %s\n' % (db.get_sqlDatabase()))
+    else:
+        diagFile.write('Snapshot: %s (%s : %s.%s)\n' \
+            % (snapshotFileName, snapshot.createDate, snapshot.server, snapshot.database))
+    for fileName in getInputFileNames():
+        diagFile.write('Input File: %s\n' % (fileName))
+    errorFile.write('\nStart file: %s\n\n' % (mgi_utils.date()))
+
+    # validate mode : no output/bcp/mapping files
+    if validateOnly:
+        return
+
     try:
-        diagFile = open(diagFileName, 'w')
+        outputFile = open(outputFileName, 'w')
     except:
-        exit(1, 'Could not open file %s\n' % diagFileName)
+        exit(1, 'Could not open file %s\n' % outputFileName)
             
     try:
-        errorFile = open(errorFileName, 'w')
+        mappingFile = open(mappingFileName, 'w')
     except:
-        exit(1, 'Could not open file %s\n' % errorFileName)
-            
+        exit(1, 'Could not open file %s\n' % mappingFileName)
+
+    # staged load : no bcp files
+    if loadMethod == 'stage':
+        return
+
     try:
-        markerFile = open(markerFileName, 'w')
+        markerFile = pgcopy.writer(markerFileName, 'MRK_Marker', bcpFormat)
     except:
         exit(1, 'Could not open file %s\n' % markerFileName)
             
     try:
-        refFile = open(refFileName, 'w')
+        refFile = pgcopy.writer(refFileName, 'MGI_Reference_Assoc', bcpFormat)
     except:
         exit(1, 'Could not open file %s\n' % refFileName)
             
     try:
-        synFile = open(synFileName, 'w')
+        synFile = pgcopy.writer(synFileName, 'MGI_Synonym', bcpFormat)
     except:
         exit(1, 'Could not open file %s\n' % synFileName)
             
     try:
-        accFile = open(accFileName, 'w')
+        accFile = pgcopy.writer(accFileName, 'ACC_Accession', bcpFormat)
     except:
         exit(1, 'Could not open file %s\n' % accFileName)
             
     try:
-        accrefFile = open(accrefFileName, 'w')
+        accrefFile = pgcopy.writer(accrefFileName, 'ACC_AccessionReference', bcpFormat)
     except:
         exit(1, 'Could not open file %s\n' % accrefFileName)
             
     try:
-        mappingFile = open(mappingFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % mappingFileName)
-            
-    try:
-        mrkcurrentFile = open(mrkcurrentFileName, 'w')
+        mrkcurrentFile = pgcopy.writer(mrkcurrentFileName, 'MRK_Current', bcpFormat)
     except:
         exit(1, 'Could not open file %s\n' % mrkcurrentFileName)
             
     try:
-        historyFile = open(historyFileName, 'w')
+        historyFile = pgcopy.writer(historyFileName, 'MRK_History', bcpFormat)
     except:
         exit(1, 'Could not open file %s\n' % historyFileName)
             
     try:
-        alleleFile = open(alleleFileName, 'w')
+        alleleFile = pgcopy.writer(alleleFileName, 'ALL_Allele', bcpFormat)
     except:
         exit(1, 'Could not open file %s\n' % alleleFileName)
             
     try:
-        noteFile = open(noteFileName, 'w')
+        noteFile = pgcopy.writer(noteFileName, 'MGI_Note', bcpFormat)
     except:
         exit(1, 'Could not open file %s\n' % noteFileName)
             
     try:
-        mcvFile = open(mcvFileName, 'w')
+        mcvFile = pgcopy.writer(mcvFileName, 'VOC_Annot', bcpFormat)
     except:
         exit(1, 'Could not open file %s\n' % mcvFileName)
-            
-    # Log all SQL 
-    db.set_sqlLogFunction(db.sqlLogAll)
-
-    # Set Log File Descriptor
-    db.set_commandLogFile(diagFileName)
-
-    # Set Log File Descriptor
-    diagFile.write('Start Date/Time: %s\n' % (mgi_utils.date()))
-    diagFile.write('Server: %s\n' % (db.get_sqlServer()))
-    diagFile.write('Database: %s\n' % (db.get_sqlDatabase()))
-    diagFile.write('Input File: %s\n' % (inputFileName))
-    errorFile.write('\nStart file: %s\n\n' % (mgi_utils.date()))
 
 def verifyMode():
     '''
@@ -381,14 +544,32 @@ def verifyMode():
     #
     '''
 
-    global DEBUG, bcpon
+    global DEBUG, bcpon, validateOnly
 
     if mode == 'preview':
         DEBUG = 1
         bcpon = 0
+    elif mode == 'validate':
+        DEBUG = 1
+        bcpon = 0
+        validateOnly = 1
     elif mode not in ['load']:
         exit(1, 'Invalid Processing Mode:  %s\n' % (mode))
 
+    if bcpFormat not in [pgcopy.TEXT, pgcopy.BINARY]:
+        exit(1, 'Invalid BCP Format:  %s\n' % (bcpFormat))
+
+    if loadMethod not in ['bcp', 'stage']:
+        exit(1, 'Invalid Load Method:  %s\n' % (loadMethod))
+
+    # deterministic output : the fixed keys must never be loaded
+    if (fixedKey > 0 or len(fixedDate) > 0) and mode != 'preview':
+        exit(1, 'NOMEN_FIXED_KEY/NOMEN_FIXED_DATE require preview mode:  %s\n' % (mode))
+
+    # both are needed for output that is the same from run to run
+    if (fixedKey > 0) != (len(fixedDate) > 0):
+        exit(1, 'NOMEN_FIXED_KEY and NOMEN_FIXED_DATE must be set together\n')
+
 def verifyMarkerStatus(markerStatus, lineNum):
     '''
     # requires:
@@ -437,31 +618,29 @@ def verifyDuplicateMarker(symbol, lineNum):
     #
     '''
 
+    if snapshot is not None:
+        statusKeys = set(snapshot.symbolStatus.get(symbol, []))
+        if 2 in statusKeys:
+            errorFile.write('WARNING: Symbol is Withdrawn (row %d): %s\n\n' % (lineNum, symbol))
+        if len(statusKeys & set([1, 3])) == 0:
+            return 0
+        errorFile.write('Symbol is Official/Reserved (row %d): %s\n' % (lineNum, symbol))
+        return 1
+
+    statusKeys = set([r['_Marker_Status_key'] for r in nomensql.execute('markerStatus', symbol)])
+
     #
     # warning if Symbol is Withdrawn
     #
 
-    results = db.sql('''select _Marker_key from MRK_Marker 
-        where _Organism_key = 1 
-                and _Marker_Status_key in (2)
-                and symbol = '%s'
-        ''' % (symbol), 'auto')
-
-    if len(results) > 0:
+    if 2 in statusKeys:
         errorFile.write('WARNING: Symbol is Withdrawn (row %d): %s\n\n' % (lineNum, symbol))
 
     #
     # official/reserved
     #
 
-    results = db.sql('''
-        select _Marker_key from MRK_Marker 
-        where _Organism_key = 1 
-                and _Marker_Status_key in (1,3)
-                and symbol = '%s'
-        ''' % (symbol), 'auto')
-
-    if len(results) == 0:
+    if len(statusKeys & set([1, 3])) == 0:
         return 0
     else:
         errorFile.write('Symbol is Official/Reserved (row %d): %s\n' % (lineNum, symbol))
@@ -484,10 +663,12 @@ def verifyChromosome(chromosome, lineNum):
     #
     '''
 
-    results = db.sql('''select * from MRK_Chromosome where _Organism_key = 1 and chromosome = '%s'
-        ''' % (chromosome), 'auto')
+    if snapshot is not None:
+        results = chromosome in chromosomeDict
+    else:
+        results = nomensql.execute('chromosome', chromosome)
 
-    if len(results) > 0:
+    if results:
         return 1
     else:
         errorFile.write('Invalid Chromosome (row %d): %s\n' % (lineNum, chromosome))
@@ -547,6 +728,118 @@ def verifyMCVTerm(mcvTerm, lineNum):
 
     return(mcvTermKey)
 
+def verifySynonyms(lines):
+    '''
+    # requires:
+    #	lines - the lines of the input file
+    #
+    # effects:
+    #	bulk check of all synonyms (field 7) in the input file against:
+    #		mouse MRK_Marker.symbol (official/reserved)
+    #		mouse marker MGI_Synonym
+    #		the other symbols/synonyms in the input file
+    #	using one set-based query for the entire file.
+    #	loads synonymCollisions; see sanityCheck() for the per-row warnings
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global synonymCollisions
+
+    fileSymbols = {}    # {lower(symbol) : symbol}
+    fileSynonyms = {}   # {lower(synonym) : [symbol, ...]}
+    synonymList = set()	# the synonyms as spelled in the input file
+
+    for line in lines:
+        tokens = str.split(line[:-1], '\t')
+        if len(tokens) < 7:
+            continue
+        fileSymbols[tokens[1].lower()] = tokens[1]
+        for o in str.split(tokens[6], '|'):
+            if len(o) > 0:
+                fileSynonyms.setdefault(o.lower(), []).append(tokens[1])
+                synonymList.add(o)
+
+    if len(fileSynonyms) == 0:
+        return
+
+    for o in fileSynonyms:
+        if o in fileSymbols:
+            synonymCollisions.setdefault(o, []).append(('Synonym is a Symbol in input file', fileSymbols[o]))
+        if len(fileSynonyms[o]) > 1:
+            synonymCollisions.setdefault(o, []).append(('Duplicate Synonym in input file', ', '.join(fileSynonyms[o])))
+
+    #
+    # MGI symbols/synonyms are matched as spelled (the symbol and synonym
+    # indexes are used; no lower() scan of MRK_Marker/MGI_Synonym)
+    #
+
+    if snapshot is not None:
+        for o in synonymList:
+            if len(set(snapshot.symbolStatus.get(o, [])) & set([1, 3])) > 0:
+                synonymCollisions.setdefault(o.lower(), []).append(('Synonym is a Marker Symbol', o))
+            for symbol in snapshot.synonymLookup.get(o, []):
+                synonymCollisions.setdefault(o.lower(), []).append(('Synonym is a Marker Synonym', symbol))
+        return
+
+    results = nomensql.execute('synonymMarkers', sorted(synonymList))
+
+    for r in results:
+        synonymCollisions.setdefault(r['synonym'].lower(), []).append(('Synonym is a Marker ' + r['source'], r['symbol']))
+
+def verifyColumnar(column, value, lineNum, message):
+    '''
+    # requires:
+    #	column - the name of the columnar check result (see columnarcheck.check())
+    #	value - the value from the input file
+    #	lineNum - the line number of the record from the input file
+    #	message - the error message
+    #
+    # effects:
+    #	writes to the error file if the columnar check found the value invalid
+    #
+    # returns:
+    #	0 if the value is invalid
+    #	the key if the value is valid
+    #
+    '''
+
+    key = int(columnar[column][lineNum - 1])
+
+    if key == 0:
+        errorFile.write('%s (row %d): %s\n' % (message, lineNum, value))
+
+    return key
+
+def verifyColumns(lines):
+    '''
+    # requires:
+    #	lines - the lines of the input file
+    #
+    # effects:
+    #	runs the columnar checks (see columnarcheck.py) and sets
+    #	global columnar; sanityCheck() then uses the columnar results
+    #	for the Marker Type, Marker Status, Chromosome and MCV Term checks.
+    #	if NumPy is not installed, the row-at-a-time checks are used.
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global columnar
+
+    if not columnarcheck.available():
+        diagFile.write('Columnar checks : NumPy is not installed; using row checks\n')
+        return
+
+    columnar = columnarcheck.check(lines, markerTypeDict, statusDict, chromosomeDict, mcvDict)
+
+    diagFile.write('Columnar checks : %d rows, %d accession ids, %d synonyms\n' \
+        % (len(lines), columnar['accCount'].sum(), columnar['synCount'].sum()))
+
 def sanityCheck(markerType, symbol, chromosome, markerStatus, jnum, synonyms, 
         otherAccIDs, createdBy, lineNum):
     '''
@@ -574,13 +867,30 @@ def sanityCheck(markerType, symbol, chromosome, markerStatus, jnum, synonyms,
 
     error = 0
 
-    markerTypeKey = loadlib.verifyMarkerType(markerType, lineNum, errorFile)
-    markerStatusKey = verifyMarkerStatus(markerStatus, lineNum)
-    referenceKey = loadlib.verifyReference(jnum, lineNum, errorFile)
-    createdByKey = loadlib.verifyUser(createdBy, lineNum, errorFile)
+    if columnar is not None:
+        markerTypeKey = verifyColumnar('markerTypeKey', markerType, lineNum, 'Invalid Marker Type')
+        markerStatusKey = verifyColumnar('markerStatusKey', markerStatus, lineNum, 'Invalid Marker Status')
+    else:
+        if snapshot is not None:
+            markerTypeKey = nomensnapshot.verifyMarkerType(snapshot, markerType, lineNum, errorFile)
+        else:
+            markerTypeKey = loadlib.verifyMarkerType(markerType, lineNum, errorFile)
+        markerStatusKey = verifyMarkerStatus(markerStatus, lineNum)
+
+    if snapshot is not None:
+        referenceKey = nomensnapshot.verifyReference(snapshot, jnum, lineNum, errorFile)
+        createdByKey = nomensnapshot.verifyUser(snapshot, createdBy, lineNum, errorFile)
+    else:
+        referenceKey = verifycache.verifyReference(jnum, lineNum, errorFile)
+        createdByKey = verifycache.verifyUser(createdBy, lineNum, errorFile)
     isDuplicateMarker = verifyDuplicateMarker(symbol, lineNum)
-    chromosomeSearch = verifyChromosome(chromosome, lineNum)
-    mcvTermKey = verifyMCVTerm(mcvTerm, lineNum)
+
+    if columnar is not None:
+        chromosomeSearch = verifyColumnar('chromosomeKey', chromosome, lineNum, 'Invalid Chromosome')
+        mcvTermKey = verifyColumnar('mcvTermKey', mcvTerm, lineNum, 'Invalid MCV Term')
+    else:
+        chromosomeSearch = verifyChromosome(chromosome, lineNum)
+        mcvTermKey = verifyMCVTerm(mcvTerm, lineNum)
 
     #
     # 1st instance will be loaded
@@ -590,15 +900,13 @@ def sanityCheck(markerType, symbol, chromosome, markerStatus, jnum, synonyms,
         errorFile.write('WARNING: Duplicate Symbol in input file (row %d): %s\n' % (lineNum, symbol))
         error = 1
     else:
-        markerLookup.append(symbol)
+        markerLookup.add(symbol)
 
     #
-    # Duplciate Reference
+    # References of the input file(s); the records are partitioned
+    # by reference (see getMappingFile())
     #
-    if len(referenceLookup) > 0 and referenceKey not in referenceLookup:
-        errorFile.write('More than 1 Reference in input file (row %d): %s\n' % (lineNum, symbol))
-        error = 1
-    else:
+    if referenceKey > 0 and referenceKey not in referenceLookup:
         referenceLookup.append(referenceKey)
 
     #if len(synonyms) == 0:
@@ -612,6 +920,9 @@ def sanityCheck(markerType, symbol, chromosome, markerStatus, jnum, synonyms,
     #if len(otherAccIDs) == 0:
         #errorFile.write('WARNING: Missing Sequences (row %d): %s\n' % (lineNum, symbol))
 
+    if columnar is not None and columnar['accCount'][lineNum - 1] == 0:
+        otherAccIDs = ''
+
     for otherAcc in str.split(otherAccIDs, '|'):
         if len(otherAcc) > 0:
             try:
@@ -625,18 +936,24 @@ def sanityCheck(markerType, symbol, chromosome, markerStatus, jnum, synonyms,
                 errorFile.write('Sequences without Logical DB (row %d): %s\n' % (lineNum, otherAcc))
                 error = 1
 
+    #
+    # check if synonyms collide with existing markers/synonyms (see verifySynonyms())
+    # if so, send warning but allow load to continue
+    #
+    for o in str.split(synonyms, '|'):
+        if o.lower() in synonymCollisions:
+            for c in synonymCollisions[o.lower()]:
+                errorFile.write('WARNING: %s (row %d): %s ; %s\n' % (c[0], lineNum, o, c[1]))
+
     #
     # check if sequences are associated with other markers.
     # if so, send warning but allow load to continue
     #
     for acc in list(otherAccDict.keys()):
-        results = db.sql('''select m.symbol 
-                from MRK_Marker m, ACC_Accession a
-                where m._Organism_key = 1 
-                        and m._Marker_key = a._Object_key
-                        and a.accID = '%s'
-                        and a._MGIType_key = 2
-                ''' % (acc), 'auto')
+        if snapshot is not None:
+            results = [{'symbol' : s} for s in snapshot.accessionLookup.get(acc, [])]
+        else:
+            results = nomensql.execute('accessionMarkers', acc)
 
         for r in results:
                 errorFile.write('WARNING: Sequence is associated with other Marker (row %d): %s ; %s\n\n' 
@@ -665,6 +982,9 @@ def setPrimaryKeys():
     #
     # effects:
     #	Sets the global primary keys values needed for the load
+    #	deterministic output : every key starts at NOMEN_FIXED_KEY
+    #	(the database sequences are not used)
+    #	load mode : the keys are reserved (see reserveKeys())
     #
     # returns:
     #	nothing
@@ -675,6 +995,16 @@ def setPrimaryKeys():
     global noteKey, historyKey, mappingKey, mcvKey
     global refAssocKey
 
+    if fixedKey > 0:
+        markerKey = historyKey = alleleKey = noteKey = refAssocKey = fixedKey
+        accKey = synKey = mgiKey = mappingKey = mcvKey = fixedKey
+        diagFile.write('Fixed Key: %d\nFixed Date: %s\n' % (fixedKey, cdate))
+        return
+
+    if not DEBUG:
+        reserveKeys()
+        return
+
     results = db.sql(''' select nextval('mrk_marker_seq') as maxKey ''', 'auto')
     markerKey = results[0]['maxKey']
 
@@ -696,7 +1026,7 @@ def setPrimaryKeys():
     results = db.sql(''' select nextval('mgi_synonym_seq') as maxKey ''', 'auto')
     synKey = results[0]['maxKey']
 
-    results = db.sql('select maxNumericPart + 1 as maxKey from ACC_AccessionMax where prefixPart = \'%s\'' % (mgiPrefix), 'auto')
+    results = db.sql('select maxNumericPart + 1 as maxKey from ACC_AccessionMax where prefixPart = %s' % (nomensql.quote(mgiPrefix)), 'auto')
     mgiKey = results[0]['maxKey']
 
     results = db.sql(''' select nextval('mld_expt_marker_seq') as maxKey ''', 'auto')
@@ -705,19 +1035,93 @@ def setPrimaryKeys():
     results = db.sql(''' select nextval('voc_annot_seq') as maxKey ''', 'auto')
     mcvKey = results[0]['maxKey']
 
+def blockSizes():
+    '''
+    # requires:
+    #
+    # returns:
+    #	(rows, synonyms) : the number of input rows and synonyms, the
+    #	upper bounds of the keys used by the load (see reserveKeys())
+    #
+    '''
+
+    rows = 0
+    synonyms = 0
+
+    for fileName in getInputFileNames():
+        with open(fileName, 'r') as fp:
+            for line in fp:
+                rows = rows + 1
+                tokens = str.split(line.rstrip('\n'), '\t')
+                if len(tokens) > 6:
+                    synonyms = synonyms + len([s for s in str.split(tokens[6], '|') if len(s) > 0])
+
+    return rows, synonyms
+
+def reserveKeys():
+    '''
+    # requires:
+    #
+    # effects:
+    #	Reserves the primary keys of the load (see keylock.py), so that
+    #	other nomen jobs can run at the same time :
+    #	    a block of each auto-sequence (nextval), sized for every
+    #	    input row; the sequence fix-ups are not run after the load
+    #	    the next ACC_Accession key and MGI id (max + 1), under the
+    #	    ACCESSION lock, held until the accession rows are loaded and
+    #	    ACC_setMax has been run (see bcpFiles()) : the MGI ids are
+    #	    only used by the rows that are loaded
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global markerKey, accKey, mgiKey, synKey, alleleKey
+    global noteKey, historyKey, mappingKey, mcvKey
+    global refAssocKey, keysReserved
+
+    rows, synonyms = blockSizes()
+
+    try:
+        markerKey = keylock.reserve('mrk_marker_seq', rows)
+        historyKey = keylock.reserve('mrk_history_seq', rows)
+        alleleKey = keylock.reserve('all_allele_seq', rows)
+        noteKey = keylock.reserve('mgi_note_seq', rows)
+        refAssocKey = keylock.reserve('mgi_reference_assoc_seq', rows)
+        synKey = keylock.reserve('mgi_synonym_seq', synonyms)
+        mappingKey = keylock.reserve('mld_expt_marker_seq', rows)
+        mcvKey = keylock.reserve('voc_annot_seq', rows)
+    except RuntimeError as e:
+        exit(1, '%s\n' % (e))
+
+    accKey = keylock.nextAccessionKey()
+    mgiKey = keylock.nextMGIKey(mgiPrefix)
+    keysReserved = 1
+
+    diagFile.write('Reserved Keys: %d rows, %d synonyms\n' % (rows, synonyms))
+
 def loadDictionaries():
     '''
     # requires:
     #
     # effects:
-    #	loads global dictionaries: statusDict, logicalDBDict
+    #	loads global dictionaries: statusDict, logicalDBDict, mcvDict,
+    #	markerTypeDict, chromosomeDict
     #	for quicker lookup
     #
     # returns:
     #	nothing
     '''
 
-    global statusDict, logicalDBDict, mcvDict
+    global statusDict, logicalDBDict, mcvDict, markerTypeDict, chromosomeDict
+    global dictionariesLoaded
+
+    statusDict = {}
+    logicalDBDict = {}
+    mcvDict = {}
+    markerTypeDict = {}
+    chromosomeDict = {}
 
     results = db.sql('select _Marker_Status_key, status from MRK_Status', 'auto')
     for r in results:
@@ -737,135 +1141,407 @@ def loadDictionaries():
         ''', 'auto')
     for r in results:
         mcvDict[r['accid']] = r['_term_key']
+
+    results = db.sql('select _Marker_Type_key, name from MRK_Types', 'auto')
+    for r in results:
+        markerTypeDict[r['name']] = r['_Marker_Type_key']
+
+    results = db.sql('select chromosome from MRK_Chromosome where _Organism_key = 1', 'auto')
+    for r in results:
+        chromosomeDict[r['chromosome']] = 1
     #print(mcvDict)
 
-def processFile():
+    dictionariesLoaded = warm
+
+def loadSnapshot():
     '''
     # requires:
     #
     # effects:
-    #	Reads input file
-    #	Verifies and Processes each line in the input file
+    #	validate mode : loads the reference-data snapshot (NOMEN_SNAPSHOT)
+    #	if it exists and is current; the snapshot is not used
+    #	(and the database is used) if it cannot be read
     #
     # returns:
     #	nothing
     #
     '''
 
-    global bcpon
-    global markerKey, accKey, mgiKey, synKey, refAssocKey, createdByKey, alleleKey
-    global noteKey, historyKey, mappingKey, mcvKey
-    global markerType 
-    global symbol 
-    global name 
-    global chromosome 
-    global markerStatus 
-    global jnum 
-    global synonyms 
-    global otherAccIDs 
-    global mcvTerm
-    global notes 
-    global createdBy
-    global otherAccDict
-    global mcvDict
-    global markerLookup
-    global mgiCount
+    global snapshot
 
-    # For each line in the input file
+    try:
+        snapshot = nomensnapshot.load(snapshotFileName)
+    except Exception as e:
+        sys.stderr.write('WARNING: snapshot not used: %s\n' % (e))
+        snapshot = None
 
-    lineNum = 0
+def loadSnapshotDictionaries():
+    '''
+    # requires:
+    #
+    # effects:
+    #	loads global dictionaries from the snapshot (see loadDictionaries())
+    #
+    # returns:
+    #	nothing
+    '''
 
-    for line in inputFile.readlines():
+    global statusDict, logicalDBDict, mcvDict, markerTypeDict, chromosomeDict
+    global dictionariesLoaded
 
-        lineNum = lineNum + 1
-        otherAccDict = {}
+    statusDict = snapshot.statusDict
+    logicalDBDict = snapshot.logicalDBDict
+    mcvDict = snapshot.mcvDict
+    markerTypeDict = snapshot.markerTypeDict
+    chromosomeDict = snapshot.chromosomeDict
 
-        # Split the line into tokens
-        tokens = str.split(line[:-1], '\t')
+    dictionariesLoaded = 0
 
-        try:
-            markerType = tokens[0]
-            symbol = tokens[1]
-            name = tokens[2]
-            chromosome = tokens[3]
-            markerStatus = tokens[4]
-            jnum = tokens[5]
-            synonyms = tokens[6]
-            otherAccIDs = tokens[7]
-            mcvTerm = tokens[8]
-            notes = tokens[9]
-            createdBy = tokens[10]
-        except:
-            errorFile.write('Invalid Line (missing column(s)) (row %d): %s\n' % (lineNum, line))
-            continue
+def compileWildTypeRules():
+    '''
+    # requires:
+    #
+    # effects:
+    #	compiles the wild-type allele exclusion patterns from the 
+    #	configuration (WILDTYPE_SYMBOL_EXCLUDE, WILDTYPE_NAME_EXCLUDE;
+    #	separated by "|") into one matcher for the symbol and one for the name.
+    #	each pattern is a named group so the matching rule can be counted.
+    #
+    # returns:
+    #	nothing
+    #
+    '''
 
-        #
-        # sanity checks
-        #
+    global wildTypeRules, wildTypeSymbolMatcher, wildTypeNameMatcher, wildTypeSuppressed
 
-        if sanityCheck(markerType, symbol, chromosome, markerStatus, jnum, synonyms,
-                otherAccIDs, createdBy, lineNum) == 1:
-            errorFile.write(str(tokens) + '\n\n')
+    wildTypeRules = []
+    wildTypeSuppressed = {}
+    symbolGroups = []
+    nameGroups = []
+
+    for field, patterns, groups in (('symbol', wildTypeSymbolExclude, symbolGroups), 
+                                    ('name', wildTypeNameExclude, nameGroups)):
+        for pattern in str.split(patterns, '|'):
+            if len(pattern) > 0:
+                groups.append('(?P<r%d>%s)' % (len(wildTypeRules), re.escape(pattern)))
+                wildTypeRules.append((field, pattern))
+                wildTypeSuppressed[(field, pattern)] = 0
+
+    if len(symbolGroups) > 0:
+        wildTypeSymbolMatcher = re.compile('|'.join(symbolGroups))
+
+    if len(nameGroups) > 0:
+        wildTypeNameMatcher = re.compile('|'.join(nameGroups))
+
+def verifyWildType(symbol, name):
+    '''
+    # requires:
+    #	symbol - the Marker Symbol
+    #	name - the Marker Name
+    #
+    # effects:
+    #	verifies that the symbol/name do not match any of the
+    #	wild-type allele exclusion rules (see compileWildTypeRules())
+    #	counts the rule that suppressed the wild-type allele
+    #
+    # returns:
+    #	1 if a wild-type allele should be created
+    #	0 if the wild-type allele is suppressed
+    #
+    '''
+
+    for matcher, value in ((wildTypeSymbolMatcher, symbol), (wildTypeNameMatcher, name)):
+        if matcher is None:
+            continue
+        match = matcher.search(value)
+        if match is not None:
+            wildTypeSuppressed[wildTypeRules[int(match.lastgroup[1:])]] += 1
+            return 0
+
+    return 1
+
+def readInputFiles():
+    '''
+    # requires:
+    #
+    # effects:
+    #	reads the input files; the rows are numbered across the input files
+    #	if there is more than 1 input file, the rows of each input file
+    #	are written to the diagnostics and error files
+    #
+    # returns:
+    #	the lines of the input files
+    #
+    '''
+
+    lines = []
+
+    for inputFile in inputFiles:
+        fileLines = inputFile.readlines()
+
+        # the last line of a file may not end with a newline
+        if len(fileLines) > 0 and not fileLines[-1].endswith('\n'):
+            fileLines[-1] = fileLines[-1] + '\n'
+
+        if len(inputFiles) > 1:
+            for fp in (diagFile, errorFile):
+                fp.write('Input File: %s (rows %d-%d)\n' % (inputFile.name, len(lines) + 1, len(lines) + len(fileLines)))
+
+        lines.extend(fileLines)
+
+    return lines
+
+def checkLedger(lines):
+    '''
+    # requires:
+    #	lines - the lines of the input files
+    #
+    # effects:
+    #	looks up the rows in the load ledger (NOMEN_LEDGER; see loadledger.py)
+    #	and sets alreadyLoaded : the rows loaded by a previous run are
+    #	skipped (not checked, not loaded) and written to the error file
+    #	as "Already loaded"
+    #	no ledger is used in validate mode with a snapshot (no database)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global alreadyLoaded
+
+    if len(ledgerFileName) == 0 or snapshot is not None:
+        return
+
+    rows = []
+    for lineNum in range(len(lines)):
+        tokens = str.split(lines[lineNum][:-1], '\t')
+        if len(tokens) >= 11:
+            rows.append((lineNum + 1, tokens))
+
+    alreadyLoaded = loadledger.lookup(ledgerFileName, rows)
+
+    for lineNum in sorted(alreadyLoaded):
+        errorFile.write('Already loaded (row %d): %s ; %s\n' % (lineNum, alreadyLoaded[lineNum][0], alreadyLoaded[lineNum][1]))
+
+    if len(alreadyLoaded) > 0:
+        errorFile.write('\n')
+
+    diagFile.write('Already loaded rows (ledger %s): %d\n' % (ledgerFileName, len(alreadyLoaded)))
+    runhistory.setCount('alreadyLoadedRows', len(alreadyLoaded))
+
+def recordLedger():
+    '''
+    # requires:
+    #
+    # effects:
+    #	adds the rows loaded by this run to the load ledger (NOMEN_LEDGER)
+    #	errors are written to the diagnostics file : the load is complete
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    if len(ledgerFileName) == 0:
+        return
+
+    try:
+        loadledger.record(ledgerFileName, ledgerRows, ' '.join(getInputFileNames()))
+        diagFile.write('Ledger %s : %d rows recorded\n' % (ledgerFileName, len(ledgerRows)))
+    except Exception as e:
+        diagFile.write('Ledger %s : not updated: %s\n' % (ledgerFileName, e))
+
+def getMappingFile(referenceKey, jnum):
+    '''
+    # requires:
+    #	referenceKey - the reference of the record
+    #	jnum - the J: of the record
+    #
+    # effects:
+    #	the records are partitioned by reference : each reference has its own
+    #	mapping file (the mappingload is run once per reference).
+    #	the first reference uses MAPPINGDATAFILE; each other reference uses
+    #	MAPPINGDATAFILE.J<number>
+    #
+    # returns:
+    #	the mapping file descriptor of the reference
+    #
+    '''
+
+    if referenceKey not in mappingFiles:
+        if len(mappingFiles) == 0:
+            fileName = mappingFileName
+            mappingFiles[referenceKey] = mappingFile
+        else:
+            fileName = '%s.%s' % (mappingFileName, jnum.replace(':', ''))
+            try:
+                mappingFiles[referenceKey] = open(fileName, 'w')
+            except:
+                exit(1, 'Could not open file %s\n' % fileName)
+        mappingFileNames.append(fileName)
+
+    return mappingFiles[referenceKey]
+
+def writeOutputRecord(tokens, referenceKey, createdByKey):
+    '''
+    # requires:
+    #	tokens - the input columns of the record
+    #	referenceKey - the reference of the record
+    #	createdByKey - the user of the record
+    #
+    # effects:
+    #	writes the record, with its MGI Accession ID (mgiKey), to the output
+    #	file and its mapping record (mappingKey) to the mapping file of
+    #	the reference
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    outputFile.write('%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n' \
+            % (tokens[0], tokens[1], tokens[2], tokens[3], \
+            tokens[4], tokens[5], mgi_utils.prvalue(tokens[6]), \
+            mgi_utils.prvalue(tokens[7]), \
+            mgi_utils.prvalue(tokens[8]), \
+            mgi_utils.prvalue(tokens[9]), createdByKey, \
+            mgiPrefix + str(mgiKey)))
+
+    getMappingFile(referenceKey, tokens[5]).write('%s|%s%d|%s|%s|%s|%s|%s|%s|%s\n' \
+        % (mappingKey, mgiPrefix, mgiKey, tokens[3], mappingCol3, mappingCol4, \
+            mappingCol5, mappingCol6, tokens[5], tokens[10]))
+
+def processFile():
+    '''
+    # requires:
+    #
+    # effects:
+    #	Reads input file
+    #	Verifies and Processes each line in the input file
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global bcpon
+    global markerKey, accKey, mgiKey, synKey, refAssocKey, createdByKey, alleleKey
+    global noteKey, historyKey, mappingKey, mcvKey
+    global markerType 
+    global symbol 
+    global name 
+    global chromosome 
+    global markerStatus 
+    global jnum 
+    global synonyms 
+    global otherAccIDs 
+    global mcvTerm
+    global notes 
+    global createdBy
+    global otherAccDict
+    global mcvDict
+    global markerLookup
+    global mgiCount
+
+    # For each line in the input file
+
+    lineNum = 0
+    rejected = 0
+    lines = readInputFiles()
+
+    checkLedger(lines)
+    verifySynonyms(lines)
+
+    #
+    # columnar checks for large files (NOMEN_COLUMNAR_ROWS)
+    #
+    if columnarRows > 0 and len(lines) >= columnarRows:
+        verifyColumns(lines)
+
+    for line in lines:
+
+        lineNum = lineNum + 1
+        otherAccDict = {}
+
+        if lineNum in alreadyLoaded:
+            continue
+
+        # Split the line into tokens
+        tokens = str.split(line[:-1], '\t')
+
+        try:
+            markerType = tokens[0]
+            symbol = tokens[1]
+            name = tokens[2]
+            chromosome = tokens[3]
+            markerStatus = tokens[4]
+            jnum = tokens[5]
+            synonyms = tokens[6]
+            otherAccIDs = tokens[7]
+            mcvTerm = tokens[8]
+            notes = tokens[9]
+            createdBy = tokens[10]
+        except:
+            errorFile.write('Invalid Line (missing column(s)) (row %d): %s\n' % (lineNum, line))
+            rejected = rejected + 1
+            continue
+
+        #
+        # sanity checks
+        #
+
+        if sanityCheck(markerType, symbol, chromosome, markerStatus, jnum, synonyms,
+                otherAccIDs, createdBy, lineNum) == 1:
+            errorFile.write(str(tokens) + '\n\n')
+            rejected = rejected + 1
 
             # uncomment, if the bcp should not run if at least 1 error is found
             #bcpon = 0
 
             continue
 
+        # validate mode : sanity checks only
+        if validateOnly:
+            continue
+
         if chromosome == 'UN':
                 cmOffset = -999
         else:
                 cmOffset = -1
 
         # if no errors, process the marker
-        markerFile.write('%d|1|%d|%d|%s|%s|%s||%s|%s|%s|%s|%s\n' \
-            % (markerKey, markerStatusKey, markerTypeKey, symbol, name, chromosome, cmOffset, \
+        markerFile.writeRow((markerKey, 1, markerStatusKey, markerTypeKey, symbol, name, chromosome, None, cmOffset, \
                 createdByKey, createdByKey, cdate, cdate))
 
-        mrkcurrentFile.write('%d|%d|%s|%s\n' \
-            % (markerKey, markerKey, cdate, cdate))
+        mrkcurrentFile.writeRow((markerKey, markerKey, cdate, cdate))
 
-        historyFile.write('%d|%d|106563604|106563610|%d|%d|1|%s|%s|%s|%s|%s|%s\n' \
-            % (historyKey, markerKey, markerKey, referenceKey, name, cdate,
+        historyFile.writeRow((historyKey, markerKey, 106563604, 106563610, markerKey, referenceKey, 1, name, cdate,
                 createdByKey, createdByKey, cdate, cdate))
 
         # maybe we don't need this
-        refFile.write('%d|%d|%d|%d|%d|%s|%s|%s|%s\n' \
-            % (refAssocKey, referenceKey, markerKey, mgiTypeKey, \
+        refFile.writeRow((refAssocKey, referenceKey, markerKey, mgiTypeKey, \
                 refAssocTypeKey, createdByKey, createdByKey, cdate, cdate))
 
         # MGI Accession ID for the marker
 
-        accFile.write('%d|%s%d|%s|%s|1|%d|%d|0|1|%s|%s|%s|%s\n' \
-            % (accKey, mgiPrefix, mgiKey, mgiPrefix, mgiKey, markerKey, \
-                mgiTypeKey, createdByKey, createdByKey, cdate, cdate))
+        accFile.writeRow((accKey, mgiPrefix + str(mgiKey), mgiPrefix, mgiKey, 1, markerKey, \
+                mgiTypeKey, 0, 1, createdByKey, createdByKey, cdate, cdate))
+
+        ledgerRows.append((loadledger.rowHash(tokens), symbol, markerKey, mgiPrefix + str(mgiKey)))
 
         # Sequence Notes (1009)
         if len(notes) > 0:
-            notes = notes.replace('|', '\\|')
-            noteFile.write('%d|%s|2|1009|%s|%s|%s|%s|%s\n' \
-                % (noteKey, markerKey, notes, createdByKey, createdByKey, cdate, cdate))
+            noteFile.writeRow((noteKey, markerKey, 2, 1009, notes, createdByKey, createdByKey, cdate, cdate))
             noteKey = noteKey + 1
 
         # MCV Term (1011)
-        mcvFile.write('%d|1011|%s|%s|1614158|%s|%s\n' \
-            % (mcvKey, markerKey, mcvTermKey, cdate, cdate))
+        mcvFile.writeRow((mcvKey, 1011, markerKey, mcvTermKey, 1614158, cdate, cdate))
         mcvKey = mcvKey + 1
 
         # write record back out and include MGI Accession ID
-        outputFile.write('%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n' \
-                % (markerType, symbol, name, chromosome, \
-                markerStatus, jnum, mgi_utils.prvalue(synonyms), \
-                mgi_utils.prvalue(otherAccIDs), \
-                mgi_utils.prvalue(mcvTerm), \
-                mgi_utils.prvalue(notes), createdByKey, \
-                mgiPrefix + str(mgiKey)))
-
         # mapping record; write it out before incrementing the acc id keys
-
-        mappingFile.write('%s|%s%d|%s|%s|%s|%s|%s|%s|%s\n' \
-            % (mappingKey, mgiPrefix, mgiKey, chromosome, mappingCol3, mappingCol4, \
-                mappingCol5, mappingCol6, jnum, createdBy))
+        writeOutputRecord(tokens, referenceKey, createdByKey)
 
         accKey = accKey + 1
         mgiKey = mgiKey + 1
@@ -876,8 +1552,7 @@ def processFile():
         # synonyms
         for o in str.split(synonyms, '|'):
             if len(o) > 0:
-                synFile.write('%d|%d|%d|%d|%s|%s|%s|%s|%s|%s\n' \
-                    % (synKey, markerKey, mgiTypeKey, synTypeKey, referenceKey, \
+                synFile.writeRow((synKey, markerKey, mgiTypeKey, synTypeKey, referenceKey, \
                         o, createdByKey, createdByKey, cdate, cdate))
                 synKey = synKey + 1
 
@@ -885,12 +1560,10 @@ def processFile():
 
         for acc in list(otherAccDict.keys()):
             prefixpart, numericpart = accessionlib.split_accnum(acc)
-            accFile.write('%d|%s|%s|%s|%d|%d|%d|0|1|%s|%s|%s|%s\n' \
-                % (accKey, acc, prefixpart, numericpart, otherAccDict[acc], \
-                    markerKey, mgiTypeKey, createdByKey, createdByKey, \
+            accFile.writeRow((accKey, acc, prefixpart, numericpart, otherAccDict[acc], \
+                    markerKey, mgiTypeKey, 0, 1, createdByKey, createdByKey, \
                     cdate, cdate))
-            accrefFile.write('%d|%s|%s|%s|%s|%s\n' \
-                % (accKey, referenceKey, createdByKey, createdByKey, \
+            accrefFile.writeRow((accKey, referenceKey, createdByKey, createdByKey, \
                     cdate, cdate))
             accKey = accKey + 1
 
@@ -899,24 +1572,15 @@ def processFile():
         #
 
         if markerStatus == 'official' and markerTypeKey == 1:
-            if symbol.find('mt-') < 0 or \
-               name.find('withdrawn, =') < 0 or  \
-               name.find('dna segment') < 0 or \
-               name.find('EST ') < 0 or \
-               name.find('expressed sequence') < 0 or \
-               name.find('cDNA sequence') < 0 or \
-               name.find('gene model') < 0 or \
-               name.find('hypothetical protein') < 0 or \
-               name.find('ecotropic viral integration site') < 0 or \
-               name.find('viral polymerase') < 0:
-
-                alleleFile.write('%d|%d|-2|847095|847131|847114|3982955|11025586|%s|%s|1|0|0||4268545|%s|%s|%s|%s|%s|%s\n' \
-                        % (alleleKey, markerKey, symbol + '<+>', 'wild type', createdByKey, createdByKey, createdByKey, cdate, cdate, cdate))
+            if verifyWildType(symbol, name):
+
+                alleleFile.writeRow((alleleKey, markerKey, -2, 847095, 847131, 847114, 3982955, 11025586, \
+                        symbol + '<+>', 'wild type', 1, 0, 0, None, 4268545, \
+                        createdByKey, createdByKey, createdByKey, cdate, cdate, cdate))
 
                 # MGI Accession ID for the allele
-                accFile.write('%d|%s%d|%s|%s|1|%d|%d|0|1|%s|%s|%s|%s\n' \
-                    % (accKey, mgiPrefix, mgiKey, mgiPrefix, mgiKey, alleleKey, \
-                        alleleTypeKey, createdByKey, createdByKey, cdate, cdate))
+                accFile.writeRow((accKey, mgiPrefix + str(mgiKey), mgiPrefix, mgiKey, 1, alleleKey, \
+                        alleleTypeKey, 0, 1, createdByKey, createdByKey, cdate, cdate))
 
                 alleleKey = alleleKey + 1
                 accKey = accKey + 1
@@ -928,12 +1592,31 @@ def processFile():
 
     # end of "for line in inputFile.readlines():"
 
+    runhistory.setCount('inputRows', lineNum)
+    runhistory.setCount('acceptedRows', lineNum - rejected - len(alreadyLoaded))
+    runhistory.setCount('rejectedRows', rejected)
+
+    verifycache.writeStats(diagFile)
+
+    if validateOnly:
+        return
+
+    diagFile.write('\nWild-type alleles suppressed by rule:\n')
+    for rule in wildTypeRules:
+        diagFile.write('%s\t%s\t%d\n' % (rule[0], rule[1], wildTypeSuppressed[rule]))
+
+    diagFile.write('\nMapping files (one per reference):\n')
+    for fileName in mappingFileNames:
+        diagFile.write('%s\n' % (fileName))
+
     markerFile.close()
     refFile.close()
     synFile.close()
     accFile.close()
     accrefFile.close()
     mappingFile.close()
+    for fp in mappingFiles.values():
+        fp.close()
     mrkcurrentFile.close()
     historyFile.close()
     alleleFile.close()
@@ -941,133 +1624,583 @@ def processFile():
     mcvFile.close()
     db.commit()
 
-def bcpFiles():
+def bcpTables():
     '''
     # requires:
     #
+    # returns:
+    #	[(table name, bcp file name), ...] in load order
+    #
+    '''
+
+    return [
+        ('MRK_Marker', markerFileName),
+        ('MGI_Reference_Assoc', refFileName),
+        ('MGI_Synonym', synFileName),
+        ('ACC_Accession', accFileName),
+        ('ACC_AccessionReference', accrefFileName),
+        ('MRK_Current', mrkcurrentFileName),
+        ('MRK_History', historyFileName),
+        ('ALL_Allele', alleleFileName),
+        ('MGI_Note', noteFileName),
+        ('VOC_Annot', mcvFileName),
+        ]
+
+def bcpCommand(table, fileName, fileFormat):
+    '''
+    # requires:
+    #	table - the table name
+    #	fileName - the bcp file (in the current directory)
+    #	fileFormat - the format of the bcp file (text, binary)
+    #
+    # returns:
+    #	the command that loads the bcp file (one transaction) :
+    #	bcpin.csh (text) or the psql client-side copy (binary)
+    #
+    '''
+
+    currentDir = os.getcwd()
+
+    if fileFormat == pgcopy.BINARY:
+        return '%s -h %s -d %s -U %s -v ON_ERROR_STOP=1 -c "\\copy %s from \'%s/%s\' with (format binary)"' % \
+            (psqlCommand, db.get_sqlServer(), db.get_sqlDatabase(), user, table, currentDir, fileName)
+
+    return '%s/bin/bcpin.csh %s %s %s %s %s "|" "\\n" mgd' % \
+        (os.environ['PG_DBUTILS'], db.get_sqlServer(), db.get_sqlDatabase(), table, currentDir, fileName)
+
+def committedKey(manifest, entry):
+    '''
+    # requires:
+    #	manifest - the bcp manifest
+    #	entry - the manifest entry of a table
+    #
+    # effects:
+    #	compares the rows of the database in the key range of the bcp file
+    #	(firstKey, lastKey) with the rows of the file : a row is a row of
+    #	this load if its identifying columns (see pgcopy.IDENTITY) match
+    #	exits if a key of the file is used by a row of another load (the
+    #	keys were taken by a job that does not reserve them)
+    #
+    # returns:
+    #	the last key of the bcp file that is in the database
+    #	firstKey - 1 if none
+    #
+    '''
+
+    table = entry['table']
+    fileFormat = manifest.get('format', pgcopy.TEXT)
+    keyColumn = pgcopy.KEYS[table]
+    columns = pgcopy.IDENTITY[table]
+
+    loadValues = {}
+    for key, row in pgcopy.readRows(entry['file'], fileFormat):
+        loadValues[key] = pgcopy.rowValues(row, table, [i for name, i in columns], fileFormat)
+
+    results = db.sql('''
+        select %s as rowkey, %s from %s where %s between %d and %d
+        ''' % (keyColumn, ', '.join(['%s as value%d' % (name, i) for name, i in columns]),
+            table, keyColumn, entry['firstKey'], entry['lastKey']), 'auto')
+
+    lastKey = entry['firstKey'] - 1
+    otherKeys = []
+
+    for r in results:
+        values = [r['value%d' % (i)] for name, i in columns]
+        values = [None if v is None else str(v) for v in values]
+        if loadValues.get(r['rowkey']) == values:
+            lastKey = max(lastKey, r['rowkey'])
+        else:
+            otherKeys.append(r['rowkey'])
+
+    if len(otherKeys) > 0:
+        entry['status'] = bcpmanifest.FAILED
+        bcpmanifest.write(manifestFileName, manifest)
+        otherKeys.sort()
+        exit(1, 'BCP cannot be resumed: %s keys %d-%d : %d key(s) used by another load (%s%s).\n' \
+            'Remove the rows of this load and %s, then load the input file again.\n' \
+            % (table, entry['firstKey'], entry['lastKey'], len(otherKeys),
+               ', '.join([str(k) for k in otherKeys[:10]]), ', ...' if len(otherKeys) > 10 else '',
+               manifestFileName))
+
+    return lastKey
+
+def loadChunk(manifest, entry, chunkFileName, chunk):
+    '''
+    # requires:
+    #	manifest - the bcp manifest
+    #	entry - the manifest entry of the table
+    #	chunkFileName - the chunk bcp file
+    #	chunk - [(key, row), ...] : the rows of the chunk (see pgcopy.readRows())
+    #
     # effects:
-    #	BCPs the data into the database
+    #	loads the chunk (one transaction); writes the manifest
+    #	exits if the chunk fails
     #
     # returns:
     #	nothing
     #
     '''
 
-    bcpCommand = os.environ['PG_DBUTILS'] + '/bin/bcpin.csh'
-    currentDir = os.getcwd()
+    fileFormat = manifest.get('format', pgcopy.TEXT)
+    pgcopy.writeRows(chunkFileName, fileFormat, [row for key, row in chunk])
 
-    bcp1 = '%s %s %s %s %s %s "|" "\\n" mgd' % \
-        (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), 'MRK_Marker', currentDir, markerFileName)
+    bcp = bcpCommand(entry['table'], chunkFileName, fileFormat)
+    diagFile.write('%s (keys %d-%d)\n' % (bcp, chunk[0][0], chunk[-1][0]))
+    diagFile.flush()
 
-    bcp2 = '%s %s %s %s %s %s "|" "\\n" mgd' % \
-        (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), 'MGI_Reference_Assoc', currentDir, refFileName)
+    if os.system(bcp) != 0:
+        entry['status'] = bcpmanifest.FAILED
+        bcpmanifest.write(manifestFileName, manifest)
+        exit(1, 'BCP failed: %s, keys %d-%d (see %s)\n' \
+            % (entry['table'], chunk[0][0], chunk[-1][0], manifestFileName))
 
-    bcp3 = '%s %s %s %s %s %s "|" "\\n" mgd' % \
-        (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), 'MGI_Synonym', currentDir, synFileName)
+    entry['loadedRows'] = entry['loadedRows'] + len(chunk)
+    entry['committedKey'] = chunk[-1][0]
+    bcpmanifest.write(manifestFileName, manifest)
 
-    bcp4 = '%s %s %s %s %s %s "|" "\\n" mgd' % \
-        (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), 'ACC_Accession', currentDir, accFileName)
+def bcpChunks(manifest, entry):
+    '''
+    # requires:
+    #	manifest - the bcp manifest
+    #	entry - the manifest entry of the table
+    #
+    # effects:
+    #	chunked load (NOMEN_BCP_CHUNK_ROWS) : loads the rows of the bcp file
+    #	in chunks, each chunk in its own transaction (bounded lock hold
+    #	time and WAL per transaction); the manifest is written after
+    #	each chunk (loadedRows, committedKey)
+    #	the rows already in the database (keys up to the last committed key;
+    #	see committedKey()) are skipped : a failed chunked load is resumed
+    #	after its last committed chunk
+    #	exits if a chunk fails or the bcp file is truncated
+    #
+    # returns:
+    #	nothing
+    #
+    '''
 
-    bcp5 = '%s %s %s %s %s %s "|" "\\n" mgd' % \
-        (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), 'ACC_AccessionReference', currentDir, accrefFileName)
+    fileFormat = manifest.get('format', pgcopy.TEXT)
+    chunkFileName = entry['file'] + '.chunk'
+    chunk = []
+    skipped = 0
 
-    bcp6 = '%s %s %s %s %s %s "|" "\\n" mgd' % \
-        (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), 'MRK_Current', currentDir, mrkcurrentFileName)
+    # an empty file (or a manifest without key ranges : its tables were
+    # loaded in one transaction each) : no rows are in the database
+    if entry.get('firstKey') is None:
+        lastKey = -1
+    else:
+        lastKey = committedKey(manifest, entry)
 
-    bcp7 = '%s %s %s %s %s %s "|" "\\n" mgd' % \
-        (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), 'MRK_History', currentDir, historyFileName)
+    entry['loadedRows'] = 0
 
-    bcp8 = '%s %s %s %s %s %s "|" "\\n" mgd' % \
-        (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), 'ALL_Allele', currentDir, alleleFileName)
+    try:
+        for key, row in pgcopy.readRows(entry['file'], fileFormat):
 
-    bcp9 = '%s %s %s %s %s %s "|" "\\n" mgd' % \
-        (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), 'MGI_Note', currentDir, noteFileName)
+            if key <= lastKey:
+                skipped = skipped + 1
+                entry['loadedRows'] = skipped
+                continue
 
-    bcp10 = '%s %s %s %s %s %s "|" "\\n" mgd' % \
-        (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), 'VOC_Annot', currentDir, mcvFileName)
+            chunk.append((key, row))
 
-    diagFile.write('%s\n' % bcp1)
-    diagFile.write('%s\n' % bcp2)
-    diagFile.write('%s\n' % bcp3)
-    diagFile.write('%s\n' % bcp4)
-    diagFile.write('%s\n' % bcp5)
-    diagFile.write('%s\n' % bcp6)
-    diagFile.write('%s\n' % bcp7)
-    diagFile.write('%s\n' % bcp8)
-    diagFile.write('%s\n' % bcp9)
-    diagFile.write('%s\n' % bcp10)
+            if len(chunk) >= chunkRows:
+                loadChunk(manifest, entry, chunkFileName, chunk)
+                chunk = []
+    except ValueError as e:
+        entry['status'] = bcpmanifest.FAILED
+        bcpmanifest.write(manifestFileName, manifest)
+        exit(1, 'BCP failed: %s : %s (see %s)\n' % (entry['table'], e, manifestFileName))
 
-    os.system(bcp1)
-    os.system(bcp2)
-    os.system(bcp3)
-    os.system(bcp4)
-    os.system(bcp5)
-    os.system(bcp6)
-    os.system(bcp7)
-    os.system(bcp8)
-    os.system(bcp9)
-    os.system(bcp10)
+    if len(chunk) > 0:
+        loadChunk(manifest, entry, chunkFileName, chunk)
 
-    # update the max accession ID value
-    db.sql('select * from ACC_setMax (%d)' % (mgiCount), None)
-    db.commit()
+    if os.path.exists(chunkFileName):
+        os.remove(chunkFileName)
 
-    # update mrk_marker_seq auto-sequence
-    db.sql(''' select setval('mrk_marker_seq', (select max(_Marker_key) from MRK_Marker)) ''', None)
-    db.commit()
+    if skipped > 0:
+        diagFile.write('%s : %d rows already loaded (keys up to %d)\n' % (entry['table'], skipped, lastKey))
 
-    # update mgi_note_seq auto-sequence
-    db.sql(''' select setval('mgi_note_seq', (select max(_Note_key) from MGI_Note)) ''', None)
-    db.commit()
-    
-    # update mrk_history_seq auto-sequence
-    db.sql(''' select setval('mrk_history_seq', (select max(_Assoc_key) from MRK_History)) ''', None)
-    db.commit()
+def bcpFiles(manifest = None):
+    '''
+    # requires:
+    #	manifest - the bcp manifest of a failed bcp stage (see resumeBcp())
+    #		   if None, a new manifest is created
+    #
+    # effects:
+    #	BCPs the data into the database, table by table, in load order
+    #	(tables that are already "loaded" in the manifest are skipped)
+    #	the manifest is written after each table
+    #	stops at the first failed table
+    #
+    #	NOMEN_BCP_CHUNK_ROWS > 0 : each table is loaded in chunks
+    #	(see bcpChunks())
+    #
+    #	a resumed bcp stage exits if the key range of a table holds rows of
+    #	another load, and skips a table whose rows are all in the database
+    #	(see committedKey())
+    #
+    #	once all tables are loaded, updates the max accession ID value
+    #	(ACC_setMax) and the auto-sequences (unless the keys were reserved)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
 
-    # update mgi_reference_assoc_seq auto-sequence
-    db.sql(''' select setval('mgi_reference_assoc_seq', (select max(_Assoc_key) from MGI_Reference_Assoc)) ''', None)
-    db.commit()
+    # a resumed bcp stage : the key range of each table is checked first
+    resumed = manifest is not None
 
-    # update mgi_synonym_seq auto-sequence
-    db.sql(''' select setval('mgi_synonym_seq', (select max(_Synonym_key) from MGI_Synonym)) ''', None)
-    db.commit()
+    if manifest is None:
+        manifest = bcpmanifest.create(getInputFileNames(), bcpTables(), mgiCount, mappingFileNames, bcpFormat)
+        manifest['keysReserved'] = keysReserved
+        manifest['ledgerRows'] = ledgerRows
+        bcpmanifest.write(manifestFileName, manifest)
 
-    # update all_allele_seq auto-sequence
-    db.sql(''' select setval('all_allele_seq', (select max(_Allele_key) from ALL_Allele)) ''', None)
-    db.commit()
+    # the accession keys are protected from the batch jobs (max + 1) until the rows are loaded
+    if manifest.get('keysReserved'):
+        keylock.lock(keylock.ACCESSION)
 
-    # update mld_expt_marker_seq auto-sequence
-    db.sql(''' select setval('mld_expt_marker_seq', (select max(_Assoc_key) from MLD_Expt_Marker)) ''', None)
-    db.commit()
+    for entry in manifest['tables']:
+
+        if entry['status'] == bcpmanifest.LOADED:
+            diagFile.write('%s : already loaded (%d rows)\n' % (entry['table'], entry['rows']))
+            continue
+
+        if bcpmanifest.checksum(entry['file']) != entry['checksum']:
+            entry['status'] = bcpmanifest.FAILED
+            bcpmanifest.write(manifestFileName, manifest)
+            exit(1, 'BCP file has changed since the manifest was written: %s\n' % (entry['file']))
 
-    # update voc_annot_seq auto-sequence
-    db.sql(''' select setval('voc_annot_seq', (select max(_Annot_key) from VOC_Annot)) ''', None)
+        if chunkRows > 0:
+            bcpChunks(manifest, entry)
+        elif resumed and entry.get('firstKey') is not None \
+                and committedKey(manifest, entry) == entry['lastKey']:
+            diagFile.write('%s : already in the database (%d rows)\n' % (entry['table'], entry['rows']))
+        else:
+            bcp = bcpCommand(entry['table'], entry['file'], manifest.get('format', pgcopy.TEXT))
+
+            diagFile.write('%s\n' % bcp)
+            diagFile.flush()
+
+            if os.system(bcp) != 0:
+                entry['status'] = bcpmanifest.FAILED
+                bcpmanifest.write(manifestFileName, manifest)
+                exit(1, 'BCP failed: %s (see %s)\n' % (entry['table'], manifestFileName))
+
+        entry['status'] = bcpmanifest.LOADED
+        bcpmanifest.write(manifestFileName, manifest)
+
+    # update the max accession ID value (before the ACCESSION lock is released)
+    db.sql('select * from ACC_setMax (%d)' % (manifest['mgiCount']), None)
     db.commit()
-    
-#
-# Main
-#
 
-#print 'verifyMode()'
-verifyMode()
+    keylock.unlockAll()
+
+    if manifest.get('keysReserved'):
+        # the keys were reserved : setval(max) could move a sequence
+        # back into the block of another job
+        diagFile.write('Keys reserved : no sequence fix-ups\n')
+    else:
+        # update the auto-sequences
+        for sequence, table, keyColumn in pgcopy.SEQUENCES:
+            db.sql(''' select setval(%s, (select max(%s) from %s)) ''' % (nomensql.quote(sequence), keyColumn, table), None)
+            db.commit()
+
+    manifest['fixups'] = bcpmanifest.LOADED
+    bcpmanifest.write(manifestFileName, manifest)
+
+def resumeBcp():
+    '''
+    # requires:
+    #
+    # effects:
+    #	Resumes a failed bcp stage using the bcp manifest and the
+    #	bcp files of the failed run : the tables that were not loaded
+    #	are loaded and the auto-sequences are updated.
+    #	The input file is not processed again (the primary keys in
+    #	the bcp files were reserved by the failed run); the ledger rows
+    #	of the failed run are read from the manifest (see recordLedger()).
+    #
+    #	Exits if the input file has changed since the failed run.
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global diagFile, errorFile, ledgerRows
+
+    manifest = bcpmanifest.read(manifestFileName)
+    ledgerRows = [tuple(r) for r in manifest.get('ledgerRows', [])]
+
+    db.useOneConnection(1)
+    db.set_sqlUser(user)
+    db.set_sqlPasswordFromFile(passwordFileName)
+
+    try:
+        diagFile = open(diagFileName, 'w')
+        errorFile = errorreport.ErrorReport(errorFileName)
+    except:
+        exit(1, 'Could not open file %s/%s\n' % (diagFileName, errorFileName))
+
+    db.set_sqlLogFunction(db.sqlLogAll)
+    db.set_commandLogFile(diagFileName)
+
+    diagFile.write('Start Date/Time: %s\n' % (mgi_utils.date()))
+    diagFile.write('Server: %s\n' % (db.get_sqlServer()))
+    diagFile.write('Database: %s\n' % (db.get_sqlDatabase()))
+    for fileName in getInputFileNames():
+        diagFile.write('Input File: %s\n' % (fileName))
+    diagFile.write('Resuming bcp stage of %s (manifest %s)\n\n' % (manifest['createDate'], manifestFileName))
+    errorFile.write('\nStart file: %s\n\n' % (mgi_utils.date()))
+
+    if bcpmanifest.inputChecksum(getInputFileNames()) != manifest['inputChecksum']:
+        errorFile.write('The input file(s) have changed since the failed bcp stage of %s.\n' % (manifest['createDate']))
+        errorFile.write('Restore the input file(s), or remove %s once the partially loaded data has been removed.\n' \
+                % (manifestFileName))
+        exit(1)
+
+    diagFile.write('Resuming bcp stage : loading data\n')
+    bcpFiles(manifest)
+
+def stageInput():
+    '''
+    # requires:
+    #
+    # effects:
+    #	staged load : reads the input files and copies the rows into
+    #	the staging tables (see nomenstage.py)
+    #	rows with missing columns are written to the error file
+    #	rows that are already loaded (see checkLedger()) are not staged
+    #
+    # returns:
+    #	lineCount - the number of input rows
+    #	stagedTokens - {line number : input columns} of the staged rows
+    #
+    '''
+
+    lineNum = 0
+    rows = []
+    stagedTokens = {}
+    lines = readInputFiles()
+
+    checkLedger(lines)
+
+    for line in lines:
+        lineNum = lineNum + 1
+        tokens = str.split(line[:-1], '\t')
+
+        if lineNum in alreadyLoaded:
+            continue
+
+        if len(tokens) < 11:
+            errorFile.write('Invalid Line (missing column(s)) (row %d): %s\n' % (lineNum, line))
+            continue
+
+        stagedTokens[lineNum] = tokens
+        rows.append([lineNum] + tokens[:11])
+
+    nomenstage.create()
+
+    if nomenstage.stage(stageFileName, rows, psqlCommand, user) != 0:
+        exit(1, 'Could not copy %s.%s into the staging table\n' % (stageFileName, nomenstage.runID))
+
+    diagFile.write('\nStaged %d rows : %s\n' % (len(rows), stageFileName))
+
+    return lineNum, stagedTokens
+
+def processStage(lineCount, stagedTokens):
+    '''
+    # requires:
+    #	lineCount, stagedTokens - see stageInput()
+    #
+    # effects:
+    #	staged load : runs the sanity checks in SQL (see nomenstage.validate())
+    #	and writes the messages to the error file
+    #	writes the accepted rows to the output and mapping files, using
+    #	the keys the rows will be published with (see nomenstage.publish())
+    #
+    # returns:
+    #	keys - the starting keys and constants for nomenstage.publish()
+    #	wildTypeLines - the line numbers of the rows that get a wild-type allele
+    #
+    '''
+
+    global mgiKey, mappingKey, mgiCount
+
+    messages = {}		# {line number : [validation rows]}
+    for r in nomenstage.validate():
+        messages.setdefault(r['lineNum'], []).append(r)
+
+    accepted = []
+    wildTypeLines = []
+
+    for lineNum in sorted(messages):
+        results = messages[lineNum]
+        tokens = stagedTokens[lineNum]
 
-#print 'init()'
-init()
+        for r in results:
+            if r['message'] is not None:
+                errorFile.write('%s\n' % (r['message']))
+
+        if results[0]['rejected']:
+            errorFile.write(str(tokens) + '\n\n')
+            continue
+
+        accepted.append((lineNum, tokens, results[0]['_Refs_key'], results[0]['_User_key']))
+
+        if tokens[4] == 'official' and results[0]['_Marker_Type_key'] == 1 and verifyWildType(tokens[1], tokens[2]):
+            wildTypeLines.append(lineNum)
+
+    runhistory.setCount('inputRows', lineCount)
+    runhistory.setCount('acceptedRows', len(accepted))
+    runhistory.setCount('rejectedRows', lineCount - len(accepted) - len(alreadyLoaded))
+
+    mgiCount = len(accepted) + len(wildTypeLines)
+
+    keys = {
+        'markerKey' : markerKey, 'historyKey' : historyKey, 'refAssocKey' : refAssocKey,
+        'accKey' : accKey, 'mgiKey' : mgiKey, 'noteKey' : noteKey, 'mcvKey' : mcvKey,
+        'synKey' : synKey, 'alleleKey' : alleleKey,
+        'mgiTypeKey' : mgiTypeKey, 'refAssocTypeKey' : refAssocTypeKey,
+        'synTypeKey' : synTypeKey, 'alleleTypeKey' : alleleTypeKey,
+        'mgiPrefix' : mgiPrefix, 'cdate' : cdate, 'mgiCount' : mgiCount,
+        }
+
+    for lineNum, tokens, referenceKey, createdByKey in accepted:
+        writeOutputRecord(tokens, referenceKey, createdByKey)
+        ledgerRows.append((loadledger.rowHash(tokens), tokens[1], markerKey + len(ledgerRows), mgiPrefix + str(mgiKey)))
+        mgiKey = mgiKey + 1
+        mappingKey = mappingKey + 1
+
+        if lineNum in wildTypeLines:
+            mgiKey = mgiKey + 1
+
+    diagFile.write('\nWild-type alleles suppressed by rule:\n')
+    for rule in wildTypeRules:
+        diagFile.write('%s\t%s\t%d\n' % (rule[0], rule[1], wildTypeSuppressed[rule]))
+
+    diagFile.write('\nMapping files (one per reference):\n')
+    for fileName in mappingFileNames:
+        diagFile.write('%s\n' % (fileName))
+
+    mappingFile.close()
+    for fp in mappingFiles.values():
+        fp.close()
+
+    return keys, wildTypeLines
+
+def publishStage(keys, wildTypeLines):
+    '''
+    # requires:
+    #	keys, wildTypeLines - see processStage()
+    #
+    # effects:
+    #	staged load : publishes the accepted rows in one transaction
+    #	(see nomenstage.publish()); nothing is loaded if it fails
+    #	writes the manifest (no bcp files; the mapping files of the run)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    try:
+        nomenstage.publish(keys, wildTypeLines, pgcopy.SEQUENCES, keysReserved)
+    except Exception as e:
+        exit(1, 'Publish failed; no data was loaded: %s\n' % (e))
 
-#print 'setPrimaryKeys()'
-setPrimaryKeys()
+    keylock.unlockAll()
 
-#print 'loadDictionaries()'
-loadDictionaries()
+    manifest = bcpmanifest.create(getInputFileNames(), [], mgiCount, mappingFileNames, bcpFormat)
+    manifest['keysReserved'] = keysReserved
+    manifest['fixups'] = bcpmanifest.LOADED
+    bcpmanifest.write(manifestFileName, manifest)
 
-#print 'processFile()'
-processFile()
+def main():
+    '''
+    # requires:
+    #
+    # effects:
+    #	Runs the nomenload : verify, process, bcp
+    #	Calls exit() with the final status
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    reset()
+
+    runhistory.start('nomenload', ' '.join(getInputFileNames()))
+
+    #print 'verifyMode()'
+    verifyMode()
+
+    if not DEBUG and bcpmanifest.isIncomplete(manifestFileName):
+        with runhistory.phase('bcpFiles'):
+            resumeBcp()
+        recordLedger()
+        exit(0)
+
+    #print 'loadSnapshot()'
+    if validateOnly and len(snapshotFileName) > 0:
+        with runhistory.phase('loadSnapshot'):
+            loadSnapshot()
+
+    #print 'init()'
+    with runhistory.phase('init'):
+        init()
+
+    #print 'setPrimaryKeys()'
+    if not validateOnly:
+        with runhistory.phase('setPrimaryKeys'):
+            setPrimaryKeys()
+
+    #print 'loadDictionaries()'
+    if snapshot is not None:
+        loadSnapshotDictionaries()
+    elif not dictionariesLoaded:
+        with runhistory.phase('loadDictionaries'):
+            loadDictionaries()
+
+    #print 'compileWildTypeRules()'
+    compileWildTypeRules()
+
+    if loadMethod == 'stage' and not validateOnly:
+        with runhistory.phase('stage'):
+            lineCount, stagedTokens = stageInput()
+        with runhistory.phase('processStage'):
+            keys, wildTypeLines = processStage(lineCount, stagedTokens)
+        if not DEBUG and bcpon:
+            print('sanity check PASSED : loading data')
+            with runhistory.phase('publish'):
+                publishStage(keys, wildTypeLines)
+            nomenstage.cleanup()
+            recordLedger()
+            exit(0)
+        else:
+            nomenstage.cleanup()
+            exit(1)
+
+    #print 'processFile()'
+    with runhistory.phase('processFile'):
+        processFile()
+
+    if not DEBUG and bcpon:
+        print('sanity check PASSED : loading data')
+    #    print('bcpFiles()')
+        with runhistory.phase('bcpFiles'):
+            bcpFiles()
+        recordLedger()
+        exit(0)
+    else:
+        exit(1)
+
+#
+# Main
+#
 
-if not DEBUG and bcpon:
-    print('sanity check PASSED : loading data')
-#    print('bcpFiles()')
-    bcpFiles()
-    exit(0)
-else:
-    exit(1)
+if __name__ == '__main__':
+    main()
 
@@ -6,7 +6,7 @@
 #  Purpose:
 # 	This script runs the Nomenclature & Mapping load
 #
-  Usage=nomenload.sh
+  Usage="nomenload.sh config [input_file ...]"
 #
 #  Env Vars:
 #
@@ -32,6 +32,9 @@
 #      0:  Successful completion
 #      1:  Fatal error occurred
 #
+#      (nomenjob.py exits 2 if the input file has not been updated;
+#       this script then exits 0)
+#
 #  Assumes:  Nothing
 #
 #      This script will perform following steps:
@@ -47,6 +50,9 @@
 #      8) Archive the input file.
 #      9) Touch the "lastrun" file to timestamp the last run of the load.
 #
+#      Steps 5-7 are run by bin/nomenjob.py in a single Python process;
+#      steps 8-9 are run by this script once it exits.
+#
 # History:
 #
 # lec	09/28/2015
@@ -67,18 +73,25 @@ export MAIL_LOADNAME
 rm -rf ${LOG_FILE} ${LOG_PROC} ${LOG_DIAG} ${LOG_CUR} ${LOG_VAL} ${LOG_ERROR}
 
 #
-# use user-provied value or use config/default value
-# Make sure the input file exists (regular file or symbolic link).
+# use user-provied value(s) or use config/default value
+# more than one input file may be given : they are loaded in one run
+# Make sure the input file(s) exist (regular file or symbolic link).
 #
-if [ $# -eq 2 ] 
+if [ $# -ge 2 ] 
 then
-    INPUT_FILE_DEFAULT=$2
-fi
-if [ ! -r ${INPUT_FILE_DEFAULT} ]
-then
-    echo "Missing input file: ${INPUT_FILE_DEFAULT}" | tee -a ${LOG_FILE}
-    exit 1
+    shift
+    INPUT_FILE_DEFAULT=$1
+    INPUT_FILES="$*"
+    export INPUT_FILES
 fi
+for INPUT_FILE in ${INPUT_FILES:-${INPUT_FILE_DEFAULT}}
+do
+    if [ ! -r ${INPUT_FILE} ]
+    then
+        echo "Missing input file: ${INPUT_FILE}" | tee -a ${LOG_FILE}
+        exit 1
+    fi
+done
 
 #
 #  Source the DLA library functions.
@@ -107,7 +120,7 @@ fi
 #
 # dlautils/preload minus jobstream & archive
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     startLog ${LOG_PROC} ${LOG_DIAG} ${LOG_CUR} ${LOG_VAL} | tee -a ${LOG}
     getConfigEnv >> ${LOG_PROC}
@@ -115,55 +128,32 @@ then
 fi
 
 #
-# There should be a "lastrun" file in the input directory that was created
-# the last time the load was run for this input file. If this file exists
-# and is more recent than the input file, the load does not need to be run.
-#
-if [ ${NOMENMODE} != "preview" ]
-then
-    LASTRUN_FILE=${INPUTDIR}/lastrun
-
-    if [ -f ${LASTRUN_FILE} ]
-    then
-        if test ${LASTRUN_FILE} -nt ${INPUT_FILE_DEFAULT}
-        then
-            echo "SKIPPED: ${NOMENMODE} : Input file has not been updated" | tee -a ${LOG_FILE_PROC}
-	    exit 0
-        fi
-    fi
-fi
-
-#
-# Convert the input file into a QC-ready version that can be used to run
-# the sanity/QC reports against.
+# Execute the nomen job : lastrun check, dos2unix, nomenload and mappingload
+# are run by a single Python process (see nomenjob.py)
 #
-dos2unix ${INPUT_FILE_DEFAULT} ${INPUT_FILE_DEFAULT} 2>/dev/null
+CONFIG_FILE=`cd \`dirname ${CONFIG_FILE}\` && pwd`/`basename ${CONFIG_FILE}`
+export CONFIG_FILE
+cd ${OUTPUTDIR}
+${PYTHON} ${NOMENLOAD}/bin/nomenjob.py
+STAT=$?
 
 #
-# Execute nomen load
+# input file has not been updated since the last run
 #
-echo "" | tee -a ${LOG_FILE}
-date | tee -a ${LOG_FILE}
-echo "Running nomenload : ${NOMENMODE}" | tee -a ${LOG_FILE}
-cd ${OUTPUTDIR}
-${PYTHON} ${NOMENLOAD}/bin/nomenload.py | tee -a ${LOG_DIAG}
-STAT=$?
-checkStatus ${STAT} "${NOMENLOAD} ${CONFIG_FILE} : ${NOMENMODE} :"
+if [ ${STAT} -eq 2 ]
+then
+    exit 0
+fi
 
 #
-# Execute mapping load if not "preview" and nomenload was successful
+# DLA checkStatus for each step run by nomenjob.py (nomenload, mappingload)
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ -f ${OUTPUTDIR}/nomenjob.status ]
 then
-	if [[ ${STAT} == 0 ]]
-	then
-		cd ${OUTPUTDIR}
-		${MAPPINGLOAD}/mappingload.sh ${CONFIG_FILE}
-		STAT=$?
-		checkStatus ${STAT} "${MAPPINGLOAD} ${CONFIG_FILE} : ${MAPPINGMODE} :"
-	else
-		echo "FATAL ERROR: nomenload exit status = ${STAT} : ${NOMENMODE}" | tee -a ${LOG_FILE}
-	fi
+    while read STEPSTAT STEPMESSAGE
+    do
+        checkStatus ${STEPSTAT} "${STEPMESSAGE}"
+    done < ${OUTPUTDIR}/nomenjob.status
 fi
 
 #
@@ -183,36 +173,30 @@ case `whoami` in
 esac
 
 #
-# Archive : publshed only
+# Archive : published only
 # dlautils/preload with archive
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     createArchive ${ARCHIVEDIR} ${LOGDIR} ${INPUTDIR} ${OUTPUTDIR} | tee -a ${LOG}
-fi 
+fi
 
 #
 # Touch the "lastrun" file to note when the load was run.
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
-    touch ${LASTRUN_FILE}
+    touch ${INPUTDIR}/lastrun
 fi
 
-#
-# cat the error file
-#
-cat ${LOG_ERROR}
-
-echo "" | tee -a ${LOG_FILE}
-date | tee -a ${LOG_FILE}
-
 #
 # run postload cleanup and email logs
 #
-if [ ${NOMENMODE} != "preview" ]
+if [ ${NOMENMODE} = "load" ]
 then
     JOBKEY=0;export JOBKEY
     shutDown
 fi
 
+
+exit ${STAT}
@@ -0,0 +1,109 @@
+'''
+#
+# Purpose:
+#
+#	Thin client of the Nomen QC daemon (nomenqcd.py); used by
+#	runNomenQC, runBatchRenameQC and runBatchDeleteQC.
+#
+#	Sends the input file to the daemon, converted to unix format in
+#	memory (the curator's input file is not changed; if the daemon is
+#	not running, the job converts it), and prints the report.
+#
+# Usage:
+#
+#	nomenqc.py job input_file
+#	    job : nomenload, batchrename, batchdelete
+#
+# Env Vars:
+#
+#	NOMENQC_SOCKET : the Unix socket of the daemon
+#
+# Exit Codes:
+#
+#	the exit status of the job
+#	1:  the input file could not be read
+#	3:  the daemon is not running (the QC script runs the job itself)
+#
+'''
+
+import sys
+import os
+import json
+import socket
+
+NODAEMON = 3
+
+socketFileName = os.environ.get('NOMENQC_SOCKET', '')
+
+def main():
+    '''
+    # requires:
+    #
+    # effects:
+    #	sends the request to the daemon and prints the report
+    #	writes the I/O errors to stderr
+    #
+    # returns:
+    #	the exit status of the job
+    #	1 if the input file could not be read
+    #	NODAEMON if the daemon is not running (or the request failed)
+    #
+    '''
+
+    job = sys.argv[1]
+    inputFileName = os.path.abspath(sys.argv[2])
+
+    if len(socketFileName) == 0 or not os.path.exists(socketFileName):
+        return NODAEMON
+
+    try:
+        with open(inputFileName, 'rb') as fp:
+            contents = fp.read()
+    except OSError as e:
+        sys.stderr.write('Could not read the input file %s : %s\n' % (inputFileName, e))
+        return 1
+
+    try:
+        data = contents.replace(b'\r\n', b'\n').decode('utf-8')
+    except UnicodeDecodeError:
+        return NODAEMON
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(socketFileName)
+    except OSError:
+        return NODAEMON
+
+    chunks = []
+
+    try:
+        sock.sendall(json.dumps({'job' : job, 'inputFile' : inputFileName, 'data' : data}).encode('utf-8'))
+        sock.shutdown(socket.SHUT_WR)
+
+        while 1:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except OSError as e:
+        sys.stderr.write('Nomen QC daemon request failed : %s\n' % (e))
+        return NODAEMON
+    finally:
+        sock.close()
+
+    try:
+        response = json.loads(b''.join(chunks).decode('utf-8'))
+    except ValueError:
+        return NODAEMON
+
+    sys.stdout.write(response['output'])
+
+    return response['status']
+
+#
+# Main
+#
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+'''
+#
+# Purpose:
+#
+#	Nomen QC daemon : serves the curator sanity checks of
+#	runNomenQC, runBatchRenameQC and runBatchDeleteQC over a Unix socket.
+#
+#	The daemon runs nomenload.py/batchrename.py/batchdelete.py in
+#	"validate" mode in this process; the database connection, the
+#	nomenload dictionaries, the event reasons and the lookup caches
+#	(verifycache.py) stay warm between requests.  Requests are served
+#	one at a time.
+#
+#	Request (JSON) : sent by the client (nomenqc.py)
+#	    job : nomenload, batchrename, batchdelete
+#	    inputFile : the name of the input file
+#	    data : the contents of the input file
+#
+#	Response (JSON) :
+#	    status : the exit status of the job
+#	    output : the output of the job and the error file
+#		     (the same report as the QC scripts)
+#
+#	The client sends the contents of the input file, so the daemon
+#	never reads the curator's files.
+#
+# Usage:
+#
+#	nomenqcd.sh nomensanitycheck.config
+#
+# Env Vars:
+#
+#	See the configuration file nomensanitycheck.config
+#	NOMENQC_SOCKET : the Unix socket (mode 660 : the daemon user and NOMENQC_GROUP)
+#	NOMENQC_GROUP : the group of the curators allowed to run QC requests
+#	NOMENQC_REFRESH : seconds between reloads of the dictionaries,
+#		event reasons and lookup caches (default 3600)
+#
+'''
+
+import sys
+import os
+import io
+import json
+import time
+import socket
+import socketserver
+import signal
+import shutil
+import tempfile
+import contextlib
+import db
+import mgi_utils
+
+#
+# from configuration file
+#
+mode = os.environ['NOMENMODE']
+socketFileName = os.environ['NOMENQC_SOCKET']
+refreshSeconds = int(os.environ.get('NOMENQC_REFRESH', '3600'))
+socketGroup = os.environ.get('NOMENQC_GROUP', '')
+tempDir = os.environ.get('OUTPUTDIR', tempfile.gettempdir())
+
+# the daemon never makes any changes to the database
+if mode not in ['validate', 'preview']:
+    sys.stderr.write('Invalid Processing Mode for nomenqcd:  %s\n' % (mode))
+    sys.exit(1)
+
+import nomenload
+import batchengine
+import batchrename
+import batchdelete
+import verifycache
+import runhistory
+import nomensql
+import errorreport
+
+nomenload.warm = 1
+batchengine.warm = 1
+
+loadTime = time.time()	# time the dictionaries were (re)loaded
+
+def runNomenload(inputFileName):
+    nomenload.inputFileName = inputFileName
+    nomenload.main()
+
+def runBatchRename(inputFileName):
+    batchrename.inputFileName = inputFileName
+    batchengine.run(batchrename)
+
+def runBatchDelete(inputFileName):
+    batchdelete.inputFileName = inputFileName
+    batchengine.run(batchdelete)
+
+# {job : (run function, error file name)}
+jobs = {
+    'nomenload' : (runNomenload, nomenload.errorFileName),
+    'batchrename' : (runBatchRename, batchrename.errorFileName),
+    'batchdelete' : (runBatchDelete, batchdelete.errorFileName),
+    }
+
+def log(message):
+    '''
+    # requires: message (string)
+    #
+    # effects:
+    #	writes the message to the daemon log (stdout)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    sys.__stdout__.write('%s %s\n' % (mgi_utils.date(), message))
+    sys.__stdout__.flush()
+
+def refresh():
+    '''
+    # requires:
+    #
+    # effects:
+    #	every NOMENQC_REFRESH seconds, forces the next run to reload the
+    #	nomenload dictionaries and the event reasons, and clears the
+    #	lookup caches
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global loadTime
+
+    if time.time() - loadTime < refreshSeconds:
+        return
+
+    nomenload.dictionariesLoaded = 0
+    batchengine.eventReasonLookup.clear()
+    verifycache.caches.clear()
+    loadTime = time.time()
+
+def runJob(job, inputFileName, data):
+    '''
+    # requires:
+    #	job - nomenload, batchrename, batchdelete
+    #	inputFileName - the name of the curator's input file
+    #	data - the contents of the input file
+    #
+    # effects:
+    #	writes the input file to a temporary file and runs the job
+    #	using the temporary file
+    #	if the job fails with an exception, its error file is written
+    #	and closed, and the database connection is closed (and reopened
+    #	by the next run)
+    #
+    # returns:
+    #	status - the exit status of the job
+    #	output - the output of the job and the error file
+    #
+    '''
+
+    runFunction, errorFileName = jobs[job]
+
+    refresh()
+    verifycache.stats.clear()
+
+    with tempfile.NamedTemporaryFile('w', dir = tempDir, prefix = job + '.', suffix = '.txt',
+                                     delete = False, encoding = 'utf-8', newline = '') as fp:
+        fp.write(data)
+        tempFileName = fp.name
+
+    output = io.StringIO()
+    output.write('\n%s\nRunning %s : %s : %s\n' % (mgi_utils.date(), job, mode, inputFileName))
+
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            runFunction(tempFileName)
+            status = 0
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            status = 1
+            output.write('\n%s\n' % (e))
+            runhistory.finish(status)
+            errorreport.closeAll()
+            db.useOneConnection()
+            nomensql.reset()
+            nomenload.dictionariesLoaded = 0
+            nomenload.connected = 0
+            batchengine.connected = 0
+
+    os.remove(tempFileName)
+
+    try:
+        with open(errorFileName, 'r') as fp:
+            output.write(fp.read())
+    except:
+        pass
+
+    output.write('\n%s\n' % (mgi_utils.date()))
+
+    return status, output.getvalue()
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    '''
+    # one validation request (see Purpose)
+    '''
+
+    def handle(self):
+        startTime = time.time()
+
+        try:
+            request = json.loads(self.rfile.read().decode('utf-8'))
+            job = request['job']
+
+            if job in jobs:
+                status, output = runJob(job, request['inputFile'], request['data'])
+            else:
+                status, output = 1, 'Invalid job: %s\n' % (job)
+        except Exception as e:
+            job = ''
+            status, output = 1, 'Invalid request: %s\n' % (e)
+
+        self.wfile.write(json.dumps({'status' : status, 'output' : output}).encode('utf-8'))
+
+        log('%s : status %s : %.3f seconds' % (job, status, time.time() - startTime))
+
+def isRunning():
+    '''
+    # returns:
+    #	1 if a daemon is listening on the socket, else 0
+    #
+    '''
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(socketFileName)
+        return 1
+    except OSError:
+        return 0
+    finally:
+        sock.close()
+
+def main():
+    '''
+    # requires:
+    #
+    # effects:
+    #	serves requests on the socket until terminated
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    if os.path.exists(socketFileName):
+        if isRunning():
+            sys.stderr.write('nomenqcd is already running: %s\n' % (socketFileName))
+            sys.exit(1)
+        os.remove(socketFileName)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    # the socket is created without any access for others (umask), then
+    # given to the curator group (NOMENQC_GROUP) : owner and group only
+    saveUmask = os.umask(0o177)
+    try:
+        server = socketserver.UnixStreamServer(socketFileName, RequestHandler)
+    finally:
+        os.umask(saveUmask)
+
+    if len(socketGroup) > 0:
+        try:
+            shutil.chown(socketFileName, group = socketGroup)
+            os.chmod(socketFileName, 0o660)
+        except (LookupError, OSError) as e:
+            log('nomenqcd: could not set the group of %s to %s : %s' % (socketFileName, socketGroup, e))
+    log('nomenqcd started: %s' % (socketFileName))
+
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        os.remove(socketFileName)
+        db.useOneConnection()
+        log('nomenqcd stopped')
+
+#
+# Main
+#
+
+if __name__ == '__main__':
+    main()
+
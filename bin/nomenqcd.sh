@@ -0,0 +1,49 @@
+#!/bin/sh
+#
+#  nomenqcd.sh
+###########################################################################
+#
+#  Purpose:
+# 	This script starts the Nomen QC daemon (see nomenqcd.py)
+#
+  Usage="nomenqcd.sh [config]"
+#
+#  Env Vars:
+#
+#      See the configuration file nomensanitycheck.config
+#
+#  Inputs:
+#
+#      - configuration file - nomensanitycheck.config (default)
+#
+#  Outputs:
+#
+#      - the daemon log : ${LOGDIR}/nomenqcd.log
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  Fatal error occurred
+#
+#  Assumes:  Nothing
+#
+
+cd `dirname $0`
+
+#
+# Verify and source the configuration file
+#
+CONFIG_FILE=${1:-../nomensanitycheck.config}
+
+if [ ! -r ${CONFIG_FILE} ]
+then
+    echo "Cannot read configuration file: ${CONFIG_FILE}"
+    exit 1
+fi
+
+. ${CONFIG_FILE}
+
+cd ${OUTPUTDIR}
+nohup ${PYTHON} ${NOMENLOAD}/bin/nomenqcd.py >> ${LOGDIR}/nomenqcd.log 2>&1 &
+
+exit 0
@@ -0,0 +1,284 @@
+'''
+#
+# Purpose:
+#
+#	Reference-data snapshot for offline validation (nomenload "validate" mode)
+#
+#	export : writes the reference data used by the nomenload sanity checks
+#	to a compact, versioned snapshot file (gzip'd JSON).  Only the columns
+#	the checks use are exported, keyed as the checks look them up
+#	(the lookups are used as read; no index is built on load):
+#
+#	    marker statuses, marker types, mouse chromosomes, logical DBs,
+#	    MCV terms, users, references (J:)
+#	    symbolStatus {symbol : [status key, ...]} official/withdrawn/reserved mouse markers
+#	    synonyms {synonym : [symbol, ...]} mouse marker synonyms
+#	    accessions {accID : [symbol, ...]} mouse marker accession ids
+#		without a ":" (an input accession id never has one : the
+#		input is LogicalDB:AccID), so no MGI ids
+#
+#	verifyMarkerType(), verifyReference(), verifyUser() : the loadlib
+#	verify functions on the snapshot, with the loadlib error messages
+#	(a snapshot run and a database run write the same error file)
+#
+#	load : reads a snapshot file into indexed in-memory lookups
+#	(see Snapshot), so the sanity checks can run without a database
+#	connection (see nomenload.py).
+#
+# Usage:
+#
+#	nomensnapshot.py export snapshot_file
+#	nomensnapshot.py info snapshot_file
+#
+# Env Vars:
+#
+#	See the configuration file nomensanitycheck.config
+#	NOMEN_SNAPSHOT : the snapshot file
+#	NOMEN_SNAPSHOT_MAXAGE : hours after which a snapshot is no longer used (default 24)
+#
+'''
+
+import sys
+import os
+import gzip
+import json
+import time
+import db
+import mgi_utils
+
+FORMAT = 'nomensnapshot'
+VERSION = 2
+
+maxAge = float(os.environ.get('NOMEN_SNAPSHOT_MAXAGE', '24'))
+
+cache = {}		# {(snapshot file, mtime) : Snapshot}
+
+class Snapshot:
+    '''
+    # the reference data of a snapshot file
+    #
+    # dictionaries (as nomenload.loadDictionaries()):
+    #	statusDict, markerTypeDict, chromosomeDict, logicalDBDict, mcvDict
+    #	userDict {login : key}, referenceDict {J: : key}
+    #
+    # lookups:
+    #	symbolStatus {symbol : [marker status key, ...]}
+    #	synonymLookup {synonym : [symbol, ...]}
+    #	accessionLookup {accID : [symbol, ...]}
+    '''
+
+    def __init__(self, data):
+        self.createDate = data['createDate']
+        self.server = data['server']
+        self.database = data['database']
+
+        self.statusDict = data['markerStatus']
+        self.markerTypeDict = data['markerTypes']
+        self.chromosomeDict = dict([(c, 1) for c in data['chromosomes']])
+        self.logicalDBDict = data['logicalDBs']
+        self.mcvDict = data['mcvTerms']
+        self.userDict = data['users']
+        self.referenceDict = data['references']
+        self.symbolStatus = data['symbolStatus']
+        self.synonymLookup = data['synonyms']
+        self.accessionLookup = data['accessions']
+
+#
+# the error messages of loadlib.verifyMarkerType, verifyReference, verifyUser
+#
+markerTypeMessage = 'Invalid Marker Type (%d) %s\n'
+referenceMessage = 'Invalid Reference (%d): %s\n'
+userMessage = 'Invalid User (%d) %s\n'
+
+def verify(lookupDict, value, lineNum, errorFile, message):
+    '''
+    # requires:
+    #	lookupDict - a snapshot dictionary {value : key}
+    #	value - the value from the input file
+    #	lineNum - the line number of the record from the input file
+    #	errorFile - the error file descriptor (or None)
+    #	message - the loadlib error message (see above)
+    #
+    # effects:
+    #	writes the message to the error file if the value is not in the snapshot
+    #
+    # returns:
+    #	0 if the value is invalid
+    #	the key if the value is valid
+    #
+    '''
+
+    if value in lookupDict:
+        return lookupDict[value]
+
+    if errorFile is not None:
+        errorFile.write(message % (lineNum, value))
+
+    return 0
+
+def verifyMarkerType(snapshot, markerType, lineNum, errorFile):
+    # see loadlib.verifyMarkerType
+    return verify(snapshot.markerTypeDict, markerType, lineNum, errorFile, markerTypeMessage)
+
+def verifyReference(snapshot, jnum, lineNum, errorFile):
+    # see loadlib.verifyReference
+    return verify(snapshot.referenceDict, jnum, lineNum, errorFile, referenceMessage)
+
+def verifyUser(snapshot, login, lineNum, errorFile):
+    # see loadlib.verifyUser
+    return verify(snapshot.userDict, login, lineNum, errorFile, userMessage)
+
+def export(fileName):
+    '''
+    # requires:
+    #	fileName - the snapshot file
+    #
+    # effects:
+    #	queries the reference data and writes the snapshot file
+    #	(written to a temporary file, then renamed)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    data = {
+        'format' : FORMAT,
+        'version' : VERSION,
+        'createDate' : mgi_utils.date(),
+        'createTime' : time.time(),
+        'server' : db.get_sqlServer(),
+        'database' : db.get_sqlDatabase(),
+    }
+
+    data['markerStatus'] = dict([(r['status'], r['_Marker_Status_key'])
+        for r in db.sql('select _Marker_Status_key, status from MRK_Status', 'auto')])
+
+    data['markerTypes'] = dict([(r['name'], r['_Marker_Type_key'])
+        for r in db.sql('select _Marker_Type_key, name from MRK_Types', 'auto')])
+
+    data['chromosomes'] = [r['chromosome']
+        for r in db.sql('select chromosome from MRK_Chromosome where _Organism_key = 1', 'auto')]
+
+    data['logicalDBs'] = dict([(r['name'], r['_LogicalDB_key'])
+        for r in db.sql('select _LogicalDB_key, name from ACC_LogicalDB', 'auto')])
+
+    data['mcvTerms'] = dict([(r['accid'], r['_term_key']) for r in db.sql('''
+        select a.accid , t._term_key
+        from ACC_Accession a, VOC_Term t
+        where a._logicaldb_key = 146
+        and a._mgitype_key = 13
+        and a.preferred = 1
+        and a._object_key = t._term_key
+        ''', 'auto')])
+
+    data['users'] = dict([(r['login'], r['_User_key'])
+        for r in db.sql('select _User_key, login from MGI_User', 'auto')])
+
+    # the J: ids of the references (loadlib.verifyReference : BIB_Acc_View)
+    data['references'] = dict([(r['accID'], r['_Object_key'])
+        for r in db.sql('''select accID, _Object_key from BIB_Acc_View where prefixPart = 'J:' ''', 'auto')])
+
+    data['symbolStatus'] = {}
+    for r in db.sql('''
+        select distinct symbol, _Marker_Status_key
+        from MRK_Marker
+        where _Organism_key = 1
+                and _Marker_Status_key in (1,2,3)
+        ''', 'auto'):
+        data['symbolStatus'].setdefault(r['symbol'], []).append(r['_Marker_Status_key'])
+
+    data['synonyms'] = {}
+    for r in db.sql('''
+        select distinct s.synonym, m.symbol
+        from MGI_Synonym s, MRK_Marker m
+        where s._MGIType_key = 2
+                and s._Object_key = m._Marker_key
+                and m._Organism_key = 1
+        ''', 'auto'):
+        data['synonyms'].setdefault(r['synonym'], []).append(r['symbol'])
+
+    data['accessions'] = {}
+    for r in db.sql('''
+        select a.accID, m.symbol
+        from ACC_Accession a, MRK_Marker m
+        where a._MGIType_key = 2
+                and a._Object_key = m._Marker_key
+                and m._Organism_key = 1
+                and a.accID not like '%:%'
+        ''', 'auto'):
+        data['accessions'].setdefault(r['accID'], []).append(r['symbol'])
+
+    with gzip.open(fileName + '.tmp', 'wt', encoding = 'utf-8') as fp:
+        json.dump(data, fp, separators = (',', ':'))
+    os.rename(fileName + '.tmp', fileName)
+
+def read(fileName):
+    '''
+    # requires:
+    #	fileName - the snapshot file
+    #
+    # returns:
+    #	the snapshot data (dictionary)
+    #	raises ValueError if the file is not a snapshot of this version
+    #
+    '''
+
+    with gzip.open(fileName, 'rt', encoding = 'utf-8') as fp:
+        data = json.load(fp)
+
+    if data.get('format') != FORMAT or data.get('version') != VERSION:
+        raise ValueError('%s is not a %s version %d file' % (fileName, FORMAT, VERSION))
+
+    return data
+
+def load(fileName):
+    '''
+    # requires:
+    #	fileName - the snapshot file
+    #
+    # effects:
+    #	reads and indexes the snapshot file; the Snapshot is cached
+    #	until the file changes (see nomenqcd.py)
+    #
+    # returns:
+    #	the Snapshot
+    #	None if the file does not exist or is older than NOMEN_SNAPSHOT_MAXAGE hours
+    #
+    '''
+
+    if not os.path.exists(fileName):
+        return None
+
+    mtime = os.path.getmtime(fileName)
+
+    if time.time() - mtime > maxAge * 3600:
+        return None
+
+    if (fileName, mtime) not in cache:
+        cache.clear()
+        cache[(fileName, mtime)] = Snapshot(read(fileName))
+
+    return cache[(fileName, mtime)]
+
+#
+# Main
+#
+
+if __name__ == '__main__':
+
+    if len(sys.argv) != 3 or sys.argv[1] not in ['export', 'info']:
+        sys.stderr.write('Usage: nomensnapshot.py export|info snapshot_file\n')
+        sys.exit(1)
+
+    if sys.argv[1] == 'export':
+        db.useOneConnection(1)
+        export(sys.argv[2])
+        db.useOneConnection()
+
+    data = read(sys.argv[2])
+    print('%s version %d : %s : %s.%s' % (FORMAT, VERSION, data['createDate'], data['server'], data['database']))
+    for name in ['markerStatus', 'markerTypes', 'chromosomes', 'logicalDBs', 'mcvTerms',
+                 'users', 'references', 'symbolStatus', 'synonyms', 'accessions']:
+        print('%s\t%d' % (name, len(data[name])))
+
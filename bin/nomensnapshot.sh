@@ -0,0 +1,50 @@
+#!/bin/sh
+#
+#  nomensnapshot.sh
+###########################################################################
+#
+#  Purpose:
+# 	This script exports the reference-data snapshot used by the
+#	nomenload "validate" mode (see nomensnapshot.py)
+#
+  Usage="nomensnapshot.sh [config]"
+#
+#  Env Vars:
+#
+#      See the configuration file nomensanitycheck.config
+#
+#  Inputs:
+#
+#      - configuration file - nomensanitycheck.config (default)
+#
+#  Outputs:
+#
+#      - the snapshot file : ${NOMEN_SNAPSHOT}
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  Fatal error occurred
+#
+#  Assumes:  Nothing
+#
+
+cd `dirname $0`
+
+#
+# Verify and source the configuration file
+#
+CONFIG_FILE=${1:-../nomensanitycheck.config}
+
+if [ ! -r ${CONFIG_FILE} ]
+then
+    echo "Cannot read configuration file: ${CONFIG_FILE}"
+    exit 1
+fi
+
+. ${CONFIG_FILE}
+
+${PYTHON} ${NOMENLOAD}/bin/nomensnapshot.py export ${NOMEN_SNAPSHOT}
+STAT=$?
+
+exit ${STAT}
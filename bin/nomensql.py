@@ -0,0 +1,286 @@
+'''
+#
+# Purpose:
+#
+#	Named, parameterized SQL statements for the per-row and per-chunk
+#	queries of the nomen jobs (nomenload.py, batchengine.py,
+#	markerresolver.py, updateMkrType.py)
+#
+#	Each statement (see STATEMENTS) is prepared once per database
+#	connection (PREPARE) and run with EXECUTE and its values : the
+#	server parses and plans the statement once, not once per row.
+#
+#	The values are SQL literals made by quote() (never by string
+#	interpolation of the raw value) : symbols, names and accession ids
+#	with quotes or backslashes are safe.
+#
+#	The statements live as long as the connection : reset() must be
+#	called when the connection is closed (db.useOneConnection()).
+#
+#	bulkCall() : one command that calls a stored procedure for a set of
+#	rows (the rows are passed as arrays) and returns the outcome of
+#	each row; a row that fails is rolled back on its own.
+#
+#	Usage:
+#	    results = nomensql.execute('markerStatus', symbol)
+#	    cmd = nomensql.command('simpleWithdrawal', userKey, markerKey, ...)
+#	    ...
+#	    nomensql.reset()
+#
+#	    results = db.sql(nomensql.bulkCall('MRK_deleteWithdrawal', ['int', ...], rows), 'auto')
+#
+'''
+
+import db
+
+#
+# {statement name : (parameter types, statement)}
+#
+STATEMENTS = {
+
+    # the status keys of the mouse markers with the symbol (official, withdrawn, reserved)
+    'markerStatus' : ('(text)', '''
+        select _Marker_Status_key from MRK_Marker
+        where _Organism_key = 1
+                and _Marker_Status_key in (1,2,3)
+                and symbol = $1
+        '''),
+
+    'chromosome' : ('(text)', '''
+        select chromosome from MRK_Chromosome
+        where _Organism_key = 1
+                and chromosome = $1
+        '''),
+
+    # the mouse markers with the accession id
+    'accessionMarkers' : ('(text)', '''
+        select m.symbol
+        from MRK_Marker m, ACC_Accession a
+        where m._Organism_key = 1
+                and m._Marker_key = a._Object_key
+                and a.accID = $1
+                and a._MGIType_key = 2
+        '''),
+
+    # the mouse markers (official, reserved) and the mouse marker synonyms
+    # spelled as one of the synonyms
+    'synonymMarkers' : ('(text[])', '''
+        select m.symbol as synonym, m.symbol, 'Symbol' as source
+        from MRK_Marker m
+        where m._Organism_key = 1
+                and m._Marker_Status_key in (1,3)
+                and m.symbol = any($1)
+        union
+        select s.synonym, m.symbol, 'Synonym' as source
+        from MGI_Synonym s, MRK_Marker m
+        where s._MGIType_key = 2
+                and s._Object_key = m._Marker_key
+                and m._Organism_key = 1
+                and s.synonym = any($1)
+        '''),
+
+    # the mouse markers of the MGI IDs; preferred IDs only if $2 = 1
+    'mgiMarkers' : ('(text[], int)', '''
+        select a.accID, a._Object_key
+        from ACC_Accession a, MRK_Marker m
+        where a._MGIType_key = 2
+                and a._LogicalDB_key = 1
+                and a.prefixPart = 'MGI:'
+                and (a.preferred = 1 or $2 = 0)
+                and a._Object_key = m._Marker_key
+                and m._Organism_key = 1
+                and a.accID = any($1)
+        '''),
+
+    # symbol, status and number of alleles of the markers
+    'markerInfo' : ('(int[])', '''
+        select m._Marker_key, m.symbol, m._Marker_Status_key,
+            (select count(*) from ALL_Allele a where a._Marker_key = m._Marker_key) as alleleCount
+        from MRK_Marker m
+        where m._Marker_key = any($1)
+        '''),
+
+    # user, marker, reference, event reason, new symbol, new name, add as synonym
+    'simpleWithdrawal' : ('(int, int, int, int, text, text, int)', '''
+        select * from MRK_simpleWithdrawal($1, $2, $3, $4, $5, $6, $7)
+        '''),
+
+    # user, marker, reference, event reason
+    'deleteWithdrawal' : ('(int, int, int, int)', '''
+        select * from MRK_deleteWithdrawal($1, $2, $3, $4)
+        '''),
+
+    # marker type, modification date, modified by, marker
+    'updateMarkerType' : ('(int, text, int, int)', '''
+        update MRK_Marker
+        set _Marker_Type_key = $1,
+        modification_date = $2::timestamp,
+        _ModifiedBy_key = $3
+        where _Marker_key = $4
+        '''),
+    }
+
+prepared = set()	# the statements prepared on the current connection
+
+def quote(value):
+    '''
+    # requires:
+    #	value - None, integer, float, string, or a list/tuple of these
+    #
+    # returns:
+    #	the SQL literal of the value : strings are quoted (quotes
+    #	doubled; backslashes escaped in an E'' string), lists are arrays
+    #	raises TypeError if the value is a bool (not a valid integer
+    #	literal; the nomen tables use 0/1 integers)
+    #
+    '''
+
+    if value is None:
+        return 'null'
+
+    if isinstance(value, bool):
+        raise TypeError('Invalid SQL value: %s' % (value))
+
+    # an empty array literal takes the type of its parameter (or cast)
+    if isinstance(value, (list, tuple)) and len(value) == 0:
+        return "'{}'"
+
+    if isinstance(value, (list, tuple)):
+        return 'array[%s]' % (','.join([quote(v) for v in value]))
+
+    if isinstance(value, (int, float)):
+        return str(value)
+
+    value = str(value)
+
+    if '\\' in value:
+        return "E'%s'" % (value.replace('\\', '\\\\').replace("'", "''"))
+
+    return "'%s'" % (value.replace("'", "''"))
+
+def prepare(name):
+    '''
+    # requires:
+    #	name - the statement name (see STATEMENTS)
+    #
+    # effects:
+    #	prepares the statement on the current connection, once
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    if name in prepared:
+        return
+
+    types, statement = STATEMENTS[name]
+    db.sql('prepare %s %s as %s' % (name, types, statement.strip()), None)
+    prepared.add(name)
+
+def command(name, *values):
+    '''
+    # requires:
+    #	name - the statement name (see STATEMENTS)
+    #	values - the parameter values
+    #
+    # effects:
+    #	prepares the statement, if needed
+    #
+    # returns:
+    #	the EXECUTE command of the statement and its values
+    #
+    '''
+
+    prepare(name)
+
+    return 'execute %s (%s);\n' % (name, ', '.join([quote(v) for v in values]))
+
+def execute(name, *values):
+    '''
+    # requires:
+    #	name - the statement name (see STATEMENTS)
+    #	values - the parameter values
+    #
+    # effects:
+    #	runs the prepared statement
+    #
+    # returns:
+    #	the result rows
+    #
+    '''
+
+    return db.sql(command(name, *values), 'auto')
+
+#
+# bulkCall() : the procedure is called for each row in a sub-transaction (the
+# exception block); the outcome of each row is kept in a temporary table
+#
+bulkSQL = '''
+create temporary table if not exists nomen_bulk_result (lineNum int, status text, message text);
+truncate table nomen_bulk_result;
+
+do $bulk$
+declare
+    r record;
+begin
+    for r in select * from unnest(%(arrays)s) as t(lineNum, %(columns)s)
+    loop
+        begin
+            perform %(function)s(%(arguments)s);
+            insert into nomen_bulk_result values (r.lineNum, 'ok', null);
+        exception when others then
+            insert into nomen_bulk_result values (r.lineNum, 'failed', sqlerrm);
+        end;
+    end loop;
+end
+$bulk$;
+
+select lineNum, status, message from nomen_bulk_result order by lineNum;
+'''
+
+def bulkCall(function, types, rows):
+    '''
+    # requires:
+    #	function - the stored procedure (MRK_simpleWithdrawal, ...)
+    #	types - the SQL types of the procedure arguments (int, text, ...)
+    #	rows - [(line number, argument, ...), ...]
+    #
+    # returns:
+    #	the command that calls the procedure for each row, in order :
+    #	its results are (lineNum, status, message) for each row,
+    #	status is "ok" or "failed" (message : the database error)
+    #	raises ValueError if a value contains the body delimiter ($bulk$)
+    #
+    '''
+
+    columns = ['a%d' % (i + 1) for i in range(len(types))]
+    arrays = []
+
+    for i, sqlType in enumerate(['int'] + list(types)):
+        values = [row[i] for row in rows]
+        for value in values:
+            if '$bulk$' in str(value):
+                raise ValueError('Invalid value: %s' % (value))
+        arrays.append('%s::%s[]' % (quote(values), sqlType))
+
+    return bulkSQL % {
+        'arrays' : ', '.join(arrays),
+        'columns' : ', '.join(columns),
+        'function' : function,
+        'arguments' : ', '.join(['r.%s' % (c) for c in columns]),
+        }
+
+def reset():
+    '''
+    # requires:
+    #
+    # effects:
+    #	forgets the prepared statements (the connection was closed)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    prepared.clear()
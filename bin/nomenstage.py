@@ -0,0 +1,542 @@
+'''
+#
+# Purpose:
+#
+#	Staged nomenload (NOMEN_LOAD_METHOD=stage; see nomenload.py)
+#
+#	1. stage : the input rows are written to a binary COPY file
+#	   (see pgcopy.py) and copied into the unlogged staging table
+#	   nomen_stage (psql, one copy)
+#
+#	2. validate : the nomenload sanity checks (see nomenload.sanityCheck())
+#	   are run as set-based SQL against the staging tables; the
+#	   messages are stored in nomen_stage_error (one round trip)
+#
+#	3. publish : the primary keys are assigned with window functions
+#	   (in input order, as the bcp stage does) and the accepted rows are
+#	   inserted into MRK_Marker, ACC_Accession, ... with INSERT ... SELECT,
+#	   followed by ACC_setMax and the auto-sequence updates (not run if
+#	   the keys were reserved; see keylock.py), in one transaction
+#	   (one round trip) : a failed publish loads nothing.
+#
+#	Staging tables (unlogged; created if they do not exist) :
+#
+#	    nomen_stage_run : the runs (runID, startDate)
+#	    nomen_stage : the input rows and their resolved keys
+#	    nomen_stage_acc : the accession ids of each row
+#	    nomen_stage_syn : the synonyms of each row
+#	    nomen_stage_error : the sanity check messages
+#
+#	The staging tables are shared by all runs (the stage copy is done
+#	by psql, in its own session) : every row has the runID of its run
+#	and every statement of a run only reads and changes the rows of the
+#	run, so runs (load, preview) may stage at the same time.  The rows of
+#	a run are deleted when it ends (see cleanup()); the rows of a run
+#	that failed are deleted by the first run one day later (see create()).
+#
+'''
+
+import os
+import uuid
+import db
+import pgcopy
+import nomensql
+
+STAGE_TABLE = 'nomen_stage'
+
+# the columns of the stage file (see pgcopy.COLUMNS) : the input columns and the runID
+stageColumns = ['lineNum', 'markerType', 'symbol', 'name', 'chromosome', 'markerStatus', 'jnum',
+                'synonyms', 'otherAccIDs', 'mcvTerm', 'notes', 'createdBy', 'runID']
+
+runID = ''		# the runID of this run (see create())
+
+createSQL = '''
+create unlogged table if not exists nomen_stage_run (
+        runID text primary key,
+        startDate timestamp not null default now()
+);
+create unlogged table if not exists nomen_stage (
+        runID text not null,
+        lineNum int not null,
+        markerType text,
+        symbol text,
+        name text,
+        chromosome text,
+        markerStatus text,
+        jnum text,
+        synonyms text,
+        otherAccIDs text,
+        mcvTerm text,
+        notes text,
+        createdBy text,
+        _Marker_Type_key int,
+        _Marker_Status_key int,
+        _Refs_key int,
+        _User_key int,
+        _Term_key int,
+        accCount int not null default 0,
+        synCount int not null default 0,
+        rejected boolean not null default false
+);
+create unlogged table if not exists nomen_stage_acc (
+        runID text not null,
+        lineNum int not null,
+        seq int not null,
+        otherAcc text,
+        logicalDB text,
+        accID text,
+        prefixPart text,
+        numericPart int,
+        _LogicalDB_key int
+);
+create unlogged table if not exists nomen_stage_syn (
+        runID text not null,
+        lineNum int not null,
+        seq int not null,
+        synonym text
+);
+create unlogged table if not exists nomen_stage_error (
+        runID text not null,
+        lineNum int not null,
+        checkNum int not null,
+        seq int not null default 0,
+        message text,
+        value text,
+        reject boolean not null
+);
+alter table nomen_stage_error add column if not exists seq int not null default 0;
+create index if not exists nomen_stage_idx on nomen_stage (runID, lineNum);
+create index if not exists nomen_stage_acc_idx on nomen_stage_acc (runID, lineNum);
+create index if not exists nomen_stage_syn_idx on nomen_stage_syn (runID, lineNum);
+create index if not exists nomen_stage_error_idx on nomen_stage_error (runID, lineNum);
+'''
+
+# deletes the rows of the runs (a list of runIDs, or a query)
+deleteSQL = '''
+delete from nomen_stage where runID in (%(runs)s);
+delete from nomen_stage_acc where runID in (%(runs)s);
+delete from nomen_stage_syn where runID in (%(runs)s);
+delete from nomen_stage_error where runID in (%(runs)s);
+delete from nomen_stage_run where runID in (%(runs)s);
+'''
+
+# the runs that started more than a day ago (failed runs)
+staleRuns = "select runID from nomen_stage_run where startDate < now() - interval '1 day'"
+
+validateSQL = '''
+update nomen_stage s set _Marker_Type_key = t._Marker_Type_key
+from MRK_Types t where s.runID = %(runID)s and t.name = s.markerType;
+
+update nomen_stage s set _Marker_Status_key = t._Marker_Status_key
+from MRK_Status t where s.runID = %(runID)s and t.status = s.markerStatus;
+
+-- loadlib.verifyReference
+update nomen_stage s set _Refs_key = a._Object_key
+from BIB_Acc_View a where s.runID = %(runID)s and a.accID = s.jnum and a.prefixPart = 'J:';
+
+update nomen_stage s set _User_key = u._User_key
+from MGI_User u where s.runID = %(runID)s and u.login = s.createdBy;
+
+update nomen_stage s set _Term_key = t._Term_key
+from ACC_Accession a, VOC_Term t
+where s.runID = %(runID)s
+        and a.accID = s.mcvTerm
+        and a._LogicalDB_key = 146
+        and a._MGIType_key = 13
+        and a.preferred = 1
+        and a._Object_key = t._Term_key;
+
+insert into nomen_stage_syn
+select s.runID, s.lineNum, o.seq, o.synonym
+from nomen_stage s, unnest(string_to_array(s.synonyms, '|')) with ordinality as o(synonym, seq)
+where s.runID = %(runID)s and o.synonym != '';
+
+insert into nomen_stage_acc (runID, lineNum, seq, otherAcc, logicalDB, accID)
+select s.runID, s.lineNum, o.seq, o.otherAcc,
+        case when array_length(string_to_array(o.otherAcc, ':'), 1) = 2 then split_part(o.otherAcc, ':', 1) end,
+        case when array_length(string_to_array(o.otherAcc, ':'), 1) = 2 then split_part(o.otherAcc, ':', 2) end
+from nomen_stage s, unnest(string_to_array(s.otherAccIDs, '|')) with ordinality as o(otherAcc, seq)
+where s.runID = %(runID)s and o.otherAcc != '';
+
+update nomen_stage_acc a set _LogicalDB_key = l._LogicalDB_key
+from ACC_LogicalDB l where a.runID = %(runID)s and l.name = a.logicalDB;
+
+-- an accession id is loaded once per row, as sanityCheck() does (otherAccDict) :
+-- in the position of its first instance, with the logical DB of its last
+update nomen_stage_acc a set _LogicalDB_key = d._LogicalDB_key
+from (select lineNum, accID, min(seq) as seq, (array_agg(_LogicalDB_key order by seq desc))[1] as _LogicalDB_key
+        from nomen_stage_acc
+        where runID = %(runID)s and _LogicalDB_key is not null
+        group by lineNum, accID
+        having count(*) > 1) d
+where a.runID = %(runID)s and a.lineNum = d.lineNum and a.accID = d.accID and a.seq = d.seq;
+
+delete from nomen_stage_acc a
+using nomen_stage_acc b
+where a.runID = %(runID)s and b.runID = a.runID
+        and a.lineNum = b.lineNum and a.accID = b.accID and a.seq > b.seq
+        and a._LogicalDB_key is not null and b._LogicalDB_key is not null;
+
+update nomen_stage_acc
+set prefixPart = substring(accID from '^(.*?)[0-9]*$'),
+        numericPart = nullif(substring(accID from '([0-9]*)$'), '')::int
+where runID = %(runID)s and accID is not null;
+
+--
+-- the messages are those of sanityCheck() (and loadlib), in the same order :
+-- by check; the Logical DB checks (10, 11) by accession id and the
+-- synonym checks (12-15) by synonym.
+--
+-- the input file synonyms are matched ignoring case; the MGI symbols and
+-- synonyms are matched as spelled (see verifySynonyms())
+--
+insert into nomen_stage_error (runID, lineNum, checkNum, seq, message, value, reject)
+select %(runID)s, e.* from (
+select lineNum, 1, 0, format('Invalid Marker Type (%%s) %%s', lineNum, markerType), markerType, true
+from nomen_stage where runID = %(runID)s and _Marker_Type_key is null
+union all
+select lineNum, 2, 0, format('Invalid Marker Status (row %%s): %%s', lineNum, markerStatus), markerStatus, true
+from nomen_stage where runID = %(runID)s and _Marker_Status_key is null
+union all
+select lineNum, 3, 0, format('Invalid Reference (%%s): %%s', lineNum, jnum), jnum, true
+from nomen_stage where runID = %(runID)s and _Refs_key is null
+union all
+select lineNum, 4, 0, format('Invalid User (%%s) %%s', lineNum, createdBy), createdBy, true
+from nomen_stage where runID = %(runID)s and _User_key is null
+union all
+select s.lineNum, 5, 0, format(E'WARNING: Symbol is Withdrawn (row %%s): %%s\\n', s.lineNum, s.symbol), s.symbol, false
+from nomen_stage s
+where s.runID = %(runID)s and exists (select 1 from MRK_Marker m
+        where m._Organism_key = 1 and m._Marker_Status_key = 2 and m.symbol = s.symbol)
+union all
+select s.lineNum, 6, 0, format('Symbol is Official/Reserved (row %%s): %%s', s.lineNum, s.symbol), s.symbol, true
+from nomen_stage s
+where s.runID = %(runID)s and exists (select 1 from MRK_Marker m
+        where m._Organism_key = 1 and m._Marker_Status_key in (1,3) and m.symbol = s.symbol)
+union all
+select s.lineNum, 7, 0, format('Invalid Chromosome (row %%s): %%s', s.lineNum, s.chromosome), s.chromosome, true
+from nomen_stage s
+where s.runID = %(runID)s and not exists (select 1 from MRK_Chromosome c
+        where c._Organism_key = 1 and c.chromosome = s.chromosome)
+union all
+select lineNum, 8, 0, format('Invalid MCV Term (row %%s): %%s', lineNum, mcvTerm), mcvTerm, true
+from nomen_stage where runID = %(runID)s and _Term_key is null
+union all
+select d.lineNum, 9, 0, format('WARNING: Duplicate Symbol in input file (row %%s): %%s', d.lineNum, d.symbol), d.symbol, true
+from (select lineNum, symbol, row_number() over (partition by symbol order by lineNum) as n
+        from nomen_stage where runID = %(runID)s) d
+where d.n > 1
+union all
+select lineNum, 10, seq, format('Invalid Logical DB (row %%s): %%s', lineNum, logicalDB), logicalDB, true
+from nomen_stage_acc where runID = %(runID)s and logicalDB is not null and _LogicalDB_key is null
+union all
+select lineNum, 11, seq, format('Sequences without Logical DB (row %%s): %%s', lineNum, otherAcc), otherAcc, true
+from nomen_stage_acc where runID = %(runID)s and logicalDB is null
+union all
+select y.lineNum, 12, y.seq,
+        format('WARNING: Synonym is a Symbol in input file (row %%s): %%s ; %%s', y.lineNum, y.synonym, d.symbol),
+        y.synonym, false
+from nomen_stage_syn y,
+        (select distinct on (lower(symbol)) lower(symbol) as synonym, symbol
+        from nomen_stage where runID = %(runID)s
+        order by lower(symbol), lineNum desc) d
+where y.runID = %(runID)s and lower(y.synonym) = d.synonym
+union all
+select y.lineNum, 13, y.seq,
+        format('WARNING: Duplicate Synonym in input file (row %%s): %%s ; %%s', y.lineNum, y.synonym, d.symbols),
+        y.synonym, false
+from nomen_stage_syn y,
+        (select lower(y.synonym) as synonym, string_agg(s.symbol, ', ' order by y.lineNum, y.seq) as symbols
+        from nomen_stage_syn y, nomen_stage s
+        where y.runID = %(runID)s and s.runID = y.runID and y.lineNum = s.lineNum
+        group by lower(y.synonym)
+        having count(*) > 1) d
+where y.runID = %(runID)s and lower(y.synonym) = d.synonym
+union all
+select y.lineNum, 14, y.seq,
+        format('WARNING: Synonym is a Marker Symbol (row %%s): %%s ; %%s', y.lineNum, y.synonym, d.symbol),
+        y.synonym, false
+from nomen_stage_syn y,
+        (select distinct m.symbol
+        from nomen_stage_syn x, MRK_Marker m
+        where x.runID = %(runID)s
+                and m.symbol = x.synonym
+                and m._Organism_key = 1
+                and m._Marker_Status_key in (1,3)) d
+where y.runID = %(runID)s and lower(y.synonym) = lower(d.symbol)
+union all
+select y.lineNum, 15, y.seq,
+        format('WARNING: Synonym is a Marker Synonym (row %%s): %%s ; %%s', y.lineNum, y.synonym, d.symbol),
+        y.synonym, false
+from nomen_stage_syn y,
+        (select distinct s.synonym, m.symbol
+        from nomen_stage_syn x, MGI_Synonym s, MRK_Marker m
+        where x.runID = %(runID)s
+                and s.synonym = x.synonym
+                and s._MGIType_key = 2
+                and s._Object_key = m._Marker_key
+                and m._Organism_key = 1) d
+where y.runID = %(runID)s and lower(y.synonym) = lower(d.synonym)
+union all
+select a.lineNum, 16, a.seq,
+        format(E'WARNING: Sequence is associated with other Marker (row %%s): %%s ; %%s\\n', a.lineNum, a.accID, m.symbol),
+        a.accID, false
+from nomen_stage_acc a, ACC_Accession x, MRK_Marker m
+where a.runID = %(runID)s
+        and a._LogicalDB_key is not null
+        and x.accID = a.accID
+        and x._MGIType_key = 2
+        and x._Object_key = m._Marker_key
+        and m._Organism_key = 1
+) e;
+
+update nomen_stage s
+set rejected = exists (select 1 from nomen_stage_error e
+                where e.runID = s.runID and e.lineNum = s.lineNum and e.reject),
+        accCount = (select count(*) from nomen_stage_acc a where a.runID = s.runID and a.lineNum = s.lineNum),
+        synCount = (select count(*) from nomen_stage_syn y where y.runID = s.runID and y.lineNum = s.lineNum)
+where s.runID = %(runID)s;
+
+select s.lineNum, s.rejected, s._Marker_Type_key, s._Refs_key, s._User_key, e.message, e.value
+from nomen_stage s left outer join nomen_stage_error e on (e.runID = s.runID and e.lineNum = s.lineNum)
+where s.runID = %(runID)s
+order by s.lineNum,
+        case when e.checkNum in (10, 11) then 10 when e.checkNum between 12 and 15 then 12 else e.checkNum end,
+        e.seq, e.checkNum, e.value
+'''
+
+#
+# keys : the starting key of each table (see nomenload.setPrimaryKeys())
+# each accepted row uses, in input order :
+#	1 marker/history/reference/mcv/mapping key
+#	1 accession key (MGI id), 1 per other accession id, 1 for the wild-type allele MGI id
+#	1 MGI id, + 1 for the wild-type allele
+#	1 synonym key per synonym, 1 note key if there is a note
+#
+publishSQL = '''
+create temp table nomen_stage_keys on commit drop as
+select s.*,
+        (row_number() over w) - 1 as n,
+        s.lineNum = any(%(wildTypeLines)s) as wildType,
+        coalesce(sum(case when s.lineNum = any(%(wildTypeLines)s) then 1 else 0 end) over p, 0) as wildTypeBefore,
+        coalesce(sum(1 + s.accCount + case when s.lineNum = any(%(wildTypeLines)s) then 1 else 0 end) over p, 0) as accBefore,
+        coalesce(sum(s.synCount) over p, 0) as synBefore,
+        coalesce(sum(case when s.notes != '' then 1 else 0 end) over p, 0) as noteBefore
+from nomen_stage s
+where s.runID = %(runID)s and not s.rejected
+window w as (order by s.lineNum),
+        p as (order by s.lineNum rows between unbounded preceding and 1 preceding);
+
+insert into MRK_Marker
+select %(markerKey)d + k.n, 1, k._Marker_Status_key, k._Marker_Type_key, k.symbol, k.name, k.chromosome, null,
+        case when k.chromosome = 'UN' then -999 else -1 end,
+        k._User_key, k._User_key, %(cdate)s, %(cdate)s
+from nomen_stage_keys k;
+
+insert into MRK_Current
+select %(markerKey)d + k.n, %(markerKey)d + k.n, %(cdate)s, %(cdate)s
+from nomen_stage_keys k;
+
+insert into MRK_History
+select %(historyKey)d + k.n, %(markerKey)d + k.n, 106563604, 106563610, %(markerKey)d + k.n, k._Refs_key, 1, k.name,
+        %(cdate)s, k._User_key, k._User_key, %(cdate)s, %(cdate)s
+from nomen_stage_keys k;
+
+insert into MGI_Reference_Assoc
+select %(refAssocKey)d + k.n, k._Refs_key, %(markerKey)d + k.n, %(mgiTypeKey)d, %(refAssocTypeKey)d,
+        k._User_key, k._User_key, %(cdate)s, %(cdate)s
+from nomen_stage_keys k;
+
+insert into ACC_Accession
+select %(accKey)d + k.accBefore, %(mgiPrefix)s || (%(mgiKey)d + k.n + k.wildTypeBefore), %(mgiPrefix)s,
+        %(mgiKey)d + k.n + k.wildTypeBefore, 1, %(markerKey)d + k.n, %(mgiTypeKey)d, 0, 1,
+        k._User_key, k._User_key, %(cdate)s, %(cdate)s
+from nomen_stage_keys k;
+
+insert into MGI_Note
+select %(noteKey)d + k.noteBefore, %(markerKey)d + k.n, 2, 1009, k.notes, k._User_key, k._User_key, %(cdate)s, %(cdate)s
+from nomen_stage_keys k
+where k.notes != '';
+
+insert into VOC_Annot
+select %(mcvKey)d + k.n, 1011, %(markerKey)d + k.n, k._Term_key, 1614158, %(cdate)s, %(cdate)s
+from nomen_stage_keys k;
+
+insert into MGI_Synonym
+select %(synKey)d + k.synBefore + (row_number() over (partition by y.lineNum order by y.seq)) - 1,
+        %(markerKey)d + k.n, %(mgiTypeKey)d, %(synTypeKey)d, k._Refs_key, y.synonym,
+        k._User_key, k._User_key, %(cdate)s, %(cdate)s
+from nomen_stage_keys k, nomen_stage_syn y
+where y.runID = k.runID and k.lineNum = y.lineNum;
+
+create temp table nomen_stage_acckeys on commit drop as
+select %(accKey)d + k.accBefore + (row_number() over (partition by a.lineNum order by a.seq)) as accKey,
+        a.accID, a.prefixPart, a.numericPart, a._LogicalDB_key, %(markerKey)d + k.n as markerKey,
+        k._Refs_key, k._User_key
+from nomen_stage_keys k, nomen_stage_acc a
+where a.runID = k.runID and k.lineNum = a.lineNum;
+
+insert into ACC_Accession
+select a.accKey, a.accID, a.prefixPart, a.numericPart, a._LogicalDB_key, a.markerKey, %(mgiTypeKey)d, 0, 1,
+        a._User_key, a._User_key, %(cdate)s, %(cdate)s
+from nomen_stage_acckeys a;
+
+insert into ACC_AccessionReference
+select a.accKey, a._Refs_key, a._User_key, a._User_key, %(cdate)s, %(cdate)s
+from nomen_stage_acckeys a;
+
+insert into ALL_Allele
+select %(alleleKey)d + k.wildTypeBefore, %(markerKey)d + k.n, -2, 847095, 847131, 847114, 3982955, 11025586,
+        k.symbol || '<+>', 'wild type', 1, 0, 0, null, 4268545,
+        k._User_key, k._User_key, k._User_key, %(cdate)s, %(cdate)s, %(cdate)s
+from nomen_stage_keys k
+where k.wildType;
+
+insert into ACC_Accession
+select %(accKey)d + k.accBefore + 1 + k.accCount, %(mgiPrefix)s || (%(mgiKey)d + k.n + k.wildTypeBefore + 1), %(mgiPrefix)s,
+        %(mgiKey)d + k.n + k.wildTypeBefore + 1, 1, %(alleleKey)d + k.wildTypeBefore, %(alleleTypeKey)d, 0, 1,
+        k._User_key, k._User_key, %(cdate)s, %(cdate)s
+from nomen_stage_keys k
+where k.wildType;
+
+'''
+
+def create():
+    '''
+    # requires:
+    #
+    # effects:
+    #	creates the staging tables (if they do not exist), deletes the rows
+    #	of the runs that started more than a day ago and starts a new run
+    #	(runID)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global runID
+
+    runID = uuid.uuid4().hex
+
+    db.sql(createSQL, None)
+    db.sql(deleteSQL % {'runs' : staleRuns}, None)
+    db.sql('insert into nomen_stage_run (runID) values (%s)' % (nomensql.quote(runID)), None)
+    db.commit()
+
+def cleanup():
+    '''
+    # requires:
+    #
+    # effects:
+    #	deletes the rows of this run from the staging tables
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    if len(runID) == 0:
+        return
+
+    db.sql(deleteSQL % {'runs' : nomensql.quote(runID)}, None)
+    db.commit()
+
+def stage(fileName, rows, psqlCommand, user):
+    '''
+    # requires:
+    #	fileName - the stage file (binary COPY)
+    #	rows - the input rows : (lineNum, 11 input columns)
+    #	psqlCommand - psql
+    #	user - the database user
+    #
+    # effects:
+    #	writes the rows (with the runID of the run) to the stage file of
+    #	the run (<fileName>.<runID>) and copies the file into nomen_stage;
+    #	the file is removed once it is copied
+    #
+    # returns:
+    #	the exit status of psql
+    #
+    '''
+
+    runFileName = '%s.%s' % (fileName, runID)
+
+    fp = pgcopy.writer(runFileName, STAGE_TABLE, pgcopy.BINARY)
+    for row in rows:
+        fp.writeRow(list(row) + [runID])
+    fp.close()
+
+    status = os.system('%s -h %s -d %s -U %s -v ON_ERROR_STOP=1 -c "\\copy %s (%s) from \'%s\' with (format binary)"' % \
+        (psqlCommand, db.get_sqlServer(), db.get_sqlDatabase(), user,
+         STAGE_TABLE, ', '.join(stageColumns), os.path.abspath(runFileName)))
+
+    if status == 0:
+        os.remove(runFileName)
+
+    return status
+
+def validate():
+    '''
+    # requires:
+    #	the staged input (see stage())
+    #
+    # effects:
+    #	runs the sanity checks against the staged rows of the run
+    #
+    # returns:
+    #	one row per sanity check message (or one row with no message) of
+    #	each staged row, in input order :
+    #	lineNum, rejected, _Marker_Type_key, _Refs_key, _User_key, message, value
+    #	(message : the error file text of sanityCheck())
+    #
+    '''
+
+    results = db.sql(validateSQL % {'runID' : nomensql.quote(runID)}, 'auto')
+    db.commit()
+
+    return results
+
+def publish(keys, wildTypeLines, sequences, reserved = 0):
+    '''
+    # requires:
+    #	keys - {name : value} : the starting key of each table (markerKey,
+    #		accKey, ...), the constants (mgiTypeKey, ...), cdate and mgiCount
+    #	wildTypeLines - the line numbers of the accepted rows that get
+    #		a wild-type allele
+    #	sequences - [(sequence, table, key column), ...] : the auto-sequences
+    #		to update (see pgcopy.SEQUENCES)
+    #	reserved - the keys were reserved (see keylock.py) :
+    #		the sequences are not updated
+    #
+    # effects:
+    #	inserts the accepted rows of the run into the nomen tables, updates the
+    #	max accession ID value and the auto-sequences, in one transaction;
+    #	if any statement fails, nothing is loaded
+    #
+    # returns:
+    #	nothing
+    #	raises the database error if the publish fails (after a rollback)
+    #
+    '''
+
+    values = dict(keys)
+    values['wildTypeLines'] = '%s::int[]' % (nomensql.quote(list(wildTypeLines)))
+    values['cdate'] = "to_date(%s, 'MM/DD/YYYY')" % (nomensql.quote(keys['cdate']))
+    values['mgiPrefix'] = nomensql.quote(keys['mgiPrefix'])
+    values['runID'] = nomensql.quote(runID)
+
+    cmd = publishSQL % values
+    cmd = cmd + 'select * from ACC_setMax (%d);\n' % (keys['mgiCount'])
+
+    if not reserved:
+        for sequence, table, keyColumn in sequences:
+            cmd = cmd + "select setval(%s, (select max(%s) from %s));\n" % (nomensql.quote(sequence), keyColumn, table)
+
+    try:
+        db.sql(cmd, None)
+    except:
+        db.sql('rollback', None)
+        raise
+
+    db.commit()
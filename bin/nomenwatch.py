@@ -0,0 +1,290 @@
+'''
+#
+# Purpose:
+#
+#	Nomen publish watcher : starts the load as soon as a curator
+#	publishes an input file (publishNomen, publishBatchRename,
+#	publishBatchDelete), instead of waiting for the scheduled run.
+#
+#	Watches DESTCURRENTDIR (Linux inotify, via ctypes) for completed
+#	writes (close after write, or rename into the directory) of:
+#
+#	    nomenload.txt   : nomenload.sh nomenload.config
+#	    batchrename.txt : batchrename.sh nomenload.config
+#	    batchdelete.txt : batchdelete.sh nomenload.config
+#
+#	Debounce : a job is started once its file has had no events
+#	for NOMENWATCH_DEBOUNCE seconds (partial writes, the second copy
+#	made by the publish scripts).
+#
+#	Serialize : all three jobs update MRK_Marker/MRK_History, so by
+#	default one job runs at a time; files published while a job is
+#	running are queued.  With NOMENWATCH_PARALLEL=1, the jobs of
+#	different input files run at the same time (their primary keys are
+#	reserved; see keylock.py).
+#
+#	Republish during a run : an event for the input file of a running
+#	job is remembered; when the job exits, the file is compared with
+#	the file the job started with (line endings ignored : the job
+#	converts its input file in place).  If it changed, it is queued
+#	again, and its modification time is set to the exit time so that
+#	the "lastrun" check of the job does not skip it.
+#
+#	The scheduled runs and the "lastrun" check are not changed;
+#	a file that has already been loaded is skipped by the job.
+#	Stopping the watcher does not stop a running job.
+#
+# Usage:
+#
+#	nomenwatch.sh nomenload.config
+#
+# Env Vars:
+#
+#	See the configuration file nomenload.config
+#	NOMENWATCH_DEBOUNCE : seconds without events before a job is started (default 10)
+#	NOMENWATCH_PARALLEL : 1 if the jobs of different input files may run at the same time (default 0)
+#
+'''
+
+import sys
+import os
+import time
+import select
+import signal
+import struct
+import ctypes
+import ctypes.util
+import hashlib
+import subprocess
+import mgi_utils
+
+#
+# from configuration file
+#
+configFileName = os.environ['CONFIG_FILE']
+nomenload = os.environ['NOMENLOAD']
+watchDir = os.environ['DESTCURRENTDIR']
+debounce = float(os.environ.get('NOMENWATCH_DEBOUNCE', '10'))
+parallel = int(os.environ.get('NOMENWATCH_PARALLEL', '0'))
+
+# {input file name : job script}
+jobs = {
+    os.path.basename(os.environ['INPUT_FILE_DEFAULT']) : 'nomenload.sh',
+    os.path.basename(os.environ['RENAME_FILE_DEFAULT']) : 'batchrename.sh',
+    os.path.basename(os.environ['DELETE_FILE_DEFAULT']) : 'batchdelete.sh',
+    }
+
+# inotify (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+eventHeader = struct.Struct('iIII')	# wd, mask, cookie, len
+
+pending = {}		# {input file name : time of the last event}
+running = {}		# {input file name : subprocess.Popen} of the running jobs
+startDigests = {}	# {input file name : digest of the file when its job started}
+republished = set()	# the input files of running jobs that had events during the run
+
+def log(message):
+    '''
+    # requires: message (string)
+    #
+    # effects:
+    #	writes the message to the watcher log (stdout)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    sys.stdout.write('%s %s\n' % (mgi_utils.date(), message))
+    sys.stdout.flush()
+
+def initWatch():
+    '''
+    # requires:
+    #
+    # effects:
+    #	creates the inotify instance and watches watchDir
+    #
+    # returns:
+    #	the inotify file descriptor
+    #
+    '''
+
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+
+    fd = libc.inotify_init1(IN_NONBLOCK)
+    if fd < 0:
+        sys.stderr.write('inotify_init1 failed: %s\n' % (os.strerror(ctypes.get_errno())))
+        sys.exit(1)
+
+    if libc.inotify_add_watch(fd, watchDir.encode(), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        sys.stderr.write('Cannot watch %s: %s\n' % (watchDir, os.strerror(ctypes.get_errno())))
+        sys.exit(1)
+
+    return fd
+
+def readEvents(fd):
+    '''
+    # requires:
+    #	fd - the inotify file descriptor
+    #
+    # effects:
+    #	reads the pending events; each event for an input file updates
+    #	pending, or republished if the job of the file is running
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    try:
+        data = os.read(fd, 65536)
+    except BlockingIOError:
+        return
+
+    offset = 0
+    while offset < len(data):
+        wd, mask, cookie, length = eventHeader.unpack_from(data, offset)
+        offset = offset + eventHeader.size
+        fileName = data[offset:offset + length].rstrip(b'\0').decode()
+        offset = offset + length
+
+        if fileName not in jobs:
+            continue
+
+        if fileName in running:
+            republished.add(fileName)
+            continue
+
+        pending[fileName] = time.time()
+
+def fileDigest(fileName):
+    '''
+    # requires:
+    #	fileName - an input file name (in watchDir)
+    #
+    # returns:
+    #	the sha1 digest of the file, with DOS line endings converted
+    #	(as the job converts it); None if the file cannot be read
+    #
+    '''
+
+    try:
+        with open(os.path.join(watchDir, fileName), 'rb') as fp:
+            contents = fp.read()
+    except OSError:
+        return None
+
+    return hashlib.sha1(contents.replace(b'\r\n', b'\n')).hexdigest()
+
+def startJob():
+    '''
+    # requires:
+    #
+    # effects:
+    #	if no job is running (or NOMENWATCH_PARALLEL), starts the job of the
+    #	earliest published input file that has had no events for
+    #	NOMENWATCH_DEBOUNCE seconds and whose job is not running
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    if len(running) > 0 and not parallel:
+        return
+
+    now = time.time()
+    ready = [(eventTime, fileName) for fileName, eventTime in pending.items()
+        if now - eventTime >= debounce and fileName not in running]
+
+    if len(ready) == 0:
+        return
+
+    eventTime, fileName = min(ready)
+    del pending[fileName]
+
+    script = os.path.join(nomenload, 'bin', jobs[fileName])
+    log('%s published : running %s %s' % (fileName, script, configFileName))
+    startDigests[fileName] = fileDigest(fileName)
+    running[fileName] = subprocess.Popen([script, configFileName])
+
+def checkJob():
+    '''
+    # requires:
+    #
+    # effects:
+    #	logs the exit status of each running job that has finished;
+    #	queues its input file again if it was republished during the run
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    for fileName, process in list(running.items()):
+        status = process.poll()
+
+        if status is None:
+            continue
+
+        log('%s : %s exit status = %s' % (fileName, jobs[fileName], status))
+        del running[fileName]
+
+        startDigest = startDigests.pop(fileName, None)
+
+        if fileName not in republished:
+            continue
+
+        republished.discard(fileName)
+
+        if fileDigest(fileName) == startDigest:
+            continue
+
+        try:
+            os.utime(os.path.join(watchDir, fileName), None)
+        except OSError:
+            pass
+
+        log('%s republished during the run : queued' % (fileName))
+        pending[fileName] = time.time()
+
+def main():
+    '''
+    # requires:
+    #
+    # effects:
+    #	watches watchDir and runs the jobs until terminated
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    fd = initWatch()
+    log('nomenwatch started: %s (%s)' % (watchDir, ', '.join(sorted(jobs))))
+
+    try:
+        while 1:
+            readable, writable, errors = select.select([fd], [], [], 1.0)
+            if readable:
+                readEvents(fd)
+            checkJob()
+            startJob()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        os.close(fd)
+        log('nomenwatch stopped')
+
+#
+# Main
+#
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,52 @@
+#!/bin/sh
+#
+#  nomenwatch.sh
+###########################################################################
+#
+#  Purpose:
+# 	This script starts the Nomen publish watcher (see nomenwatch.py)
+#
+  Usage="nomenwatch.sh [config]"
+#
+#  Env Vars:
+#
+#      See the configuration file nomenload.config
+#
+#  Inputs:
+#
+#      - configuration file - nomenload.config (default)
+#
+#  Outputs:
+#
+#      - the watcher log : ${LOGDIR}/nomenwatch.log
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  Fatal error occurred
+#
+#  Assumes:  Nothing
+#
+
+cd `dirname $0`
+
+#
+# Verify and source the configuration file
+#
+CONFIG_FILE=${1:-../nomenload.config}
+
+if [ ! -r ${CONFIG_FILE} ]
+then
+    echo "Cannot read configuration file: ${CONFIG_FILE}"
+    exit 1
+fi
+
+. ${CONFIG_FILE}
+
+CONFIG_FILE=`cd \`dirname ${CONFIG_FILE}\` && pwd`/`basename ${CONFIG_FILE}`
+export CONFIG_FILE
+
+cd ${OUTPUTDIR}
+nohup ${PYTHON} ${NOMENLOAD}/bin/nomenwatch.py >> ${LOGDIR}/nomenwatch.log 2>&1 &
+
+exit 0
@@ -0,0 +1,435 @@
+'''
+#
+# Purpose:
+#
+#	BCP file writers for the tables created by nomenload
+#
+#	text : the "|" delimited bcp format loaded by bcpin.csh
+#	       (string values are escaped : backslash and "|")
+#
+#	binary : the PostgreSQL binary COPY format, loaded by
+#	       the psql client-side copy (format binary).  integer keys and
+#	       dates are packed, not formatted as strings (and parsed again
+#	       by the server), and no value needs to be escaped.
+#
+#	A row is a tuple of values in table column order (see COLUMNS);
+#	None is a null value.  Dates are "mm/dd/yyyy" strings (nomenload cdate).
+#
+#	Usage:
+#	    fp = pgcopy.writer('MRK_Marker.bcp', 'MRK_Marker', 'binary')
+#	    fp.writeRow((markerKey, 1, ...))
+#	    fp.close()
+#
+#	    for key, row in pgcopy.readRows('MRK_Marker.bcp', 'binary'):
+#	        ...
+#	    pgcopy.writeRows('MRK_Marker.bcp.chunk', 'binary', rows)
+#
+#	readRows()/writeRows() copy the encoded rows of a bcp file (a chunked
+#	load; see nomenload.bcpFiles()); the key (1st column) of each row is
+#	decoded, the other columns are not.  rowValues() decodes the columns
+#	that identify the rows of a load (see IDENTITY).
+#
+'''
+
+import struct
+import datetime
+
+TEXT = 'text'
+BINARY = 'binary'
+
+#
+# column types of each table, in column order
+#
+INT2 = 'int2'
+INT4 = 'int4'
+FLOAT8 = 'float8'
+TEXTTYPE = 'text'
+TIMESTAMP = 'timestamp'
+
+COLUMNS = {
+    # _Marker_key, _Organism_key, _Marker_Status_key, _Marker_Type_key, symbol, name,
+    # chromosome, cytogeneticOffset, cmOffset, _CreatedBy_key, _ModifiedBy_key,
+    # creation_date, modification_date
+    'MRK_Marker' : [INT4, INT4, INT4, INT4, TEXTTYPE, TEXTTYPE,
+        TEXTTYPE, TEXTTYPE, FLOAT8, INT4, INT4,
+        TIMESTAMP, TIMESTAMP],
+
+    # _Assoc_key, _Refs_key, _Object_key, _MGIType_key, _RefAssocType_key,
+    # _CreatedBy_key, _ModifiedBy_key, creation_date, modification_date
+    'MGI_Reference_Assoc' : [INT4, INT4, INT4, INT4, INT4,
+        INT4, INT4, TIMESTAMP, TIMESTAMP],
+
+    # _Synonym_key, _Object_key, _MGIType_key, _SynonymType_key, _Refs_key, synonym,
+    # _CreatedBy_key, _ModifiedBy_key, creation_date, modification_date
+    'MGI_Synonym' : [INT4, INT4, INT4, INT4, INT4, TEXTTYPE,
+        INT4, INT4, TIMESTAMP, TIMESTAMP],
+
+    # _Accession_key, accID, prefixPart, numericPart, _LogicalDB_key, _Object_key,
+    # _MGIType_key, private, preferred, _CreatedBy_key, _ModifiedBy_key,
+    # creation_date, modification_date
+    'ACC_Accession' : [INT4, TEXTTYPE, TEXTTYPE, INT4, INT4, INT4,
+        INT4, INT2, INT2, INT4, INT4,
+        TIMESTAMP, TIMESTAMP],
+
+    # _Accession_key, _Refs_key, _CreatedBy_key, _ModifiedBy_key,
+    # creation_date, modification_date
+    'ACC_AccessionReference' : [INT4, INT4, INT4, INT4,
+        TIMESTAMP, TIMESTAMP],
+
+    # _Current_key, _Marker_key, creation_date, modification_date
+    'MRK_Current' : [INT4, INT4, TIMESTAMP, TIMESTAMP],
+
+    # _Assoc_key, _Marker_key, _Marker_Event_key, _Marker_EventReason_key, _History_key,
+    # _Refs_key, sequenceNum, name, event_date, _CreatedBy_key, _ModifiedBy_key,
+    # creation_date, modification_date
+    'MRK_History' : [INT4, INT4, INT4, INT4, INT4,
+        INT4, INT4, TEXTTYPE, TIMESTAMP, INT4, INT4,
+        TIMESTAMP, TIMESTAMP],
+
+    # _Allele_key, _Marker_key, _Strain_key, _Mode_key, _Allele_Type_key,
+    # _Allele_Status_key, _Transmission_key, _Collection_key, symbol, name,
+    # isWildType, isExtinct, isMixed, _Refs_key, _MarkerAllele_Status_key,
+    # _CreatedBy_key, _ModifiedBy_key, _ApprovedBy_key,
+    # approval_date, creation_date, modification_date
+    'ALL_Allele' : [INT4, INT4, INT4, INT4, INT4,
+        INT4, INT4, INT4, TEXTTYPE, TEXTTYPE,
+        INT2, INT2, INT2, INT4, INT4,
+        INT4, INT4, INT4,
+        TIMESTAMP, TIMESTAMP, TIMESTAMP],
+
+    # _Note_key, _Object_key, _MGIType_key, _NoteType_key, note,
+    # _CreatedBy_key, _ModifiedBy_key, creation_date, modification_date
+    'MGI_Note' : [INT4, INT4, INT4, INT4, TEXTTYPE,
+        INT4, INT4, TIMESTAMP, TIMESTAMP],
+
+    # _Annot_key, _AnnotType_key, _Object_key, _Term_key, _Qualifier_key,
+    # creation_date, modification_date
+    'VOC_Annot' : [INT4, INT4, INT4, INT4, INT4,
+        TIMESTAMP, TIMESTAMP],
+
+    # staged load (see nomenstage.py) : lineNum, the 11 input columns, runID
+    'nomen_stage' : [INT4] + [TEXTTYPE] * 11 + [TEXTTYPE],
+    }
+
+#
+# the auto-sequences of the tables, updated after a load : (sequence, table, key column)
+#
+SEQUENCES = [
+    ('mrk_marker_seq', 'MRK_Marker', '_Marker_key'),
+    ('mgi_note_seq', 'MGI_Note', '_Note_key'),
+    ('mrk_history_seq', 'MRK_History', '_Assoc_key'),
+    ('mgi_reference_assoc_seq', 'MGI_Reference_Assoc', '_Assoc_key'),
+    ('mgi_synonym_seq', 'MGI_Synonym', '_Synonym_key'),
+    ('all_allele_seq', 'ALL_Allele', '_Allele_key'),
+    ('mld_expt_marker_seq', 'MLD_Expt_Marker', '_Assoc_key'),
+    ('voc_annot_seq', 'VOC_Annot', '_Annot_key'),
+    ]
+
+#
+# the key column (1st column) of each table : the keys of a bcp file are in ascending order
+#
+KEYS = {
+    'MRK_Marker' : '_Marker_key',
+    'MGI_Reference_Assoc' : '_Assoc_key',
+    'MGI_Synonym' : '_Synonym_key',
+    'ACC_Accession' : '_Accession_key',
+    'ACC_AccessionReference' : '_Accession_key',
+    'MRK_Current' : '_Current_key',
+    'MRK_History' : '_Assoc_key',
+    'ALL_Allele' : '_Allele_key',
+    'MGI_Note' : '_Note_key',
+    'VOC_Annot' : '_Annot_key',
+    }
+
+#
+# the columns (name, index) that identify the rows of a load : a row in the
+# database with a key of a bcp file is a row of the load if these columns match
+# (see rowValues())
+#
+IDENTITY = {
+    'MRK_Marker' : [('symbol', 4)],
+    'MGI_Reference_Assoc' : [('_Object_key', 2)],
+    'MGI_Synonym' : [('_Object_key', 1), ('synonym', 5)],
+    'ACC_Accession' : [('accID', 1), ('_Object_key', 5)],
+    'ACC_AccessionReference' : [('_Accession_key', 0), ('_Refs_key', 1)],
+    'MRK_Current' : [('_Marker_key', 1)],
+    'MRK_History' : [('_Marker_key', 1)],
+    'ALL_Allele' : [('_Marker_key', 1), ('symbol', 8)],
+    'MGI_Note' : [('_Object_key', 1)],
+    'VOC_Annot' : [('_Object_key', 2)],
+    }
+
+# binary COPY file header : signature, flags, header extension length
+HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+TRAILER = struct.pack('!h', -1)
+NULL = struct.pack('!i', -1)
+
+# PostgreSQL timestamps : microseconds since 2000-01-01
+EPOCH = datetime.datetime(2000, 1, 1)
+
+class TextWriter:
+    '''
+    # "|" delimited bcp file (bcpin.csh)
+    '''
+
+    def __init__(self, fileName, table):
+        self.name = fileName
+        self.table = table
+        self.fp = open(fileName, 'w')
+
+    def writeRow(self, values):
+        self.fp.write('|'.join([escape(v) for v in values]) + '\n')
+
+    def close(self):
+        self.fp.close()
+
+class BinaryWriter:
+    '''
+    # PostgreSQL binary COPY file
+    '''
+
+    def __init__(self, fileName, table):
+        self.name = fileName
+        self.table = table
+        self.fp = open(fileName, 'wb')
+        self.fp.write(HEADER)
+        self.count = struct.pack('!h', len(COLUMNS[table]))
+        self.encoders = [ENCODERS[t] for t in COLUMNS[table]]
+        self.dates = {}		# {date string : encoded timestamp}
+
+    def writeRow(self, values):
+        fields = [self.count]
+
+        for encoder, value in zip(self.encoders, values):
+            if value is None:
+                fields.append(NULL)
+            elif encoder is encodeTimestamp:
+                if value not in self.dates:
+                    self.dates[value] = encodeTimestamp(value)
+                fields.append(self.dates[value])
+            else:
+                fields.append(encoder(value))
+
+        self.fp.write(b''.join(fields))
+
+    def close(self):
+        self.fp.write(TRAILER)
+        self.fp.close()
+
+def escape(value):
+    '''
+    # requires:
+    #	value - a column value
+    #
+    # returns:
+    #	the value for a text bcp file : None is an empty string,
+    #	backslash and "|" are escaped
+    #
+    '''
+
+    if value is None:
+        return ''
+
+    if isinstance(value, str):
+        if '\\' in value or '|' in value:
+            return value.replace('\\', '\\\\').replace('|', '\\|')
+        return value
+
+    return str(value)
+
+def encodeInt2(value):
+    return struct.pack('!ih', 2, int(value))
+
+def encodeInt4(value):
+    return struct.pack('!ii', 4, int(value))
+
+def encodeFloat8(value):
+    return struct.pack('!id', 8, float(value))
+
+def encodeText(value):
+    data = str(value).encode('utf-8')
+    return struct.pack('!i', len(data)) + data
+
+def encodeTimestamp(value):
+    delta = datetime.datetime.strptime(value, '%m/%d/%Y') - EPOCH
+    return struct.pack('!iq', 8, (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds)
+
+ENCODERS = {
+    INT2 : encodeInt2,
+    INT4 : encodeInt4,
+    FLOAT8 : encodeFloat8,
+    TEXTTYPE : encodeText,
+    TIMESTAMP : encodeTimestamp,
+    }
+
+def writer(fileName, table, fileFormat = TEXT):
+    '''
+    # requires:
+    #	fileName - the bcp file name
+    #	table - the table name (see COLUMNS)
+    #	fileFormat - text or binary
+    #
+    # returns:
+    #	the bcp file writer (TextWriter, BinaryWriter)
+    #	raises ValueError if the format is invalid
+    #
+    '''
+
+    if fileFormat == TEXT:
+        return TextWriter(fileName, table)
+    elif fileFormat == BINARY:
+        return BinaryWriter(fileName, table)
+
+    raise ValueError('Invalid BCP format: %s' % (fileFormat))
+
+def readBytes(fp, length, fileName):
+    '''
+    # requires:
+    #	fp - the binary file descriptor
+    #	length - the number of bytes
+    #	fileName - the bcp file name
+    #
+    # returns:
+    #	the next length bytes of the file
+    #	raises ValueError if the file ends before them (a truncated file)
+    #
+    '''
+
+    data = fp.read(length)
+
+    if len(data) != length:
+        raise ValueError('Truncated binary COPY file: %s' % (fileName))
+
+    return data
+
+def readRows(fileName, fileFormat = TEXT):
+    '''
+    # requires:
+    #	fileName - the bcp file name
+    #	fileFormat - text or binary
+    #
+    # returns:
+    #	generator of (key, row) : the key (1st column, integer) and
+    #	the encoded row (bytes), in file order
+    #	raises ValueError if a binary file is not valid or is truncated
+    #	(a short row, or no trailer)
+    #
+    '''
+
+    with open(fileName, 'rb') as fp:
+
+        if fileFormat == TEXT:
+            for line in fp:
+                yield int(line.split(b'|', 1)[0]), line
+            return
+
+        if fp.read(len(HEADER)) != HEADER:
+            raise ValueError('Invalid binary COPY file: %s' % (fileName))
+
+        while 1:
+            data = readBytes(fp, 2, fileName)
+            count = struct.unpack('!h', data)[0]
+
+            if count == -1:
+                return
+
+            fields = [data]
+            key = None
+
+            for i in range(count):
+                data = readBytes(fp, 4, fileName)
+                length = struct.unpack('!i', data)[0]
+                fields.append(data)
+                if length > 0:
+                    value = readBytes(fp, length, fileName)
+                    fields.append(value)
+                    if key is None:
+                        key = struct.unpack('!i', value)[0]
+
+            yield key, b''.join(fields)
+
+def writeRows(fileName, fileFormat, rows):
+    '''
+    # requires:
+    #	fileName - the bcp file name
+    #	fileFormat - text or binary
+    #	rows - the encoded rows (see readRows())
+    #
+    # effects:
+    #	writes the rows to a bcp file (with the binary header/trailer)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    with open(fileName, 'wb') as fp:
+        if fileFormat == BINARY:
+            fp.write(HEADER)
+        for row in rows:
+            fp.write(row)
+        if fileFormat == BINARY:
+            fp.write(TRAILER)
+
+def rowValues(row, table, indexes, fileFormat = TEXT):
+    '''
+    # requires:
+    #	row - an encoded row (see readRows())
+    #	table - the table name (see COLUMNS)
+    #	indexes - the column indexes
+    #	fileFormat - text or binary
+    #
+    # returns:
+    #	the values of the columns, as strings (None for null)
+    #
+    '''
+
+    values = []
+
+    if fileFormat == TEXT:
+        fields = []
+        field = ''
+        escaped = 0
+        for c in row.decode('utf-8').rstrip('\n'):
+            if escaped:
+                field = field + c
+                escaped = 0
+            elif c == '\\':
+                escaped = 1
+            elif c == '|':
+                fields.append(field)
+                field = ''
+            else:
+                field = field + c
+        fields.append(field)
+
+        for i in indexes:
+            if len(fields[i]) == 0:
+                values.append(None)
+            else:
+                values.append(fields[i])
+        return values
+
+    fields = []
+    offset = 2
+    for columnType in COLUMNS[table]:
+        length = struct.unpack_from('!i', row, offset)[0]
+        offset = offset + 4
+        if length < 0:
+            fields.append(None)
+            continue
+        data = row[offset:offset + length]
+        offset = offset + length
+        if columnType == INT4:
+            fields.append(str(struct.unpack('!i', data)[0]))
+        elif columnType == INT2:
+            fields.append(str(struct.unpack('!h', data)[0]))
+        elif columnType == TEXTTYPE:
+            fields.append(data.decode('utf-8'))
+        else:
+            fields.append(data)
+
+    for i in indexes:
+        values.append(fields[i])
+
+    return values
@@ -0,0 +1,238 @@
+'''
+#
+# Purpose:
+#
+#	Opt-in profiling of the nomen jobs
+#	(nomenload.py, batchrename.py, batchdelete.py, updateMkrType.py)
+#
+#	The profiler is driven by the run history (see runhistory.py) :
+#	runhistory.start() starts it, each runhistory.phase() is a profile
+#	phase, runhistory.finish() stops it and writes the reports.
+#
+#	NOMEN_PROFILE=cpu : sampling CPU profiler.  The stack of the main
+#	thread is sampled every NOMEN_PROFILE_INTERVAL seconds of CPU time
+#	(SIGPROF); the samples are written in collapsed-stack format
+#	(flamegraph.pl, speedscope), one line per stack :
+#
+#	    job;phase;file:function;file:function... samples
+#
+#	to <NOMEN_PROFILE_DIR>/<job>.cpu.folded
+#
+#	NOMEN_PROFILE=mem : tracemalloc.  For each phase, the peak and
+#	current traced memory and the largest allocations (by line) still
+#	held at the end of the phase, written to
+#	<NOMEN_PROFILE_DIR>/<job>.mem.txt
+#
+#	Profiling never fails a run : errors are written to stderr.
+#
+# Env Vars:
+#
+#	NOMEN_PROFILE : cpu, mem; if not set, nothing is profiled
+#	NOMEN_PROFILE_DIR : the report directory (default LOGDIR, else the current directory)
+#	NOMEN_PROFILE_INTERVAL : CPU sampling interval, seconds (default 0.005)
+#	NOMEN_PROFILE_TOP : allocations reported per phase (default 20)
+#
+'''
+
+import sys
+import os
+import signal
+import tracemalloc
+import collections
+import mgi_utils
+
+CPU = 'cpu'
+MEM = 'mem'
+
+mode = os.environ.get('NOMEN_PROFILE', '')
+profileDir = os.environ.get('NOMEN_PROFILE_DIR', '') or os.environ.get('LOGDIR', '') or '.'
+interval = float(os.environ.get('NOMEN_PROFILE_INTERVAL', '0.005'))
+topCount = int(os.environ.get('NOMEN_PROFILE_TOP', '20'))
+
+job = None
+currentPhase = ''
+stacks = collections.Counter()	# {collapsed stack : samples}
+memPhases = []			# [(phase, peak, current, [tracemalloc.Statistic, ...]), ...]
+
+def sample(signum, frame):
+    '''
+    # requires:
+    #	signum, frame - the SIGPROF handler arguments
+    #
+    # effects:
+    #	adds the stack of the interrupted frame to stacks
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    names = []
+
+    while frame is not None:
+        code = frame.f_code
+        names.append('%s:%s' % (os.path.basename(code.co_filename), code.co_name))
+        frame = frame.f_back
+
+    names.append(currentPhase or '-')
+    names.append(job)
+    names.reverse()
+
+    stacks[';'.join(names)] += 1
+
+def start(jobName):
+    '''
+    # requires:
+    #	jobName - the name of the job (nomenload, batchrename, ...)
+    #
+    # effects:
+    #	starts the CPU sampler or tracemalloc (NOMEN_PROFILE)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global job, currentPhase, stacks, memPhases
+
+    if mode not in (CPU, MEM):
+        return
+
+    job = jobName
+    currentPhase = ''
+    stacks = collections.Counter()
+    memPhases = []
+
+    if mode == CPU:
+        signal.signal(signal.SIGPROF, sample)
+        signal.setitimer(signal.ITIMER_PROF, interval, interval)
+    else:
+        tracemalloc.start()
+
+def startPhase(name):
+    '''
+    # requires:
+    #	name - the name of the phase
+    #
+    # effects:
+    #	the samples/allocations that follow belong to the phase
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global currentPhase
+
+    if job is None:
+        return
+
+    currentPhase = name
+
+    if mode == MEM:
+        tracemalloc.reset_peak()
+
+def endPhase(name):
+    '''
+    # requires:
+    #	name - the name of the phase
+    #
+    # effects:
+    #	mem : records the peak and current traced memory of the phase
+    #	and its largest allocations
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global currentPhase
+
+    if job is None:
+        return
+
+    currentPhase = ''
+
+    if mode == MEM:
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics('lineno')[:topCount]
+        memPhases.append((name, peak, current, top))
+
+def writeCPU(fileName):
+    '''
+    # requires:
+    #	fileName - the report file
+    #
+    # effects:
+    #	writes the collapsed stacks (most samples first)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    with open(fileName, 'w') as fp:
+        for stack, count in stacks.most_common():
+            fp.write('%s %d\n' % (stack, count))
+
+def writeMem(fileName):
+    '''
+    # requires:
+    #	fileName - the report file
+    #
+    # effects:
+    #	writes the peak/current memory of each phase and its largest allocations
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    MB = 1024.0 * 1024.0
+
+    with open(fileName, 'w') as fp:
+        fp.write('%s memory profile (tracemalloc) : %s\n\n' % (job, mgi_utils.date()))
+        fp.write('%-24s %12s %12s\n' % ('phase', 'peak MB', 'current MB'))
+        for name, peak, current, top in memPhases:
+            fp.write('%-24s %12.1f %12.1f\n' % (name, peak / MB, current / MB))
+
+        if len(memPhases) > 0:
+            name, peak, current, top = max(memPhases, key = lambda p: p[1])
+            fp.write('\npeak : %.1f MB (%s)\n' % (peak / MB, name))
+
+        for name, peak, current, top in memPhases:
+            fp.write('\n%s : largest allocations held at the end of the phase\n' % (name))
+            for stat in top:
+                frame = stat.traceback[0]
+                fp.write('%10.1f KB %8d blocks  %s:%d\n' \
+                        % (stat.size / 1024.0, stat.count, frame.filename, frame.lineno))
+
+def stop():
+    '''
+    # requires:
+    #
+    # effects:
+    #	stops the profiler and writes the report
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global job
+
+    if job is None:
+        return
+
+    try:
+        if mode == CPU:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+            writeCPU(os.path.join(profileDir, '%s.cpu.folded' % (job)))
+        else:
+            writeMem(os.path.join(profileDir, '%s.mem.txt' % (job)))
+            tracemalloc.stop()
+    except Exception as e:
+        sys.stderr.write('profiler: %s\n' % (e))
+
+    job = None
@@ -0,0 +1,205 @@
+'''
+#
+# Purpose:
+#
+#	Run history and metrics for the nomen jobs
+#	(nomenload.py, batchrename.py, batchdelete.py, updateMkrType.py)
+#
+#	Each run appends one JSON record (JSON Lines) to the run history file:
+#
+#	    job, mode, input file, start/end date, exit status
+#	    input rows, accepted rows, rejected rows
+#	    duration of each phase (seconds), total duration, rows/second
+#
+#	and writes a Prometheus textfile-format metrics file (<job>.<mode>.prom)
+#	to the metrics directory (for the node_exporter textfile collector).
+#
+#	The run and its phases are also profiled, if NOMEN_PROFILE is set
+#	(see profiler.py).
+#
+#	Usage:
+#	    runhistory.start('nomenload', inputFileName)
+#	    with runhistory.phase('processFile'):
+#	        ...
+#	    runhistory.setCount('inputRows', n)
+#	    runhistory.finish(status)
+#
+# Env Vars:
+#
+#	NOMEN_RUN_HISTORY : the run history file; if not set, no history is written
+#	NOMEN_METRICS_DIR : the metrics directory; if not set, no metrics are written
+#	NOMENMODE : the processing mode
+#
+'''
+
+import os
+import time
+import json
+from contextlib import contextmanager
+import mgi_utils
+import profiler
+
+historyFileName = os.environ.get('NOMEN_RUN_HISTORY', '')
+metricsDir = os.environ.get('NOMEN_METRICS_DIR', '')
+mode = os.environ.get('NOMENMODE', '')
+
+job = None
+record = {}
+phases = []		# [(phase name, seconds), ...] in run order
+
+def start(jobName, inputFileName = ''):
+    '''
+    # requires:
+    #	jobName - the name of the job (nomenload, batchrename, ...)
+    #	inputFileName - the input file
+    #
+    # effects:
+    #	starts the run record
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global job, record, phases
+
+    job = jobName
+    phases = []
+    record = {
+        'job' : jobName,
+        'mode' : mode,
+        'inputFile' : inputFileName,
+        'startDate' : mgi_utils.date(),
+        'startTime' : time.time(),
+        'inputRows' : 0,
+        'acceptedRows' : 0,
+        'rejectedRows' : 0,
+    }
+
+    profiler.start(jobName)
+
+@contextmanager
+def phase(name):
+    '''
+    # requires:
+    #	name - the name of the phase
+    #
+    # effects:
+    #	records the duration of the phase (the body of the "with" statement)
+    #	and profiles it (see profiler.py)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    startTime = time.time()
+    profiler.startPhase(name)
+    try:
+        yield
+    finally:
+        profiler.endPhase(name)
+        phases.append((name, time.time() - startTime))
+
+def setCount(name, value):
+    '''
+    # requires:
+    #	name - inputRows, acceptedRows, rejectedRows
+    #	value - the count (integer)
+    #
+    # effects:
+    #	sets the count in the run record
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    record[name] = value
+
+def writeMetrics():
+    '''
+    # requires:
+    #
+    # effects:
+    #	writes the Prometheus textfile-format metrics file for the run
+    #	(written to a temporary file, then renamed)
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    labels = 'job="%s",mode="%s"' % (job, mode)
+    lines = []
+
+    for name, description, value in (
+        ('nomen_job_last_run_timestamp_seconds', 'End time of the last run', record['endTime']),
+        ('nomen_job_exit_status', 'Exit status of the last run', record['status']),
+        ('nomen_job_input_rows', 'Input rows of the last run', record['inputRows']),
+        ('nomen_job_accepted_rows', 'Accepted rows of the last run', record['acceptedRows']),
+        ('nomen_job_rejected_rows', 'Rejected rows of the last run', record['rejectedRows']),
+        ('nomen_job_duration_seconds', 'Duration of the last run', record['duration']),
+        ('nomen_job_rows_per_second', 'Input rows/second of the last run', record['rowsPerSecond']),
+        ):
+        lines.append('# HELP %s %s' % (name, description))
+        lines.append('# TYPE %s gauge' % (name))
+        lines.append('%s{%s} %s' % (name, labels, value))
+
+    lines.append('# HELP nomen_job_phase_duration_seconds Duration of each phase of the last run')
+    lines.append('# TYPE nomen_job_phase_duration_seconds gauge')
+    for name, seconds in phases:
+        lines.append('nomen_job_phase_duration_seconds{%s,phase="%s"} %.3f' % (labels, name, seconds))
+
+    metricsFileName = os.path.join(metricsDir, '%s.%s.prom' % (job, mode))
+
+    with open(metricsFileName + '.tmp', 'w') as fp:
+        fp.write('\n'.join(lines) + '\n')
+    os.rename(metricsFileName + '.tmp', metricsFileName)
+
+def finish(status):
+    '''
+    # requires:
+    #	status - the exit status of the run (integer)
+    #
+    # effects:
+    #	completes the run record; appends it to the run history file
+    #	and writes the metrics file; stops the profiler
+    #	errors are ignored : history/metrics never fail a run
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    global job
+
+    profiler.stop()
+
+    if job is None:
+        return
+
+    endTime = time.time()
+    record['status'] = status
+    record['endDate'] = mgi_utils.date()
+    record['endTime'] = endTime
+    record['duration'] = round(endTime - record['startTime'], 3)
+    record['phases'] = dict([(name, round(seconds, 3)) for name, seconds in phases])
+
+    if record['duration'] > 0:
+        record['rowsPerSecond'] = round(record['inputRows'] / record['duration'], 2)
+    else:
+        record['rowsPerSecond'] = 0
+
+    try:
+        if len(historyFileName) > 0:
+            with open(historyFileName, 'a') as fp:
+                fp.write(json.dumps(record) + '\n')
+
+        if len(metricsDir) > 0:
+            writeMetrics()
+    except:
+        pass
+
+    job = None
+
@@ -7,6 +7,9 @@ import os
 import db
 import mgi_utils
 import loadlib
+import markerresolver
+import runhistory
+import nomensql
 
 #
 # from configuration file
@@ -26,6 +29,7 @@ inputFileName = os.environ['NOMENDATAFILE']
 inputFile = None          # file descriptor
 updateList = [] # list of marker keys to update
 mgiToMrkKeyDict = {} # {mgiID:markerKey, ...}
+runhistory.start('updateMkrType', inputFileName)
 try:
         inputFile = open(inputFileName, 'r')
 except:
@@ -34,50 +38,50 @@ except:
 #
 # get keys for  NEWMKRTYPE and MODIFIEDBY
 #
-results = db.sql('''select _Marker_Type_key from MRK_Types where name = '%s' ''' % newMkrType, 'auto')
+results = db.sql('''select _Marker_Type_key from MRK_Types where name = %s ''' % nomensql.quote(newMkrType), 'auto')
 if len(results) == 0:
     exit (1, 'Invalid marker type  %s\n' % newMkrType)
 newMkrTypeKey = results[0]['_Marker_Type_key']
 
-results = db.sql('''select _User_key from MGI_User where login = '%s' ''' % modifiedBy, 'auto')
+results = db.sql('''select _User_key from MGI_User where login = %s ''' % nomensql.quote(modifiedBy), 'auto')
 if len(results) == 0:
     exit (1, 'Invalid user login %s\n' % modifiedBy)
 modifiedByKey = results[0]['_User_key']
 
 #
-# Create mouse marker MGI ID to marker key lookup
-results = db.sql('''select a.accid, m._Marker_key
-        from ACC_Accession a, MRK_Marker m
-        where a._MGIType_key = 2
-        and a._LogicalDB_key = 1
-        and a.preferred = 1
-        and a.prefixPart = 'MGI:'
-        and a._Object_key = m._Marker_key
-        and m._Organism_key = 1''', 'auto')
-for r in results:
-    mgiToMrkKeyDict[r['accid']] = r['_Marker_key']
-
-# iterate thru the file creating list of marker keys to update
+# Create mouse marker MGI ID to marker key lookup for the MGI IDs in the file
+mgiIDs = []
 for line in inputFile.readlines():
     tokens = str.split(line[:-1], '\t')
-    mgiID = str.strip(tokens[0])
+    mgiIDs.append(str.strip(tokens[0]))
+
+with runhistory.phase('resolveMarkers'):
+    mgiToMrkKeyDict, invalidList = markerresolver.resolveMarkers(mgiIDs, preferred = 1)
+
+runhistory.setCount('inputRows', len(mgiIDs))
 
-    if mgiID not in mgiToMrkKeyDict:
+if len(invalidList) > 0:
+    for mgiID in invalidList:
         print('%s is not a valid mouse ID' % mgiID)
-        exit (1, 'Invalid mouse ID %s\n' % mgiID)
+    sys.stderr.write('Invalid mouse ID(s) %s\n' % ', '.join(invalidList))
+    runhistory.setCount('rejectedRows', len(invalidList))
+    runhistory.finish(1)
+    sys.exit(1)
+
+# create list of marker keys to update
+for mgiID in mgiIDs:
     updateList.append(mgiToMrkKeyDict[mgiID])
 
-for key in updateList:
-    cmd = '''
-        update MRK_Marker
-        set _Marker_Type_key = %s, 
-        modification_date = '%s', 
-        _ModifiedBy_key = %s 
-        where _Marker_key = %s''' % (newMkrTypeKey, loaddate, modifiedByKey, key)
-    print(cmd)
-    db.sql(cmd, 'auto')
+with runhistory.phase('update'):
+    for key in updateList:
+        cmd = nomensql.command('updateMarkerType', newMkrTypeKey, loaddate, modifiedByKey, key)
+        print(cmd)
+        db.sql(cmd, 'auto')
+
+    db.commit()
 
-db.commit()
 inputFile.close()
+runhistory.setCount('acceptedRows', len(updateList))
+runhistory.finish(0)
 
 db.useOneConnection(0)
@@ -0,0 +1,110 @@
+'''
+#
+# Purpose:
+#
+#	Caching wrappers for the loadlib verify functions used by
+#	nomenload.py, batchrename.py and batchdelete.py:
+#
+#	    loadlib.verifyMarker
+#	    loadlib.verifyReference
+#	    loadlib.verifyUser
+#
+#	A nomen file normally has one J: and a handful of submitters, so
+#	most lookups repeat the previous query.  Valid keys are cached
+#	(least-recently-used, bounded by NOMEN_CACHE_SIZE per function).
+#
+#	Invalid values (key = 0) are not cached, so that loadlib still
+#	writes its error message for every row that uses them.
+#
+# Env Vars:
+#
+#	NOMEN_CACHE_SIZE : maximum number of values cached per function
+#		(default 1000)
+#
+'''
+
+import os
+from collections import OrderedDict
+import loadlib
+
+cacheSize = int(os.environ.get('NOMEN_CACHE_SIZE', '1000'))
+
+caches = {}		# {function name : OrderedDict {value : key}}
+stats = {}		# {function name : [hits, misses]}
+
+def cachedVerify(name, verify, value, lineNum, errorFile):
+    '''
+    # requires:
+    #	name - the name of the cache
+    #	verify - the loadlib verify function
+    #	value - the value to verify (MGI:, J:, login)
+    #	lineNum - the line number of the record from the input file
+    #	errorFile - the error file descriptor (or None)
+    #
+    # effects:
+    #	returns the cached key for the value, or calls the verify function
+    #	and caches the key if it is valid
+    #
+    # returns:
+    #	0 if the value is invalid
+    #	the key if the value is valid
+    #
+    '''
+
+    cache = caches.setdefault(name, OrderedDict())
+    stat = stats.setdefault(name, [0, 0])
+
+    if value in cache:
+        cache.move_to_end(value)
+        stat[0] += 1
+        return cache[value]
+
+    stat[1] += 1
+    key = verify(value, lineNum, errorFile)
+
+    if key != 0:
+        cache[value] = key
+        if len(cache) > cacheSize:
+            cache.popitem(last = False)
+
+    return key
+
+def verifyMarker(markerID, lineNum, errorFile):
+    '''
+    # see loadlib.verifyMarker
+    '''
+
+    return cachedVerify('verifyMarker', loadlib.verifyMarker, markerID, lineNum, errorFile)
+
+def verifyReference(jnum, lineNum, errorFile):
+    '''
+    # see loadlib.verifyReference
+    '''
+
+    return cachedVerify('verifyReference', loadlib.verifyReference, jnum, lineNum, errorFile)
+
+def verifyUser(createdBy, lineNum, errorFile):
+    '''
+    # see loadlib.verifyUser
+    '''
+
+    return cachedVerify('verifyUser', loadlib.verifyUser, createdBy, lineNum, errorFile)
+
+def writeStats(fp):
+    '''
+    # requires:
+    #	fp - the file descriptor (the diagnostics file)
+    #
+    # effects:
+    #	writes the hit/miss statistics of each cache
+    #
+    # returns:
+    #	nothing
+    #
+    '''
+
+    fp.write('\nLookup cache statistics (function, hits, misses, size):\n')
+
+    for name in sorted(stats):
+        fp.write('%s\t%d\t%d\t%d\n' % (name, stats[name][0], stats[name][1], len(caches[name])))
+